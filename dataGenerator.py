@@ -1,90 +1,192 @@
-import random
-import numpy as np
-# a python script define algorithm to generate different rankings
-# test of this script can be found in testDataGenerator.py
-
-def generateUnfairRanking(_ranking,_protected_group,_fairness_probability):
-    """
-        An algorithm for generating rankings with varying degree of fairness.
-
-        :param _ranking: A ranking
-        :param _protected_group: The protected group
-        :param _fairness_probability: The unfair degree, where 0 is most unfair (unprotected 
-                       group ranked first) and 1 is fair (groups are mixed randomly 
-                       in the output ranking)
-        :return: returns a ranking that has the specified degree of unfairness w.r.t. 
-                 the protected group
-    """
-    # error handling for ranking and protected group
-    completeCheckRankingProperties(_ranking,_protected_group)
-
-    if not isinstance( _fairness_probability, ( int, long, float, complex ) ):
-        raise TypeError("Input fairness probability must be a number")
-    # error handling for value
-    if _fairness_probability > 1 or _fairness_probability < 0:
-        raise ValueError("Input fairness probability must be a number in [0,1]")
-
-
-    pro_ranking=[x for x in _ranking if x not in _protected_group] # partial ranking of protected member
-    unpro_ranking=[x for x in _ranking if x in _protected_group] # partial ranking of unprotected member
-    pro_ranking.reverse() #prepare for pop function to get the first element
-    unpro_ranking.reverse()
-    unfair_ranking=[]
-    
-    while(len(unpro_ranking)>0 and len(pro_ranking)>0):
-        random_seed=random.random() # generate a random value in range [0,1]
-        if random_seed<_fairness_probability:
-            unfair_ranking.append(unpro_ranking.pop()) # insert protected group first
-        else:
-            unfair_ranking.append(pro_ranking.pop()) # insert unprotected group first
-    
-    if len(unpro_ranking)>0: # insert the remain unprotected member
-        unpro_ranking.reverse()
-        unfair_ranking=unfair_ranking+unpro_ranking        
-    if len(pro_ranking)>0: # insert the remain protected member
-        pro_ranking.reverse()
-        unfair_ranking=unfair_ranking+pro_ranking
-        
-    if len(unfair_ranking)<len(_ranking): # check error for insertation
-        print "Error!"
-    return unfair_ranking
-    
-# Function for error handling
-def completeCheckRankingProperties(_ranking,_protected_group):    
-    """
-        Check whether input ranking and protected group is valid.
-
-        :param _ranking: A ranking
-        :param _protected_group: The protected group
-        
-        :return: no returns. Raise errors if founded.
-    """
-    # error handling for input type
-    if not isinstance(_ranking, (list, tuple, np.ndarray)) and not isinstance( _ranking, basestring ):
-        raise TypeError("Input ranking must be a list-wise structure defined by '[]' symbol")
-    if not isinstance(_protected_group, (list, tuple, np.ndarray)) and not isinstance( _protected_group, basestring ):
-        raise TypeError("Input protected group must be a list-wise structure defined by '[]' symbol")
-
-    user_N=len(_ranking)
-    pro_N=len(_protected_group)
-
-    # error handling for input value
-    if user_N <= 0: # check size of input ranking
-        raise ValueError("Please input a valid ranking")
-    if pro_N <= 0: # check size of input ranking
-        raise ValueError("Please input a valid protected group whose length is larger than 0")
-    
-    if pro_N >= user_N: # check size of protected group
-        raise ValueError("Please input a protected group with size less than total user")
-
-    if len(set(_ranking)) != user_N: # check for repetition in input ranking
-        raise ValueError("Please input a valid complete ranking")    
-
-    if len(set(_protected_group)) != pro_N: # check repetition of protected group
-        raise ValueError("Please input a valid protected group that have no repetitive members")
-    
-    if len(set(_protected_group).intersection(_ranking)) <=0: # check valid of protected group
-        raise ValueError("Please input a valid protected group that is a subset of total user")  
-
-    if len(set(_protected_group).intersection(_ranking)) != pro_N: # check valid of protected group
-        raise ValueError("Please input a valid protected group that is a subset of total user")
\ No newline at end of file
+import random
+import numpy as np
+from protectedGroup import ProtectedGroup
+import rankingValidation
+# a python script define algorithm to generate different rankings
+# test of this script can be found in testDataGenerator.py
+
+def generateUnfairRanking(_ranking,_protected_group,_fairness_probability):
+    """
+        An algorithm for generating rankings with varying degree of fairness.
+
+        :param _ranking: A ranking
+        :param _protected_group: The protected group
+        :param _fairness_probability: The unfair degree, where 0 is most unfair (unprotected 
+                       group ranked first) and 1 is fair (groups are mixed randomly 
+                       in the output ranking)
+        :return: returns a ranking that has the specified degree of unfairness w.r.t. 
+                 the protected group
+    """
+    # error handling for ranking and protected group
+    completeCheckRankingProperties(_ranking,_protected_group)
+
+    if not isinstance( _fairness_probability, ( int, long, float, complex ) ):
+        raise TypeError("Input fairness probability must be a number")
+    # error handling for value
+    if _fairness_probability > 1 or _fairness_probability < 0:
+        raise ValueError("Input fairness probability must be a number in [0,1]")
+
+
+    # look up membership in a set, or directly in a ProtectedGroup
+    protected_lookup=_protected_group if isinstance(_protected_group, ProtectedGroup) else set(_protected_group)
+    pro_ranking=[x for x in _ranking if x not in protected_lookup] # partial ranking of protected member
+    unpro_ranking=[x for x in _ranking if x in protected_lookup] # partial ranking of unprotected member
+    pro_ranking.reverse() #prepare for pop function to get the first element
+    unpro_ranking.reverse()
+    unfair_ranking=[]
+    
+    while(len(unpro_ranking)>0 and len(pro_ranking)>0):
+        random_seed=random.random() # generate a random value in range [0,1]
+        if random_seed<_fairness_probability:
+            unfair_ranking.append(unpro_ranking.pop()) # insert protected group first
+        else:
+            unfair_ranking.append(pro_ranking.pop()) # insert unprotected group first
+    
+    if len(unpro_ranking)>0: # insert the remain unprotected member
+        unpro_ranking.reverse()
+        unfair_ranking=unfair_ranking+unpro_ranking        
+    if len(pro_ranking)>0: # insert the remain protected member
+        pro_ranking.reverse()
+        unfair_ranking=unfair_ranking+pro_ranking
+        
+    if len(unfair_ranking)<len(_ranking): # check error for insertation
+        print "Error!"
+    return unfair_ranking
+    
+def generateUnfairRankings(_ranking,_protected_group,_fairness_probability,_ranking_N,_rng=None):
+    """
+        Vectorized version of function 'generateUnfairRanking' that generates many rankings at once.
+        All random values are drawn in one call, the output rankings follow the same distribution.
+
+        :param _ranking: A ranking
+        :param _protected_group: The protected group
+        :param _fairness_probability: The unfair degree, where 0 is most unfair (unprotected 
+                       group ranked first) and 1 is fair (groups are mixed randomly 
+                       in the output ranking)
+        :param _ranking_N: The number of output rankings
+        :param _rng: The random generator, a np.random.Generator, a np.random.RandomState or a seed,
+                     uses the global numpy random state if not given
+        :return: returns a 2-D array with one ranking per row, each ranking has the specified degree of unfairness
+                 w.r.t. the protected group
+    """
+    # error handling for ranking and protected group
+    completeCheckRankingProperties(_ranking,_protected_group)
+
+    if not isinstance( _fairness_probability, ( int, long, float, complex ) ):
+        raise TypeError("Input fairness probability must be a number")
+    if not isinstance( _ranking_N, ( int, long ) ):
+        raise TypeError("Input number of rankings must be an integer")
+    # error handling for value
+    if _fairness_probability > 1 or _fairness_probability < 0:
+        raise ValueError("Input fairness probability must be a number in [0,1]")
+    if _ranking_N < 0:
+        raise ValueError("Input number of rankings must be an integer not less than 0")
+
+    ranking=np.asarray(_ranking)
+    if isinstance(_protected_group, ProtectedGroup):
+        is_protected=_protected_group.getMask(ranking)
+    else:
+        is_protected=np.in1d(ranking,np.asarray(_protected_group))
+    pro_ranking=ranking[is_protected] # partial ranking of protected member
+    unpro_ranking=ranking[~is_protected] # partial ranking of unprotected member
+    user_N=len(ranking)
+    pro_N=len(pro_ranking)
+    unpro_N=user_N-pro_N
+
+    # the group drawn at each position while both groups still have members
+    take_pro=drawUniform(_rng,(_ranking_N,user_N))<_fairness_probability
+    pro_taken=np.cumsum(take_pro,axis=1)
+    unpro_taken=np.arange(1,user_N+1)-pro_taken
+    # the position where one group runs out, the remaining members of the other group follow it
+    exhausted=(pro_taken>=pro_N)|(unpro_taken>=unpro_N)
+    last_draw=np.argmax(exhausted,axis=1)
+    pro_remains=pro_taken[np.arange(_ranking_N),last_draw]<pro_N
+    after_draws=np.arange(user_N)>last_draw[:,np.newaxis]
+    is_pro_position=np.where(after_draws,pro_remains[:,np.newaxis],take_pro)
+
+    # the k-th protected position gets the k-th protected member, the same for unprotected group
+    pro_pos=np.cumsum(is_pro_position,axis=1)-1
+    unpro_pos=np.arange(user_N)-pro_pos-1
+    return np.where(is_pro_position,pro_ranking[np.minimum(pro_pos,pro_N-1)],unpro_ranking[np.minimum(unpro_pos,unpro_N-1)])
+
+def drawUniform(_rng,_shape):
+    """
+        Draw random values in range [0,1) from a numpy random generator.
+
+        :param _rng: A np.random.Generator, a np.random.RandomState or a seed, uses the global numpy random state if None
+        :param _shape: The shape of the output
+        :return: returns an array of random values.
+    """
+    if _rng is None:
+        _rng=np.random
+    elif isinstance( _rng, ( int, long ) ):
+        # np.random.default_rng is only available since numpy 1.17
+        _rng=np.random.default_rng(_rng) if hasattr(np.random,"default_rng") else np.random.RandomState(_rng)
+    if hasattr(_rng,"random_sample"): # np.random.RandomState and the global numpy random state
+        return _rng.random_sample(_shape)
+    return _rng.random(_shape)
+
+# Function for error handling
+def completeCheckRankingProperties(_ranking,_protected_group,_validation=None):    
+    """
+        Check whether input ranking and protected group is valid.
+        A ValidatedRanking is not checked again for repetitive items, nor with a ProtectedGroup it already passed.
+
+        :param _ranking: A ranking, a list-wise structure or a ValidatedRanking
+        :param _protected_group: The protected group, a list-wise structure or a ProtectedGroup
+        :param _validation: The validation mode, one of 'full', 'sampled', 'trusted', default is the global mode
+                            of rankingValidation.py, which is 'full' unless changed
+        
+        :return: no returns. Raise errors if founded.
+    """
+    validation=rankingValidation.resolveValidation(_validation)
+    if validation == rankingValidation.VALIDATE_TRUSTED:
+        return
+    if rankingValidation.isValidated(_ranking) and _ranking.hasPassed(_protected_group):
+        return
+    # error handling for input type
+    if not isinstance(_ranking, (list, tuple, np.ndarray)) and not isinstance( _ranking, basestring ):
+        raise TypeError("Input ranking must be a list-wise structure defined by '[]' symbol")
+    if not isinstance(_protected_group, (list, tuple, np.ndarray, ProtectedGroup)) and not isinstance( _protected_group, basestring ):
+        raise TypeError("Input protected group must be a list-wise structure defined by '[]' symbol")
+
+    user_N=len(_ranking)
+    pro_N=len(_protected_group)
+
+    # error handling for input value
+    if user_N <= 0: # check size of input ranking
+        raise ValueError("Please input a valid ranking")
+    if pro_N <= 0: # check size of input ranking
+        raise ValueError("Please input a valid protected group whose length is larger than 0")
+    
+    if pro_N >= user_N: # check size of protected group
+        raise ValueError("Please input a protected group with size less than total user")
+
+    if validation == rankingValidation.VALIDATE_SAMPLED:
+        # only repetitions among a sample of items are checked, membership of protected group is not
+        if not rankingValidation.isValidated(_ranking) and rankingValidation.hasSampleRepetition(_ranking):
+            raise ValueError("Please input a valid complete ranking")
+        if not isinstance(_protected_group, ProtectedGroup) and rankingValidation.hasSampleRepetition(_protected_group):
+            raise ValueError("Please input a valid protected group that have no repetitive members")
+        return
+
+    if not rankingValidation.isValidated(_ranking) and len(set(_ranking)) != user_N: # check for repetition in input ranking
+        raise ValueError("Please input a valid complete ranking")    
+
+    if isinstance(_protected_group, ProtectedGroup):
+        # members are unique by construction, count the ones in the ranking with one lookup
+        common_N=_protected_group.countIn(_ranking)
+    else:
+        protected_set=set(_protected_group)
+        if len(protected_set) != pro_N: # check repetition of protected group
+            raise ValueError("Please input a valid protected group that have no repetitive members")
+        common_N=len(protected_set.intersection(_ranking))
+    
+    if common_N <=0: # check valid of protected group
+        raise ValueError("Please input a valid protected group that is a subset of total user")  
+
+    if common_N != pro_N: # check valid of protected group
+        raise ValueError("Please input a valid protected group that is a subset of total user")
+
+    if rankingValidation.isValidated(_ranking):
+        _ranking.markPassed(_protected_group)
\ No newline at end of file
@@ -0,0 +1,173 @@
+from __future__ import division
+import json
+import numpy as np
+import optimization
+import utility
+import runOptimization
+# a python script define the fair ranking model that keeps the optimized parameters, to score new users without optimizing again
+# a fitted model is saved to a compact binary file by 'FairRanker.save' and loaded by function 'loadFairRanker'
+
+MODEL_VERSION=1 # version of the model file, increased when the stored fields change
+SCORE_CHUNK_ROWS=65536 # number of users scored at once, bounds the memory of the distances to the clusters
+
+class FairRanker(object):
+    """
+        A fair ranking model with fit, transform and score.
+        'fit' runs the optimization of runOptimization.py on the training users and keeps the optimized parameters,
+        the clusters, the attribute weights and the cluster weights.
+        'transform' maps new users to their fair representation, the probability of each user to map to each cluster,
+        and 'score' computes their estimated scores from it, both in chunks of users with the vectorized kernels.
+    """
+
+    def __init__(self,_k,_accmeasure,_optimizer=runOptimization.LBFGS,_approx_grad=False,_seed=None):
+        """
+            :param _k: The number of clusters in the intermediate layer of neural network
+            :param _accmeasure: The accuracy measure of the optimization, one of constant string defined in optimization.py
+            :param _optimizer: The optimizer, 'lbfgs' on the full data, or 'adam' or 'momentum' on stratified mini-batches
+            :param _approx_grad: Whether l-bfgs approximates the gradient by finite differences of the original objective
+            :param _seed: The seed of the random starting point, uses the global numpy random state if not given
+        """
+        if not isinstance( _k, ( int, long ) ) or _k <= 0:
+            raise ValueError("Input k must be an integer larger than 0")
+        if _accmeasure not in [optimization.SCORE_DIVERGENCE,optimization.POSITION_DIFFERENCE,optimization.KENDALL_DIS,
+                               optimization.SPEARMAN_COR,optimization.PEARSON_COR]:
+            raise ValueError("Input accuracy measure must be a string that choose from ['scoreDiff', 'positionDiff', 'kendallDis', 'spearmanDis', 'pearsonDis']")
+        if _optimizer not in [runOptimization.LBFGS,optimization.ADAM,optimization.MOMENTUM]:
+            raise ValueError("Input optimizer must be a string that choose from ['lbfgs', 'adam', 'momentum']")
+        self.k=_k
+        self.accmeasure=_accmeasure
+        self.optimizer=_optimizer
+        self.approx_grad=_approx_grad
+        self.seed=_seed
+        self.params=None
+        self.att_N=None
+        self.criterion=None
+        self.train_accuracy=None
+
+    def fit(self,_data,_pro_index,_inputscores):
+        """
+            Optimize the parameters on the training users.
+            :param _data: The input data of all training users, each row is a feature vector of one user
+            :param _pro_index: The row numbers of protected group
+            :param _inputscores: The scores of training users to rank on
+            :return: returns this model.
+        """
+        data=np.asarray(_data)
+        if data.ndim != 2 or data.shape[0] == 0:
+            raise ValueError("Input data should be a non-empty matrix with one row per user")
+        pro_index=np.asarray(_pro_index)
+        is_protected=np.zeros(data.shape[0],dtype=bool)
+        is_protected[pro_index]=True
+        pro_data=data[pro_index]
+        unpro_data=data[~is_protected]
+        if self.optimizer==runOptimization.LBFGS:
+            rez=runOptimization.runLBFGS(data,pro_data,unpro_data,_inputscores,self.k,self.accmeasure,self.approx_grad,self.seed,None,0)
+        else:
+            rez=runOptimization.runStochastic(data,pro_index,_inputscores,self.k,self.accmeasure,self.optimizer,self.seed)
+        self.params=np.asarray(rez[0],dtype=np.float64)
+        self.att_N=data.shape[1]
+        self.criterion=float(rez[1])
+        # ranking accuracy of the training users after converged
+        estimate_scores,acc_value=optimization.calculateEvaluateRez(rez,data,_inputscores,self.k,self.accmeasure)
+        self.train_accuracy=float(acc_value)
+        return self
+
+    def fitCSV(self,_csv_fn,_target_col,_sensi_bound,_use_binary=False):
+        """
+            Optimize the parameters on the training users stored in a csv file, read as in runOptimization.py.
+            :param _csv_fn: The file name of input data stored in csv file
+            :param _target_col: The target attribute ranked on i.e. score of ranking
+            :param _sensi_bound: The value of sensitve attribute to use as protected group
+            :param _use_binary: Whether to read the input data from its memory-mapped binary format
+            :return: returns this model.
+        """
+        data,input_scores,pro_data,unpro_data,pro_index=utility.transformCSVdata(_csv_fn,_target_col,_sensi_bound,_use_binary=_use_binary)
+        return self.fit(data,pro_index,input_scores)
+
+    def transform(self,_data,_chunk_rows=SCORE_CHUNK_ROWS):
+        """
+            Map users to their fair representation.
+            :param _data: The input data of users, each row is a feature vector of one user with the columns of the training data
+            :param _chunk_rows: The number of users mapped at once
+            :return: returns a (users x k) array of the probability of each user to map to each cluster.
+        """
+        data=self.checkData(_data)
+        representation=np.zeros((data.shape[0],self.k))
+        for start in range(0,data.shape[0],_chunk_rows):
+            chunk=np.asarray(data[start:start+_chunk_rows],dtype=np.float64)
+            representation[start:start+len(chunk)]=optimization.calculateRepresentation(self.params,chunk,self.k)[1]
+        return representation
+
+    def score(self,_data,_chunk_rows=SCORE_CHUNK_ROWS):
+        """
+            Compute the estimated scores of users, a forward pass of the optimized parameters.
+            :param _data: The input data of users, each row is a feature vector of one user with the columns of the training data
+            :param _chunk_rows: The number of users scored at once
+            :return: returns the numpy array of estimated scores, in the order of users.
+        """
+        data=self.checkData(_data)
+        scores=np.zeros(data.shape[0])
+        for start in range(0,data.shape[0],_chunk_rows):
+            chunk=np.asarray(data[start:start+_chunk_rows],dtype=np.float64)
+            clusters,M_nk_x=optimization.calculateRepresentation(self.params,chunk,self.k)
+            scores[start:start+len(chunk)]=optimization.calculateEstimateScores(M_nk_x,clusters)
+        return scores
+
+    def rank(self,_data,_chunk_rows=SCORE_CHUNK_ROWS):
+        """
+            :param _data: The input data of users, each row is a feature vector of one user with the columns of the training data
+            :param _chunk_rows: The number of users scored at once
+            :return: returns the ranking of users by estimated scores, an array of row numbers from the best user to the worst one.
+        """
+        return utility.calculateRankingOrder(self.score(_data,_chunk_rows))
+
+    def checkData(self,_data):
+        """
+            Check whether the model is fitted and input data has the columns of the training data.
+            :param _data: The input data of users
+            :return: returns the input data as a 2-D array. Raise errors if founded.
+        """
+        if self.params is None:
+            raise ValueError("The model is not fitted, call 'fit' or load a saved model first")
+        data=_data if isinstance(_data, np.ndarray) else np.asarray(_data,dtype=np.float64)
+        if data.ndim != 2:
+            raise ValueError("Input data should be a matrix with one row per user")
+        if data.shape[1] != self.att_N:
+            raise ValueError("Input data should have "+str(self.att_N)+" attribute columns as the training data")
+        return data
+
+    def save(self,_model_fn):
+        """
+            Save the fitted model to a compact binary file, the optimized parameters as float64 and the settings as json.
+            :param _model_fn: The file name of the model
+            :return: no returns.
+        """
+        if self.params is None:
+            raise ValueError("The model is not fitted, call 'fit' or load a saved model first")
+        header={"version": MODEL_VERSION, "k": self.k, "att_N": self.att_N, "accmeasure": self.accmeasure,
+                "optimizer": self.optimizer, "approx_grad": self.approx_grad, "seed": self.seed,
+                "criterion": self.criterion, "train_accuracy": self.train_accuracy}
+        # write through a file object so that numpy does not append '.npz' to the file name
+        with open(_model_fn,'wb') as mf:
+            np.savez(mf,params=self.params,header=np.array(json.dumps(header,sort_keys=True)))
+
+def loadFairRanker(_model_fn):
+    """
+        Load a fitted model saved by 'FairRanker.save'.
+        :param _model_fn: The file name of the model
+        :return: returns the FairRanker with the saved parameters.
+    """
+    with open(_model_fn,'rb') as mf:
+        stored=np.load(mf,allow_pickle=False)
+        header=json.loads(str(stored["header"]))
+        params=stored["params"]
+    if header.get("version") != MODEL_VERSION:
+        raise ValueError("Input model file has version "+str(header.get("version"))+", expected "+str(MODEL_VERSION))
+    ranker=FairRanker(header["k"],str(header["accmeasure"]),str(header["optimizer"]),header["approx_grad"],header["seed"])
+    if len(params) != 2*header["att_N"]+header["k"]+header["att_N"]*header["k"]:
+        raise ValueError("Input model file has parameters of a wrong size")
+    ranker.params=params
+    ranker.att_N=header["att_N"]
+    ranker.criterion=header["criterion"]
+    ranker.train_accuracy=header["train_accuracy"]
+    return ranker
@@ -0,0 +1,274 @@
+from __future__ import division
+import math
+import numpy as np
+import measures
+import dataGenerator
+# a python script define incremental evaluation of group fairness measures for rankings edited in place
+# the fairness values always equal the output of 'measures.calculateNDFairness' on the current ranking
+
+class FairnessTracker(object):
+    """
+        Keep the group fairness of a ranking up to date while it is edited by swaps, moves, insertions and deletions.
+        The protected count and the discounted fairness term of every cut point are stored,
+        and each edit only updates the cut points whose top-k prefix changed.
+        Swaps and moves shift the ranking and the protected mask in place between the two positions,
+        so they cost O(distance between the positions) and no copy of the whole ranking.
+
+        Insertions and deletions change the size of the ranking and of the protected group,
+        so they refresh the terms of all cut points from the stored counts, without rescanning the ranking.
+        They also shift every item after the edited position, an O(N) bound per insertion or deletion.
+    """
+
+    def __init__(self,_ranking,_protected_group,_cut_point,_gf_measures,_normalizers):
+        """
+            :param _ranking: A permutation of N numbers (0..N-1) that represents a ranking of N individuals,
+                                    e.g., [0, 3, 5, 2, 1, 4].  Each number is an identifier of an individual.
+                                    Stored as a python array.
+            :param _protected_group: A set of identifiers from _ranking that represent members of the protected group
+                                    e.g., [0, 2, 3].  Stored as a python array for convenience, order does not matter.
+                                    Can be a ProtectedGroup.
+            :param _cut_point: Cut range for the calculation of group fairness, e.g., 10, 20, 30,...
+            :param _gf_measures: The list of group fairness measures to be tracked, each one of 'rKL', 'rND', 'rRD'.
+            :param _normalizers: The list of normalizers of each measure in _gf_measures.
+        """
+        # error handling for ranking and protected group
+        dataGenerator.completeCheckRankingProperties(_ranking,_protected_group)
+        # error handling for input type
+        if not isinstance( _cut_point, ( int, long ) ) or _cut_point <= 0:
+            raise TypeError("Input batch size must be an integer larger than 0")
+        if not isinstance(_gf_measures, (list, tuple)):
+            raise TypeError("Input group fairness measures and normalizers must be list-wise structures defined by '[]' symbol")
+        for gfi in _gf_measures:
+            if gfi not in [measures.KL_DIVERGENCE,measures.ND_DIFFERENCE,measures.RD_DIFFERENCE]:
+                raise ValueError("Input group fairness measure must be a string that choose from ['rKL', 'rND', 'rRD']")
+
+        self.cut_point=_cut_point
+        self.gf_measures=list(_gf_measures)
+        self.setNormalizers(_normalizers)
+
+        self.ranking=list(_ranking)
+        self.items=set(self.ranking) # membership of the ranking, so insertions do not scan the ranking list
+        self.protected=set(_protected_group)
+        # buffer with spare capacity for insertions, only its first len(self.ranking) entries are valid
+        self.pro_mask=measures.getProtectedMask(np.asarray(self.ranking),list(self.protected))
+        self.pro_N=len(self.protected)
+
+        cut_points=np.arange(_cut_point,len(self.ranking)+1,_cut_point)
+        self.pro_k=np.cumsum(self.pro_mask)[cut_points-1] if len(cut_points) else np.zeros(0,dtype=int)
+        self.discounts=np.zeros(0)
+        self.terms=dict((gfi,np.zeros(0)) for gfi in self.gf_measures)
+        self.refreshTerms()
+
+    def setNormalizers(self,_normalizers):
+        """
+            Replace the normalizers, e.g. after insertions or deletions changed the size of the ranking.
+            :param _normalizers: The list of normalizers of each tracked measure.
+            :return: no returns.
+        """
+        if not isinstance(_normalizers, (list, tuple, np.ndarray)):
+            raise TypeError("Input group fairness measures and normalizers must be list-wise structures defined by '[]' symbol")
+        if len(self.gf_measures) != len(_normalizers):
+            raise ValueError("Input group fairness measures and normalizers should have same size")
+        for normi in _normalizers:
+            if normi==0:
+                raise ValueError("Normalizer equals to zero")
+        self.normalizers=list(_normalizers)
+
+    def getRanking(self):
+        """
+            :return: returns a copy of the current ranking.
+        """
+        return list(self.ranking)
+
+    def getFairness(self):
+        """
+            Get the normalized fairness values of the current ranking.
+            The stored terms are summed in ranking order, so every value is identical to 'measures.calculateNDFairness'.
+            :return: returns the list of fairness values of each tracked measure.
+        """
+        if measures.NORM_CUTPOINT > len(self.ranking):
+            raise ValueError("Batch size should be less than input ranking's length")
+        gf_results=[]
+        for gfi,normi in zip(self.gf_measures,self.normalizers):
+            if len(self.terms[gfi])==0: # no cut point inside the ranking
+                discounted_gf=0.0
+            else:
+                discounted_gf=np.cumsum(self.terms[gfi])[-1]
+            gf_results.append(float(discounted_gf/normi))
+        return gf_results
+
+    def swap(self,_pos1,_pos2):
+        """
+            Swap the items at two positions of the ranking.
+            Only the cut points between the two positions are updated.
+            :param _pos1: The position of the first item, 0 is the top of the ranking
+            :param _pos2: The position of the second item
+            :return: no returns.
+        """
+        self.checkPosition(_pos1,len(self.ranking))
+        self.checkPosition(_pos2,len(self.ranking))
+        low,high=min(_pos1,_pos2),max(_pos1,_pos2)
+        if low==high:
+            return
+        # prefixes that hold position low but not position high
+        cut_idx=self.getCutIndex(low+1,high)
+        self.pro_k[cut_idx]+=int(self.pro_mask[high])-int(self.pro_mask[low])
+
+        self.ranking[low],self.ranking[high]=self.ranking[high],self.ranking[low]
+        self.pro_mask[low],self.pro_mask[high]=self.pro_mask[high],self.pro_mask[low]
+        self.updateTerms(cut_idx)
+
+    def move(self,_from_pos,_to_pos):
+        """
+            Move the item at one position to another position, the items in between shift by one.
+            Only the cut points between the two positions are updated.
+            :param _from_pos: The current position of the item
+            :param _to_pos: The position of the item after the move
+            :return: no returns.
+        """
+        self.checkPosition(_from_pos,len(self.ranking))
+        self.checkPosition(_to_pos,len(self.ranking))
+        if _from_pos==_to_pos:
+            return
+        moved_pro=int(self.pro_mask[_from_pos])
+        if _from_pos < _to_pos:
+            # prefixes lose the moved item and gain the item shifted up into them
+            cut_idx=self.getCutIndex(_from_pos+1,_to_pos)
+            self.pro_k[cut_idx]+=self.pro_mask[self.getCutPoints(cut_idx)].astype(int)-moved_pro
+        else:
+            # prefixes gain the moved item and lose the item shifted down out of them
+            cut_idx=self.getCutIndex(_to_pos+1,_from_pos)
+            self.pro_k[cut_idx]+=moved_pro-self.pro_mask[self.getCutPoints(cut_idx)-1].astype(int)
+
+        # shift only the items between the two positions
+        moved_item=self.ranking[_from_pos]
+        if _from_pos < _to_pos:
+            self.ranking[_from_pos:_to_pos]=self.ranking[_from_pos+1:_to_pos+1]
+            self.pro_mask[_from_pos:_to_pos]=self.pro_mask[_from_pos+1:_to_pos+1]
+        else:
+            self.ranking[_to_pos+1:_from_pos+1]=self.ranking[_to_pos:_from_pos]
+            self.pro_mask[_to_pos+1:_from_pos+1]=self.pro_mask[_to_pos:_from_pos]
+        self.ranking[_to_pos]=moved_item
+        self.pro_mask[_to_pos]=moved_pro
+        self.updateTerms(cut_idx)
+
+    def insert(self,_pos,_item,_is_protected):
+        """
+            Insert a new item into the ranking, the items after it shift down by one.
+            :param _pos: The position of the new item, len(ranking) appends it at the bottom
+            :param _item: The identifier of the new item, must not be in the ranking
+            :param _is_protected: Whether the new item belongs to the protected group
+            :return: no returns.
+        """
+        self.checkPosition(_pos,len(self.ranking)+1)
+        if _item in self.items:
+            raise ValueError("Please input a valid complete ranking")
+        user_N=len(self.ranking)+1
+        pro_N=self.pro_N+int(bool(_is_protected))
+        if pro_N >= user_N: # check size of protected group
+            raise ValueError("Please input a protected group with size less than total user")
+
+        # prefixes that reach the new item gain it and lose the item shifted out of them
+        cut_idx=self.getCutIndex(_pos+1,user_N-1)
+        self.pro_k[cut_idx]+=int(bool(_is_protected))-self.pro_mask[self.getCutPoints(cut_idx)-1].astype(int)
+        if user_N % self.cut_point == 0: # the whole ranking becomes a new cut point
+            self.pro_k=np.append(self.pro_k,pro_N)
+
+        self.ranking.insert(_pos,_item)
+        self.items.add(_item)
+        if user_N > len(self.pro_mask): # double the capacity of the mask buffer
+            self.pro_mask=np.concatenate((self.pro_mask,np.zeros(len(self.pro_mask),dtype=bool)))
+        self.pro_mask[_pos+1:user_N]=self.pro_mask[_pos:user_N-1]
+        self.pro_mask[_pos]=bool(_is_protected)
+        if _is_protected:
+            self.protected.add(_item)
+        self.pro_N=pro_N
+        self.refreshTerms()
+
+    def delete(self,_pos):
+        """
+            Delete the item at one position of the ranking, the items after it shift up by one.
+            :param _pos: The position of the deleted item
+            :return: returns the identifier of the deleted item.
+        """
+        self.checkPosition(_pos,len(self.ranking))
+        deleted_pro=int(self.pro_mask[_pos])
+        user_N=len(self.ranking)-1
+        pro_N=self.pro_N-deleted_pro
+        if pro_N <= 0:
+            raise ValueError("Please input a valid protected group whose length is larger than 0")
+        if pro_N >= user_N:
+            raise ValueError("Please input a protected group with size less than total user")
+
+        # the last cut point disappears when the ranking becomes shorter than it
+        if len(self.pro_k) and self.getCutPoints(len(self.pro_k)-1) > user_N:
+            self.pro_k=self.pro_k[:-1]
+        # prefixes that reached the deleted item lose it and gain the item shifted up into them
+        cut_idx=self.getCutIndex(_pos+1,user_N)
+        self.pro_k[cut_idx]+=self.pro_mask[self.getCutPoints(cut_idx)].astype(int)-deleted_pro
+
+        deleted_item=self.ranking.pop(_pos)
+        self.items.discard(deleted_item)
+        self.pro_mask[_pos:user_N]=self.pro_mask[_pos+1:user_N+1]
+        self.pro_mask[user_N]=False
+        self.protected.discard(deleted_item)
+        self.pro_N=pro_N
+        self.refreshTerms()
+        return deleted_item
+
+    def getCutIndex(self,_low,_high):
+        """
+            Get the indices of the cut points inside a range of prefix sizes.
+            :param _low: The smallest prefix size of the range
+            :param _high: The largest prefix size of the range
+            :return: returns an array of indices into the stored cut points.
+        """
+        first=int(math.ceil(_low/self.cut_point))-1
+        last=min(_high//self.cut_point,len(self.pro_k))
+        return np.arange(max(first,0),max(last,0))
+
+    def getCutPoints(self,_cut_idx):
+        """
+            :param _cut_idx: An index or an array of indices of the stored cut points
+            :return: returns the prefix sizes of the cut points.
+        """
+        return (np.asarray(_cut_idx)+1)*self.cut_point
+
+    def updateTerms(self,_cut_idx):
+        """
+            Recompute the discounted fairness terms of some cut points from their protected counts.
+            :param _cut_idx: An array of indices of the stored cut points
+            :return: no returns.
+        """
+        if len(_cut_idx)==0:
+            return
+        user_N=len(self.ranking)
+        cut_points=self.getCutPoints(_cut_idx)
+        for gfi in self.gf_measures:
+            gf=measures.calculateFairnessArray(cut_points,self.pro_k[_cut_idx],user_N,self.pro_N,gfi)
+            self.terms[gfi][_cut_idx]=gf/self.discounts[_cut_idx]
+
+    def refreshTerms(self):
+        """
+            Recompute the discounted fairness terms of all cut points, used when the size of the ranking changed.
+            :return: no returns.
+        """
+        cut_N=len(self.pro_k)
+        if len(self.discounts) != cut_N:
+            # discount of each cut point, computed with math.log to match the scalar measures
+            self.discounts=np.array([math.log(ci+1,measures.LOG_BASE) for ci in self.getCutPoints(np.arange(cut_N))])
+            for gfi in self.gf_measures:
+                self.terms[gfi]=np.zeros(cut_N)
+        self.updateTerms(np.arange(cut_N))
+
+    def checkPosition(self,_pos,_size):
+        """
+            Check whether an input position is valid.
+            :param _pos: The input position
+            :param _size: The number of valid positions
+            :return: no returns. Raise errors if founded.
+        """
+        if not isinstance( _pos, ( int, long, np.integer ) ):
+            raise TypeError("Input position must be an integer")
+        if _pos < 0 or _pos >= _size:
+            raise ValueError("Input position must be in the range of the ranking")
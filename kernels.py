@@ -0,0 +1,342 @@
+from __future__ import division
+import numpy as np
+try:
+    from numba import njit, prange
+except ImportError: # numba is optional, only the numba backend needs it
+    njit = None
+    prange = range
+# a python script define the computation kernels of optimization process i.e. distances, probability mapping and estimated X
+# each kernel has three backends that return the same values:
+# the scalar loops of the original implementation, BLAS based matrix operations in numpy, and parallel numba kernels
+# the backend is selected at runtime by function 'setKernelBackend'
+
+LOOPS_BACKEND="loops" # represent scalar loops, compiled by numba if available
+NUMPY_BACKEND="numpy" # represent matrix operations in numpy
+NUMBA_BACKEND="numba" # represent parallel numba kernels
+
+KERNEL_BACKEND=NUMPY_BACKEND # backend used by the kernels, default is numpy
+_NUMBA_CHUNKS=64 # number of user chunks reduced separately by the parallel numba kernels
+
+
+def setKernelBackend(_backend):
+    """
+        Select the backend used by all kernels in this file.
+        :param _backend: The backend, one of 'loops', 'numpy', 'numba'
+        :return: no returns.
+    """
+    global KERNEL_BACKEND
+    if _backend not in (LOOPS_BACKEND, NUMPY_BACKEND, NUMBA_BACKEND):
+        raise ValueError("Input kernel backend must be a string that choose from ['loops', 'numpy', 'numba']")
+    if _backend == NUMBA_BACKEND and njit is None:
+        raise ValueError("Kernel backend 'numba' needs the numba package")
+    KERNEL_BACKEND = _backend
+
+def getKernelBackend():
+    """
+        Get the backend used by all kernels in this file.
+        :return: returns the name of the current backend.
+    """
+    return KERNEL_BACKEND
+
+def distances(_X, _clusters, _alpha, _N, _P, _k):
+    """
+        Calculate the distance between input X and clusters Z, each attribute weighted by _alpha.
+        :param _X: The input user feature vector
+        :param _clusters: The clusters in the intermediate Z
+        :param _alpha: The weight of each attribute in the input X
+        :param _N: The total user number in input X
+        :param _P: The attribute number in input X
+        :param _k: The number of clusters in the intermediate layer of neural network
+        :return: returns the distance matrix between X and Z.
+    """
+    return _kernels[KERNEL_BACKEND]["distances"](_asarray(_X), _asarray(_clusters), _asarray(_alpha), _N, _P, _k)
+
+def M_nk(_dists, _N, _k):
+    """
+        Calculate the probability of input X maps to clusters Z, i.e. the softmax of negative distances.
+        The softmax is shifted by the smallest distance of each user so that it never underflows.
+        :param _dists: The distance matrix between X and Z
+        :param _N: The total user number in input X
+        :param _k: The number of clusters in the intermediate layer of neural network
+        :return: returns the probability mapping matrix between X and Z.
+    """
+    return _kernels[KERNEL_BACKEND]["M_nk"](_asarray(_dists), _N, _k)
+
+def M_k(_M_nk, _N, _k):
+    """
+        Calculate the summed probability of all input users.
+        :param _M_nk: The probability mapping matrix between X and Z
+        :param _N: The total user number in input X
+        :param _k: The number of clusters in the intermediate layer of neural network
+        :return: returns the summed probability matrix of all users.
+    """
+    return _kernels[KERNEL_BACKEND]["M_k"](_asarray(_M_nk), _N, _k)
+
+def x_n_hat(_X, _M_nk, _clusters, _N, _P, _k):
+    """
+        Calculate the estimated X through clusters Z.
+        :param _X: The input user feature vector
+        :param _M_nk: The probability mapping matrix between X and Z
+        :param _clusters: The clusters in the intermediate Z
+        :param _N: The total user number in input X
+        :param _P: The attribute number in input X
+        :param _k: The number of clusters in the intermediate layer of neural network
+        :return: returns the estimated X and loss between input X and estimated X.
+    """
+    return _kernels[KERNEL_BACKEND]["x_n_hat"](_asarray(_X), _asarray(_M_nk), _asarray(_clusters), _N, _P, _k)
+
+def M_nk_grad(_M_nk, _grad_M_nk, _N, _k):
+    """
+        Back-propagate the gradient of the probability mapping to the distances between X and Z.
+        :param _M_nk: The probability mapping matrix between X and Z
+        :param _grad_M_nk: The gradient of the loss w.r.t. the probability mapping matrix
+        :param _N: The total user number in input X
+        :param _k: The number of clusters in the intermediate layer of neural network
+        :return: returns the gradient of the loss w.r.t. the distance matrix between X and Z.
+    """
+    return _kernels[KERNEL_BACKEND]["M_nk_grad"](_asarray(_M_nk), _asarray(_grad_M_nk), _N, _k)
+
+def distances_grad(_X, _clusters, _alpha, _grad_dists, _N, _P, _k):
+    """
+        Back-propagate the gradient of the distances between X and Z to the clusters Z and the attribute weights.
+        :param _X: The input user feature vector
+        :param _clusters: The clusters in the intermediate Z
+        :param _alpha: The weight of each attribute in the input X
+        :param _grad_dists: The gradient of the loss w.r.t. the distance matrix between X and Z
+        :param _N: The total user number in input X
+        :param _P: The attribute number in input X
+        :param _k: The number of clusters in the intermediate layer of neural network
+        :return: returns the gradient of the loss w.r.t. the clusters and w.r.t. the attribute weights.
+    """
+    return _kernels[KERNEL_BACKEND]["distances_grad"](_asarray(_X), _asarray(_clusters), _asarray(_alpha),
+                                                      _asarray(_grad_dists), _N, _P, _k)
+
+def x_n_hat_grad(_X, _M_nk, _clusters, _x_n_hat, _N, _P, _k):
+    """
+        Calculate the gradient of the loss between input X and estimated X.
+        :param _X: The input user feature vector
+        :param _M_nk: The probability mapping matrix between X and Z
+        :param _clusters: The clusters in the intermediate Z
+        :param _x_n_hat: The estimated X returned by function 'x_n_hat'
+        :param _N: The total user number in input X
+        :param _P: The attribute number in input X
+        :param _k: The number of clusters in the intermediate layer of neural network
+        :return: returns the gradient of the loss w.r.t. the probability mapping matrix and w.r.t. the clusters.
+    """
+    return _kernels[KERNEL_BACKEND]["x_n_hat_grad"](_asarray(_X), _asarray(_M_nk), _asarray(_clusters),
+                                                    _asarray(_x_n_hat), _N, _P, _k)
+
+def _asarray(_array):
+    # numba does not support np.matrix, kernels work on plain float arrays
+    return np.asarray(_array, dtype=np.float64)
+
+# Kernels of the loops backend
+def _distancesLoops(_X, _clusters, _alpha, _N, _P, _k):
+    dists = np.zeros((_N, _k))
+    for i in range(_N):
+        for p in range(_P):
+            for j in range(_k):
+                dists[i, j] += _alpha[p] * (_X[i, p] - _clusters[j, p]) * (_X[i, p] - _clusters[j, p])
+    return dists
+
+def _M_nkLoops(_dists, _N, _k):
+    M_nk = np.zeros((_N, _k))
+    for i in range(_N):
+        min_dist = _dists[i, 0]
+        for j in range(_k):
+            if _dists[i, j] < min_dist:
+                min_dist = _dists[i, j]
+        denom = 0.0
+        for j in range(_k):
+            M_nk[i, j] = np.exp(min_dist - _dists[i, j])
+            denom += M_nk[i, j]
+        for j in range(_k):
+            M_nk[i, j] = M_nk[i, j] / denom
+    return M_nk
+
+def _M_kLoops(_M_nk, _N, _k):
+    M_k = np.zeros(_k)
+    for j in range(_k):
+        for i in range(_N):
+            M_k[j] += _M_nk[i, j]
+        M_k[j] /= _N
+    return M_k
+
+def _x_n_hatLoops(_X, _M_nk, _clusters, _N, _P, _k):
+    x_n_hat = np.zeros((_N, _P))
+    L_x = 0.0
+    for i in range(_N):
+        for p in range(_P):
+            for j in range(_k):
+                x_n_hat[i, p] += _M_nk[i, j] * _clusters[j, p]
+            L_x += (_X[i, p] - x_n_hat[i, p]) * (_X[i, p] - x_n_hat[i, p])
+    L_x = L_x / _N
+    return x_n_hat, L_x
+
+def _M_nk_gradLoops(_M_nk, _grad_M_nk, _N, _k):
+    grad_dists = np.zeros((_N, _k))
+    for i in range(_N):
+        inner = 0.0
+        for j in range(_k):
+            inner += _grad_M_nk[i, j] * _M_nk[i, j]
+        for j in range(_k):
+            grad_dists[i, j] = -1 * _M_nk[i, j] * (_grad_M_nk[i, j] - inner)
+    return grad_dists
+
+def _distances_gradLoops(_X, _clusters, _alpha, _grad_dists, _N, _P, _k):
+    grad_clusters = np.zeros((_k, _P))
+    grad_alpha = np.zeros(_P)
+    for i in range(_N):
+        for p in range(_P):
+            for j in range(_k):
+                diff = _X[i, p] - _clusters[j, p]
+                grad_clusters[j, p] += -2 * _alpha[p] * diff * _grad_dists[i, j]
+                grad_alpha[p] += diff * diff * _grad_dists[i, j]
+    return grad_clusters, grad_alpha
+
+def _x_n_hat_gradLoops(_X, _M_nk, _clusters, _x_n_hat, _N, _P, _k):
+    grad_M_nk = np.zeros((_N, _k))
+    grad_clusters = np.zeros((_k, _P))
+    for i in range(_N):
+        for p in range(_P):
+            residual = -2 * (_X[i, p] - _x_n_hat[i, p]) / _N
+            for j in range(_k):
+                grad_M_nk[i, j] += residual * _clusters[j, p]
+                grad_clusters[j, p] += residual * _M_nk[i, j]
+    return grad_M_nk, grad_clusters
+
+# Kernels of the numpy backend
+def _distancesNumpy(_X, _clusters, _alpha, _N, _P, _k):
+    # sum_p alpha_p*(x_p-c_p)^2 = sum_p alpha_p*x_p^2 - 2*sum_p alpha_p*x_p*c_p + sum_p alpha_p*c_p^2
+    return (np.dot(_X * _X, _alpha)[:, np.newaxis] - 2 * np.dot(_X * _alpha, _clusters.T)
+            + np.dot(_clusters * _clusters, _alpha)[np.newaxis, :])
+
+def _M_nkNumpy(_dists, _N, _k):
+    exp = np.exp(_dists.min(axis=1)[:, np.newaxis] - _dists)
+    return exp / exp.sum(axis=1)[:, np.newaxis]
+
+def _M_kNumpy(_M_nk, _N, _k):
+    return _M_nk.sum(axis=0) / _N
+
+def _x_n_hatNumpy(_X, _M_nk, _clusters, _N, _P, _k):
+    x_n_hat = np.dot(_M_nk, _clusters)
+    residual = _X - x_n_hat
+    return x_n_hat, np.einsum('ij,ij->', residual, residual) / _N
+
+def _M_nk_gradNumpy(_M_nk, _grad_M_nk, _N, _k):
+    inner = np.einsum('ij,ij->i', _grad_M_nk, _M_nk)
+    return -1 * _M_nk * (_grad_M_nk - inner[:, np.newaxis])
+
+def _distances_gradNumpy(_X, _clusters, _alpha, _grad_dists, _N, _P, _k):
+    cluster_grad_sum = _grad_dists.sum(axis=0)
+    grad_dists_X = np.dot(_grad_dists.T, _X)
+    grad_clusters = -2 * _alpha * (grad_dists_X - _clusters * cluster_grad_sum[:, np.newaxis])
+    grad_alpha = (np.dot(_grad_dists.sum(axis=1), _X * _X) - 2 * (_clusters * grad_dists_X).sum(axis=0)
+                  + np.dot(cluster_grad_sum, _clusters * _clusters))
+    return grad_clusters, grad_alpha
+
+def _x_n_hat_gradNumpy(_X, _M_nk, _clusters, _x_n_hat, _N, _P, _k):
+    residual = -2 * (_X - _x_n_hat) / _N
+    return np.dot(residual, _clusters.T), np.dot(_M_nk.T, residual)
+
+# Kernels of the numba backend, parallel over users or over the entries of the reduced output
+def _distancesNumba(_X, _clusters, _alpha, _N, _P, _k):
+    dists = np.zeros((_N, _k))
+    for i in prange(_N):
+        for j in range(_k):
+            dist = 0.0
+            for p in range(_P):
+                diff = _X[i, p] - _clusters[j, p]
+                dist += _alpha[p] * diff * diff
+            dists[i, j] = dist
+    return dists
+
+def _M_nkNumba(_dists, _N, _k):
+    M_nk = np.zeros((_N, _k))
+    for i in prange(_N):
+        min_dist = _dists[i, 0]
+        for j in range(_k):
+            min_dist = min(min_dist, _dists[i, j])
+        denom = 0.0
+        for j in range(_k):
+            M_nk[i, j] = np.exp(min_dist - _dists[i, j])
+            denom += M_nk[i, j]
+        for j in range(_k):
+            M_nk[i, j] = M_nk[i, j] / denom
+    return M_nk
+
+def _M_kNumba(_M_nk, _N, _k):
+    # users are split into chunks, each chunk reduces into its own row to avoid write conflicts between threads
+    chunk_N = min(_N, _NUMBA_CHUNKS)
+    partial = np.zeros((chunk_N, _k))
+    for c in prange(chunk_N):
+        for i in range(c * _N // chunk_N, (c + 1) * _N // chunk_N):
+            for j in range(_k):
+                partial[c, j] += _M_nk[i, j]
+    return partial.sum(axis=0) / _N
+
+def _x_n_hatNumba(_X, _M_nk, _clusters, _N, _P, _k):
+    x_n_hat = np.zeros((_N, _P))
+    L_x = 0.0
+    for i in prange(_N):
+        for p in range(_P):
+            x_hat = 0.0
+            for j in range(_k):
+                x_hat += _M_nk[i, j] * _clusters[j, p]
+            x_n_hat[i, p] = x_hat
+            L_x += (_X[i, p] - x_hat) * (_X[i, p] - x_hat)
+    return x_n_hat, L_x / _N
+
+def _M_nk_gradNumba(_M_nk, _grad_M_nk, _N, _k):
+    grad_dists = np.zeros((_N, _k))
+    for i in prange(_N):
+        inner = 0.0
+        for j in range(_k):
+            inner += _grad_M_nk[i, j] * _M_nk[i, j]
+        for j in range(_k):
+            grad_dists[i, j] = -1 * _M_nk[i, j] * (_grad_M_nk[i, j] - inner)
+    return grad_dists
+
+def _distances_gradNumba(_X, _clusters, _alpha, _grad_dists, _N, _P, _k):
+    # users are split into chunks, each chunk reduces into its own slice to avoid write conflicts between threads
+    chunk_N = min(_N, _NUMBA_CHUNKS)
+    partial_clusters = np.zeros((chunk_N, _k, _P))
+    partial_alpha = np.zeros((chunk_N, _P))
+    for c in prange(chunk_N):
+        for i in range(c * _N // chunk_N, (c + 1) * _N // chunk_N):
+            for j in range(_k):
+                for p in range(_P):
+                    diff = _X[i, p] - _clusters[j, p]
+                    partial_clusters[c, j, p] += diff * _grad_dists[i, j]
+                    partial_alpha[c, p] += diff * diff * _grad_dists[i, j]
+    grad_clusters = -2 * _alpha * partial_clusters.sum(axis=0)
+    return grad_clusters, partial_alpha.sum(axis=0)
+
+def _x_n_hat_gradNumba(_X, _M_nk, _clusters, _x_n_hat, _N, _P, _k):
+    chunk_N = min(_N, _NUMBA_CHUNKS)
+    grad_M_nk = np.zeros((_N, _k))
+    partial_clusters = np.zeros((chunk_N, _k, _P))
+    for c in prange(chunk_N):
+        for i in range(c * _N // chunk_N, (c + 1) * _N // chunk_N):
+            for p in range(_P):
+                residual = -2 * (_X[i, p] - _x_n_hat[i, p]) / _N
+                for j in range(_k):
+                    grad_M_nk[i, j] += residual * _clusters[j, p]
+                    partial_clusters[c, j, p] += residual * _M_nk[i, j]
+    return grad_M_nk, partial_clusters.sum(axis=0)
+
+_KERNEL_NAMES = ["distances", "M_nk", "M_k", "x_n_hat", "M_nk_grad", "distances_grad", "x_n_hat_grad"]
+
+def _buildKernels(_suffix, _decorator):
+    kernels = {}
+    for name in _KERNEL_NAMES:
+        kernel = globals()["_" + name + _suffix]
+        kernels[name] = _decorator(kernel) if _decorator is not None else kernel
+    return kernels
+
+# kernels of each backend, numba compiles them lazily on first call
+_kernels = {
+    LOOPS_BACKEND: _buildKernels("Loops", njit),
+    NUMPY_BACKEND: _buildKernels("Numpy", None),
+    NUMBA_BACKEND: _buildKernels("Numba", njit(parallel=True, fastmath=True) if njit is not None else None),
+}
@@ -1,437 +1,993 @@
-from __future__ import division
-import numpy as np
-import math
-from scipy.stats import spearmanr
-from scipy.stats import pearsonr
-import dataGenerator
-# a python script define computation of fairness measures and accuracy measures
-# test of this script can be found in testMeasures.py
-
-KL_DIVERGENCE="rKL" # represent kl-divergence group fairness measure
-ND_DIFFERENCE="rND" # represent normalized difference group fairness measure
-RD_DIFFERENCE="rRD" # represent ratio difference group fairness measure
-LOG_BASE=2 # log base used in logorithm function
-
-NORM_CUTPOINT=10 # cut-off point used in normalizer computation
-NORM_ITERATION=10 # max iterations used in normalizer computation
-NORM_FILE="normalizer.txt" # externally text file for normalizers
-
-
-def calculateNDFairness(_ranking,_protected_group,_cut_point,_gf_measure,_normalizer):
-    """
-        Calculate group fairness value of the whole ranking.
-        Calls function 'calculateFairness' in the calculation.
-
-        :param _ranking: A permutation of N numbers (0..N-1) that represents a ranking of N individuals, 
-                                e.g., [0, 3, 5, 2, 1, 4].  Each number is an identifier of an individual.
-                                Stored as a python array.
-        :param _protected_group: A set of identifiers from _ranking that represent members of the protected group
-                                e.g., [0, 2, 3].  Stored as a python array for convenience, order does not matter.
-        :param _cut_point: Cut range for the calculation of group fairness, e.g., 10, 20, 30,...
-        :param _gf_measure:  Group fairness measure to be used in the calculation, 
-                            one of 'rKL', 'rND', 'rRD'.
-        :param _normalizer: The normalizer of the input _gf_measure that is computed externally for efficiency.
-        :return: returns  fairness value of _ranking, a float, normalized to [0, 1]
-    """
-    
-    # error handling for ranking and protected group
-    dataGenerator.completeCheckRankingProperties(_ranking,_protected_group)
-    # error handling for input type 
-    if not isinstance( _cut_point, ( int, long ) ):
-        raise TypeError("Input batch size must be an integer larger than 0")
-    if not isinstance( _normalizer, (int, long, float, complex) ):
-        raise TypeError("Input normalizer must be a number larger than 0")
-    if not isinstance( _gf_measure, str ):
-        raise TypeError("Input group fairness measure must be a string that choose from ['rKL', 'rND', 'rRD']")
-    
-    user_N=len(_ranking)
-    pro_N=len(_protected_group)
-
-    # error handling for input value
-    if NORM_CUTPOINT > user_N:
-        raise ValueError("Batch size should be less than input ranking's length")
-    
-    discounted_gf=0 #initialize the returned gf value
-    for countni in range(user_N):
-        countni=countni+1
-        if(countni%_cut_point ==0):
-            ranking_cutpoint=_ranking[0:countni]
-            pro_cutpoint=set(ranking_cutpoint).intersection(_protected_group)
-
-            gf=calculateFairness(ranking_cutpoint,pro_cutpoint,user_N,pro_N,_gf_measure)
-            discounted_gf+=gf/math.log(countni+1,LOG_BASE) # log base -> global variable
-            
-            # make a call to compute, or look up, the normalizer; make sure to check that it's not 0!
-            # generally, think about error handling
-
-    if _normalizer==0:
-        raise ValueError("Normalizer equals to zero")
-    return discounted_gf/_normalizer
-
-
-
-def calculateFairness(_ranking,_protected_group,_user_N,_pro_N,_gf_measure):
-    """
-        Calculate the group fairness value of input ranking.
-        Called by function 'calculateNDFairness'.
-
-        :param _ranking: A permutation of N numbers (0..N-1) that represents a ranking of N individuals, 
-                                e.g., [0, 3, 5, 2, 1, 4].  Each number is an identifier of an individual.
-                                Stored as a python array.
-                                Can be a total ranking of input data or a partial ranking of input data.
-        :param _protected_group: A set of identifiers from _ranking that represent members of the protected group
-                                e.g., [0, 2, 3].  Stored as a python array for convenience, order does not matter.
-        :param _user_N: The size of input items 
-        :param _pro_N: The size of input protected group
-        :param _gf_measure: The group fairness measure to be used in calculation        
-        :return: returns the value of selected group fairness measure of this input ranking
-    """
-      
-    ranking_k=len(_ranking)
-    pro_k=len(_protected_group)
-    if _gf_measure==KL_DIVERGENCE: #for KL-divergence difference
-        gf=calculaterKL(ranking_k,pro_k,_user_N,_pro_N)        
-        
-    elif _gf_measure==ND_DIFFERENCE:#for normalized difference
-        gf=calculaterND(ranking_k,pro_k,_user_N,_pro_N)
-
-    elif _gf_measure==RD_DIFFERENCE: #for ratio difference
-        gf=calculaterRD(ranking_k,pro_k,_user_N,_pro_N)     
-
-    return gf 
-
-def calculaterKL(_ranking_k,_pro_k,_user_N,_pro_N):
-    """
-        Calculate the KL-divergence difference of input ranking        
-        :param _ranking_k: A permutation of k numbers that represents a ranking of k individuals, 
-                                e.g., [0, 3, 5, 2, 1, 4].  Each number is an identifier of an individual.
-                                Stored as a python array.
-                                Can be a total ranking of input data or a partial ranking of input data.
-        :param _pro_k: A set of identifiers from _ranking_k that represent members of the protected group
-                                e.g., [0, 2, 3].  Stored as a python array for convenience, order does not matter.
-        :param _user_N: The size of input items 
-        :param _pro_N: The size of input protected group                
-        :return: returns the value of KL-divergence difference of this input ranking
-    """
-    px=_pro_k/(_ranking_k)
-    qx=_pro_N/_user_N
-    if px==0 or px ==1: # manually set the value of extreme case to avoid error of math.log function 
-        px=0.001
-    if qx == 0 or qx ==1:
-        qx=0.001
-    return (px*math.log(px/qx,LOG_BASE)+(1-px)*math.log((1-px)/(1-qx),LOG_BASE))
-
-def calculaterND(_ranking_k,_pro_k,_user_N,_pro_N):
-    """
-        Calculate the normalized difference of input ranking        
-        :param _ranking_k: A permutation of k numbers that represents a ranking of k individuals, 
-                                e.g., [0, 3, 5, 2, 1, 4].  Each number is an identifier of an individual.
-                                Stored as a python array.
-                                Can be a total ranking of input data or a partial ranking of input data.
-        :param _pro_k: A set of identifiers from _ranking_k that represent members of the protected group
-                                e.g., [0, 2, 3].  Stored as a python array for convenience, order does not matter.
-        :param _user_N: The size of input items 
-        :param _pro_N: The size of input protected group                
-        :return: returns the value of normalized difference of this input ranking
-    """
-    return abs(_pro_k/_ranking_k-_pro_N/_user_N)
-
-def calculaterRD(_ranking_k,_pro_k,_user_N,_pro_N):
-    """
-        Calculate the ratio difference of input ranking        
-        :param _ranking_k: A permutation of k numbers that represents a ranking of k individuals, 
-                                e.g., [0, 3, 5, 2, 1, 4].  Each number is an identifier of an individual.
-                                Stored as a python array.
-                                Can be a total ranking of input data or a partial ranking of input data.
-        :param _pro_k: A set of identifiers from _ranking_k that represent members of the protected group
-                                e.g., [0, 2, 3].  Stored as a python array for convenience, order does not matter.
-        :param _user_N: The size of input items 
-        :param _pro_N: The size of input protected group                
-        :return: returns the value of ratio difference of this input ranking
-        # This version of rRD is consistent with poster of FATML instead of arXiv submission.
-    """
-    input_ratio=_pro_N/(_user_N-_pro_N)
-    unpro_k=_ranking_k-_pro_k
-    
-    if unpro_k==0: # manually set the case of denominator equals zero
-        current_ratio=0
-    else:
-        current_ratio=_pro_k/unpro_k
-
-    min_ratio=min(input_ratio,current_ratio)
-       
-    return abs(min_ratio-input_ratio)
-
-def getNormalizer(_user_N,_pro_N,_gf_measure):
-    """
-        Retrieve the normalizer of the current setting in external normalizer dictionary.
-        If not founded, call function 'calculateNormalizer' to calculate the normalizer of input group fairness measure at current setting.
-        Called separately from fairness computation for efficiency.
-
-        :param _user_N: The total user number of input ranking
-        :param _pro_N: The size of protected group in the input ranking        
-        :param _gf_measure: The group fairness measure to be used in calculation
-        
-        :return: returns the maximum value of selected group fairness measure in _max_iter iterations
-    """
-    # read the normalizor dictionary that is computed externally for efficiency
-    normalizer_dic=readNormalizerDictionary()
-
-    # error handling for type  
-    if not isinstance( _user_N, ( int, long ) ):
-        raise TypeError("Input user number must be an integer")
-    if not isinstance( _pro_N, ( int, long ) ):
-        raise TypeError("Input size of protected group must be an integer")
-    if not isinstance( _gf_measure, str ):
-        raise TypeError("Input group fairness measure must be a string that choose from ['rKL', 'rND', 'rRD']")
-    # error handling for value 
-    if _user_N <=0:
-        raise ValueError("Input a valud user number")
-    if _pro_N <=0:
-        raise ValueError("Input a valid protected group size")
-    if _pro_N >= _user_N:
-        raise ValueError("Input a valid protected group size")
-
-
-    current_normalizer_key=str(_user_N)+","+str(_pro_N)+","+_gf_measure
-    if current_normalizer_key in normalizer_dic.keys():
-        normalizer=normalizer_dic[current_normalizer_key]
-    else:
-        normalizer=calculateNormalizer(_user_N,_pro_N,_gf_measure)           
-    return float(normalizer)
-
-def readNormalizerDictionary():
-    """
-        Retrieve recorded normalizer from external txt file that is computed external for efficiency.
-        Normalizer file is a txt file that each row represents the normalizer of a combination of user number and protected group number.
-        Has the format like this: user_N,pro_N,_gf_measure:normalizer
-        Called by function 'getNormalizer'.
-
-        :param : no parameter needed. The name of normalizer file is constant.     
-        :return: returns normalizer dictionary computed externally.
-    """
-    try:
-        with open(NORM_FILE) as f:
-            lines = f.readlines()
-    except EnvironmentError as e:
-        print("Cannot find the normalizer txt file")
-    
-    
-    normalizer_dic={}
-    for line in lines:
-        normalizer=line.split(":")
-        normalizer_dic[normalizer[0]]=normalizer[1]
-    return normalizer_dic
-
-def calculateNormalizer(_user_N,_pro_N,_gf_measure):
-    """
-        Calculate the normalizer of input group fairness measure at input user and protected group setting.
-        The function use two constant: NORM_ITERATION AND NORM_CUTPOINT to specify the max iteration and batch size used in the calculation.
-        First, get the maximum value of input group fairness measure at different fairness probability.
-        Run the above calculation NORM_ITERATION times.
-        Then compute the average value of above results as the maximum value of each fairness probability.
-        Finally, choose the maximum of value as the normalizer of this group fairness measure.
-        
-        :param _user_N: The total user number of input ranking
-        :param _pro_N: The size of protected group in the input ranking 
-        :param _gf_measure: The group fairness measure to be used in calculation 
-        
-        :return: returns the group fairness value for the unfair ranking generated at input setting
-
-    """
-    # set the range of fairness probability based on input group fairness measure
-    if _gf_measure==RD_DIFFERENCE: # if the group fairness measure is rRD, then use 0.5 as normalization range
-        f_probs=[0,0.5] 
-    else:
-        f_probs=[0,0.98] 
-    avg_maximums=[] #initialize the lists of average results of all iteration
-    for fpi in f_probs:
-        iter_results=[] #initialize the lists of results of all iteration
-        for iteri in range(NORM_ITERATION):
-            input_ranking=[x for x in range(_user_N)]
-            protected_group=[x for x in range(_pro_N)]
-            # generate unfair ranking using algorithm
-            unfair_ranking=dataGenerator.generateUnfairRanking(input_ranking,protected_group,fpi)    
-            # calculate the non-normalized group fairness value i.e. input normalized value as 1
-            gf=calculateNDFairness(unfair_ranking,protected_group,NORM_CUTPOINT,_gf_measure,1)
-            iter_results.append(gf)
-        avg_maximums.append(np.mean(iter_results))        
-    return max(avg_maximums)
-
-def calculateScoreDifference(_scores1,_scores2):
-    """
-        Calculate the average position-wise score difference
-        between two sorted lists.  Lists are sorted in decreasing
-        order of scores.  If lists are not sorted by descending- error.
-
-        Only applied for two score lists with same size. 
-        # check for no division by 0
-        # check that each list is sorted in decreasing order of score
-
-        :param _scores1: The first list of scores
-        :param _scores2: The second list of scores         
-        :return: returns the average score difference of two input score lists.
-
-    """
-    # error handling 
-    if not isinstance(_scores1, (list, tuple, np.ndarray)) and not isinstance( _scores1, basestring ):
-        raise TypeError("First score list must be a list-wise structure defined by '[]' symbol")
-    if not isinstance(_scores2, (list, tuple, np.ndarray)) and not isinstance( _scores2, basestring ):
-        raise TypeError("Second score list must be a list-wise structure defined by '[]' symbol")
-    
-    if len(_scores1)*len(_scores2) ==0:
-        raise ValueError("Input score lists should have length larger than 0")
-        
-    if not descendingOrderCheck(_scores1):
-        raise ValueError("First score list is not ordered by descending order")
-    if not descendingOrderCheck(_scores2):
-        raise ValueError("Second score list is not ordered by descending order")
-
-    user_N=min(len(_scores1),len(_scores2)) # get the minimum user number of two score lists
-    score_diff = 0
-    for xi in range(user_N):        
-        score_diff+=abs(_scores1[xi]-_scores2[xi])         
-    score_diff=score_diff/user_N
-    return score_diff
-
-def calculatePositionDifference(_perm1,_perm2):
-    """
-        Calculate the average position difference for each item, 
-        between two permutations of the same items.
-        CHECK THAT EACH list is a valid permutation
-        CHECK that lists are of the same size
-
-        :param _perm1: The first permutation
-        :param _perm2: The second permutation         
-        :return: returns the average position difference of two input score lists.
-
-    """
-    completePermutaionCheck(_perm1,_perm2)
-    user_N=len(_perm1) # get the total user number of two score list
-
-    position_diff = 0
-    positions_perm1=[]
-    for ui in range(user_N):
-        for pi in range(len(_perm1)):
-            if ui==_perm1[pi]:
-                positions_perm1.append(pi)
-    positions_perm2=[]
-    for ui in range(user_N):
-        for pi in range(len(_perm2)):
-            if ui==_perm2[pi]:
-                positions_perm2.append(pi)    
-    
-    for i in range(user_N):        
-        position_diff+=abs(positions_perm1[i]-positions_perm2[i])
-    # get the average value of position difference
-    if(user_N%2==0):
-        position_diff=(2*position_diff)/(user_N*user_N)
-    else:
-        position_diff=(2*position_diff)/(user_N*user_N-1)
-    return position_diff
-
-def calculateKendallDistance(_perm1,_perm2):
-    """
-        Calculate the kendall distance between two permutations of the same items.
-
-        :param _perm1: The first permutation
-        :param _perm2: The second permutation         
-        :return: returns the kendall distance between two permutations.
-
-    """
-    completePermutaionCheck(_perm1,_perm2)
-    user_N=len(_perm1)    
-    swapped_pairs = 0
-    for i in _perm1:
-        for j in _perm1:
-            if _perm1.index(i)>_perm1.index(j):
-                if _perm2.index(i)<_perm2.index(j):
-                    swapped_pairs += 1
-            elif _perm1.index(i)<_perm1.index(j):
-                if _perm2.index(i)>_perm2.index(j):
-                    swapped_pairs += 1    
-    return swapped_pairs/(user_N*(user_N-1))
-
-
-def calculateSpearmanR(_scores1,_scores2):
-
-    """
-        Use function 'spearmanr' in scipy.stats package to calculate spearman correlation coefficient between two score lists.
-        Only applied for two score lists with same size.
-
-        :param _scores1: The first list of scores stored in a python list
-        :param _scores2: The second list of scores stored in a python list        
-        :return: returns the spearman correlation coefficient between two input score lists, ignore the p-value to test for non-correlation. 
-    """
-    # error handling for input type
-    if not isinstance(_scores1, (list, tuple, np.ndarray)) and not isinstance( _scores1, basestring ):
-        raise TypeError("First score list must be a list-wise structure defined by '[]' symbol")
-    if not isinstance(_scores2, (list, tuple, np.ndarray)) and not isinstance( _scores2, basestring ):
-        raise TypeError("Second score list must be a list-wise structure defined by '[]' symbol")
-    # error handling for input value
-    if len(_scores1)*len(_scores2) ==0:
-        raise ValueError("Input score lists should have length larger than 0")
-    if len(_scores1) != len(_scores2):
-        raise ValueError("Input two score lists should have same size")   
-    
-    return spearmanr(_scores1,_scores2)[0]
-
-def calculatePearsonC(_scores1,_scores2):
-
-    """
-        Use function 'pearsonr' in scipy.stats package to calculate pearson correlation coefficient between two score lists.
-        Only applied for two score lists with same size.
-        
-        :param _scores1: The first list of scores stored in a python list
-        :param _scores2: The second list of scores stored in a python list        
-        :return: returns the pearson correlation coefficient between two input score lists, ignore the p-value to test for non-correlation.
-    """
-    # error handling for input type
-    if not isinstance(_scores1, (list, tuple, np.ndarray)) and not isinstance( _scores1, basestring ):
-        raise TypeError("First score list must be a list-wise structure defined by '[]' symbol")
-    if not isinstance(_scores2, (list, tuple, np.ndarray)) and not isinstance( _scores2, basestring ):
-        raise TypeError("Second score list must be a list-wise structure defined by '[]' symbol")
-    # error handling for input value
-    if len(_scores1)*len(_scores2) ==0:
-        raise ValueError("Input score lists should have length larger than 0")
-    if len(_scores1) != len(_scores2):
-        raise ValueError("Input two score lists should have same size")   
-    
-    return pearsonr(_scores1,_scores2)[0]
-
-# Functions for error handling
-def descendingOrderCheck(_ordered_list):
-    """
-        Check whether the input list is ordered descending. 
-        
-        :param _ordered_list: The input list that is ordered by descending order         
-        :return: returns true if order of _ordered_list is descending else returns false.
-
-    """       
-    return all(earlier >= later for earlier, later in zip(_ordered_list, _ordered_list[1:]))
-
-def completePermutaionCheck(_perm1,_perm2):
-    """
-        Check the valid of two input permutations. 
-
-        :param _perm1: The first permutation
-        :param _perm2: The second permutation         
-        :return: no returns. Raise error if founded.
-
-    """
-    
-    if not isinstance(_perm1, (list, tuple, np.ndarray)) and not isinstance( _perm1, basestring ):
-        raise TypeError("First permutation must be a list-wise structure defined by '[]' symbol")
-    if not isinstance(_perm2, (list, tuple, np.ndarray)) and not isinstance( _perm2, basestring ):
-        raise TypeError("Second permutation must be a list-wise structure defined by '[]' symbol")
-    
-    # error handling for complete permutation
-    if len(_perm1)*len(_perm2) ==0:
-        raise ValueError("Input permutations should have length larger than 0")
-        
-    if len(set(_perm1)) < len(_perm1):
-        raise ValueError("First permutation include repetitive items")
-    if len(set(_perm2)) < len(_perm2):
-        raise ValueError("Second permutation include repetitive items")    
-    if len(_perm1) != len(_perm2):
+from __future__ import division
+import numpy as np
+import math
+import os
+import errno
+import tempfile
+try:
+    import fcntl
+except ImportError: # file locking is not available on Windows
+    fcntl=None
+from scipy.stats import spearmanr
+from scipy.stats import pearsonr
+import dataGenerator
+from protectedGroup import ProtectedGroup
+import rankingValidation
+# a python script define computation of fairness measures and accuracy measures
+# test of this script can be found in testMeasures.py
+
+KL_DIVERGENCE="rKL" # represent kl-divergence group fairness measure
+ND_DIFFERENCE="rND" # represent normalized difference group fairness measure
+RD_DIFFERENCE="rRD" # represent ratio difference group fairness measure
+LOG_BASE=2 # log base used in logorithm function
+
+NORM_CUTPOINT=10 # cut-off point used in normalizer computation
+NORM_ITERATION=10 # max iterations used in normalizer computation
+NORM_FILE="normalizer.txt" # externally text file for normalizers
+NORM_STOCHASTIC="stochastic" # represent normalizer averaged over randomly generated unfair rankings
+NORM_EXACT="exact" # represent normalizer computed analytically from the group-first rankings
+NORM_MODE=NORM_STOCHASTIC # default mode used in normalizer computation
+
+_normalizer_cache=None # process-level normalizer cache, loaded lazily from NORM_FILE
+
+
+def calculateNDFairness(_ranking,_protected_group,_cut_point,_gf_measure,_normalizer,_validation=None):
+    """
+        Calculate group fairness value of the whole ranking.
+        Calls function 'calculateDiscountedFairness' in the calculation.
+
+        :param _ranking: A permutation of N numbers (0..N-1) that represents a ranking of N individuals, 
+                                e.g., [0, 3, 5, 2, 1, 4].  Each number is an identifier of an individual.
+                                Stored as a python array.
+        :param _protected_group: A set of identifiers from _ranking that represent members of the protected group
+                                e.g., [0, 2, 3].  Stored as a python array for convenience, order does not matter.
+                                Can be a ProtectedGroup to skip building sets of the protected group.
+        :param _cut_point: Cut range for the calculation of group fairness, e.g., 10, 20, 30,...
+        :param _gf_measure:  Group fairness measure to be used in the calculation, 
+                            one of 'rKL', 'rND', 'rRD'.
+        :param _normalizer: The normalizer of the input _gf_measure that is computed externally for efficiency.
+        :param _validation: The validation mode of _ranking and _protected_group, one of 'full', 'sampled', 'trusted',
+                            default is the global mode of rankingValidation.py
+        :return: returns  fairness value of _ranking, a float, normalized to [0, 1]
+    """
+    
+    # error handling for ranking and protected group
+    dataGenerator.completeCheckRankingProperties(_ranking,_protected_group,_validation)
+    # error handling for input type 
+    if not isinstance( _cut_point, ( int, long ) ):
+        raise TypeError("Input batch size must be an integer larger than 0")
+    if not isinstance( _normalizer, (int, long, float, complex) ):
+        raise TypeError("Input normalizer must be a number larger than 0")
+    if not isinstance( _gf_measure, str ):
+        raise TypeError("Input group fairness measure must be a string that choose from ['rKL', 'rND', 'rRD']")
+    
+    user_N=len(_ranking)
+    pro_N=len(_protected_group)
+
+    # error handling for input value
+    if NORM_CUTPOINT > user_N:
+        raise ValueError("Batch size should be less than input ranking's length")
+    
+    # evaluate all cut points at once on the prefix sums of protected membership
+    pro_mask=getProtectedMask(_ranking,_protected_group)
+    discounted_gf=calculateDiscountedFairness(pro_mask,pro_N,_cut_point,_gf_measure)
+
+    if _normalizer==0:
+        raise ValueError("Normalizer equals to zero")
+    return float(discounted_gf/_normalizer)
+
+def calculateNDFairnessBatch(_rankings,_protected_group,_cut_point,_gf_measures,_normalizers,_validation=None):
+    """
+        Calculate group fairness values of many rankings of the same items over one protected group.
+        Validation of the protected group is done once, and all rankings and measures share one vectorized pass.
+
+        :param _rankings: A 2-D array with one ranking per row, each row a permutation of the same N identifiers
+        :param _protected_group: A set of identifiers from _rankings that represent members of the protected group
+                                e.g., [0, 2, 3].  Stored as a python array for convenience, order does not matter.
+                                Can be a ProtectedGroup to skip building sets of the protected group.
+        :param _cut_point: Cut range for the calculation of group fairness, e.g., 10, 20, 30,...
+        :param _gf_measures: The list of group fairness measures to be used in the calculation,
+                            each one of 'rKL', 'rND', 'rRD'.
+        :param _normalizers: The list of normalizers of each measure in _gf_measures.
+        :param _validation: The validation mode of _rankings and _protected_group, one of 'full', 'sampled', 'trusted',
+                            default is the global mode of rankingValidation.py. Only 'full' checks the items of every row
+        :return: returns a (rankings x measures) array of normalized fairness values,
+                 each value equals the output of 'calculateNDFairness' on that row and measure
+    """
+    rankings=np.asarray(_rankings)
+    # error handling for input type
+    if rankings.ndim != 2:
+        raise TypeError("Input rankings must be a 2-D array that stores one ranking per row")
+    if not isinstance( _cut_point, ( int, long ) ):
+        raise TypeError("Input batch size must be an integer larger than 0")
+    if not isinstance(_gf_measures, (list, tuple)) or not isinstance(_normalizers, (list, tuple, np.ndarray)):
+        raise TypeError("Input group fairness measures and normalizers must be list-wise structures defined by '[]' symbol")
+    if len(_gf_measures) != len(_normalizers):
+        raise ValueError("Input group fairness measures and normalizers should have same size")
+    for gfi, normi in zip(_gf_measures,_normalizers):
+        if not isinstance( gfi, str ):
+            raise TypeError("Input group fairness measure must be a string that choose from ['rKL', 'rND', 'rRD']")
+        if normi==0:
+            raise ValueError("Normalizer equals to zero")
+
+    # error handling for ranking and protected group on the first ranking only
+    dataGenerator.completeCheckRankingProperties(rankings[0],_protected_group,_validation)
+    # every other ranking must hold exactly the items of the first one
+    if rankingValidation.resolveValidation(_validation) == rankingValidation.VALIDATE_FULL:
+        sorted_items=np.sort(rankings[0])
+        if not (np.sort(rankings,axis=1)==sorted_items).all():
+            raise ValueError("Please input rankings that are permutations of the same items")
+
+    ranking_N,user_N=rankings.shape
+    pro_N=len(_protected_group)
+
+    # error handling for input value
+    if NORM_CUTPOINT > user_N:
+        raise ValueError("Batch size should be less than input ranking's length")
+
+    pro_mask=getProtectedMask(rankings,_protected_group)
+    gf_results=np.zeros((ranking_N,len(_gf_measures)))
+    for gfi in range(len(_gf_measures)):
+        discounted_gf=calculateDiscountedFairness(pro_mask,pro_N,_cut_point,_gf_measures[gfi])
+        gf_results[:,gfi]=discounted_gf/_normalizers[gfi]
+    return gf_results
+
+def calculatePrefixNDFairness(_top_k,_protected_lookup,_user_N,_pro_N,_cut_point,_gf_measure,_normalizer):
+    """
+        Calculate group fairness value of the top-k prefix of a ranking, without the rest of the ranking.
+        Only the cut points inside the prefix are evaluated, so the cost is O(k).
+        For a complete ranking the value equals the output of 'calculateNDFairness'.
+
+        :param _top_k: The identifiers of the top-k individuals of a ranking in ranking order, e.g., [0, 3, 5].
+        :param _protected_lookup: The protected membership of individuals, one of a ProtectedGroup, a set or dictionary
+                                of protected identifiers, a boolean array indexed by identifier, or a function from identifier to True or False.
+        :param _user_N: The size of all individuals of the ranking
+        :param _pro_N: The size of protected group among all individuals of the ranking
+        :param _cut_point: Cut range for the calculation of group fairness, e.g., 10, 20, 30,...
+        :param _gf_measure:  Group fairness measure to be used in the calculation, 
+                            one of 'rKL', 'rND', 'rRD'.
+        :param _normalizer: The normalizer of the input _gf_measure at this prefix, see 'getNormalizer' with _prefix_k.
+        :return: returns  fairness value of the prefix, a float, normalized to [0, 1]
+    """
+    # error handling for input type
+    if not isinstance(_top_k, (list, tuple, np.ndarray)):
+        raise TypeError("Input ranking must be a list-wise structure defined by '[]' symbol")
+    if not isinstance( _user_N, ( int, long ) ):
+        raise TypeError("Input user number must be an integer")
+    if not isinstance( _pro_N, ( int, long ) ):
+        raise TypeError("Input size of protected group must be an integer")
+    if not isinstance( _cut_point, ( int, long ) ):
+        raise TypeError("Input batch size must be an integer larger than 0")
+    if not isinstance( _normalizer, (int, long, float, complex) ):
+        raise TypeError("Input normalizer must be a number larger than 0")
+    if not isinstance( _gf_measure, str ):
+        raise TypeError("Input group fairness measure must be a string that choose from ['rKL', 'rND', 'rRD']")
+
+    ranking_k=len(_top_k)
+    # error handling for input value
+    if ranking_k > _user_N:
+        raise ValueError("Input prefix should not be longer than the ranking")
+    if ranking_k < _cut_point:
+        raise ValueError("Input prefix length must not be less than the cut point, a shorter prefix has no cut point to evaluate")
+    if _pro_N <= 0 or _pro_N >= _user_N:
+        raise ValueError("Input a valid protected group size")
+    if len(set(_top_k)) != ranking_k: # check for repetition in input prefix
+        raise ValueError("Please input a valid prefix of a complete ranking")
+
+    pro_mask=getPrefixProtectedMask(_top_k,_protected_lookup)
+    prefix_pro_N=int(pro_mask.sum())
+    if prefix_pro_N > _pro_N or ranking_k-prefix_pro_N > _user_N-_pro_N:
+        raise ValueError("Input prefix does not match the size of protected group")
+    discounted_gf=calculateDiscountedFairness(pro_mask,_pro_N,_cut_point,_gf_measure,_user_N)
+
+    if _normalizer==0:
+        raise ValueError("Normalizer equals to zero")
+    return float(discounted_gf/_normalizer)
+
+def getPrefixProtectedMask(_top_k,_protected_lookup):
+    """
+        Build the protected membership of each position of a prefix by looking up its identifiers only.
+        Called by function 'calculatePrefixNDFairness'.
+
+        :param _top_k: The identifiers of the top-k individuals of a ranking
+        :param _protected_lookup: A ProtectedGroup, a set or dictionary of protected identifiers,
+                                a boolean array indexed by identifier, or a function from identifier to True or False
+        :return: returns a boolean array of the prefix length, True where the individual is protected
+    """
+    if isinstance(_protected_lookup, ProtectedGroup):
+        return _protected_lookup.getMask(_top_k)
+    if isinstance(_protected_lookup, np.ndarray):
+        return _protected_lookup[np.asarray(_top_k,dtype=int)].astype(bool)
+    if isinstance(_protected_lookup, (set, frozenset, dict)):
+        return np.array([x in _protected_lookup for x in _top_k],dtype=bool)
+    if callable(_protected_lookup):
+        return np.array([bool(_protected_lookup(x)) for x in _top_k],dtype=bool)
+    raise TypeError("Input protected lookup must be a set, a dictionary, a boolean array or a function")
+
+def calculateFairness(_ranking,_protected_group,_user_N,_pro_N,_gf_measure):
+    """
+        Calculate the group fairness value of input ranking.
+        Called by function 'calculateNDFairness'.
+
+        :param _ranking: A permutation of N numbers (0..N-1) that represents a ranking of N individuals, 
+                                e.g., [0, 3, 5, 2, 1, 4].  Each number is an identifier of an individual.
+                                Stored as a python array.
+                                Can be a total ranking of input data or a partial ranking of input data.
+        :param _protected_group: A set of identifiers from _ranking that represent members of the protected group
+                                e.g., [0, 2, 3].  Stored as a python array for convenience, order does not matter.
+        :param _user_N: The size of input items 
+        :param _pro_N: The size of input protected group
+        :param _gf_measure: The group fairness measure to be used in calculation        
+        :return: returns the value of selected group fairness measure of this input ranking
+    """
+      
+    ranking_k=len(_ranking)
+    pro_k=len(_protected_group)
+    if _gf_measure==KL_DIVERGENCE: #for KL-divergence difference
+        gf=calculaterKL(ranking_k,pro_k,_user_N,_pro_N)        
+        
+    elif _gf_measure==ND_DIFFERENCE:#for normalized difference
+        gf=calculaterND(ranking_k,pro_k,_user_N,_pro_N)
+
+    elif _gf_measure==RD_DIFFERENCE: #for ratio difference
+        gf=calculaterRD(ranking_k,pro_k,_user_N,_pro_N)     
+
+    return gf 
+
+def calculaterKL(_ranking_k,_pro_k,_user_N,_pro_N):
+    """
+        Calculate the KL-divergence difference of input ranking        
+        :param _ranking_k: A permutation of k numbers that represents a ranking of k individuals, 
+                                e.g., [0, 3, 5, 2, 1, 4].  Each number is an identifier of an individual.
+                                Stored as a python array.
+                                Can be a total ranking of input data or a partial ranking of input data.
+        :param _pro_k: A set of identifiers from _ranking_k that represent members of the protected group
+                                e.g., [0, 2, 3].  Stored as a python array for convenience, order does not matter.
+        :param _user_N: The size of input items 
+        :param _pro_N: The size of input protected group                
+        :return: returns the value of KL-divergence difference of this input ranking
+    """
+    px=_pro_k/(_ranking_k)
+    qx=_pro_N/_user_N
+    if px==0 or px ==1: # manually set the value of extreme case to avoid error of math.log function 
+        px=0.001
+    if qx == 0 or qx ==1:
+        qx=0.001
+    return (px*math.log(px/qx,LOG_BASE)+(1-px)*math.log((1-px)/(1-qx),LOG_BASE))
+
+def calculaterND(_ranking_k,_pro_k,_user_N,_pro_N):
+    """
+        Calculate the normalized difference of input ranking        
+        :param _ranking_k: A permutation of k numbers that represents a ranking of k individuals, 
+                                e.g., [0, 3, 5, 2, 1, 4].  Each number is an identifier of an individual.
+                                Stored as a python array.
+                                Can be a total ranking of input data or a partial ranking of input data.
+        :param _pro_k: A set of identifiers from _ranking_k that represent members of the protected group
+                                e.g., [0, 2, 3].  Stored as a python array for convenience, order does not matter.
+        :param _user_N: The size of input items 
+        :param _pro_N: The size of input protected group                
+        :return: returns the value of normalized difference of this input ranking
+    """
+    return abs(_pro_k/_ranking_k-_pro_N/_user_N)
+
+def calculaterRD(_ranking_k,_pro_k,_user_N,_pro_N):
+    """
+        Calculate the ratio difference of input ranking        
+        :param _ranking_k: A permutation of k numbers that represents a ranking of k individuals, 
+                                e.g., [0, 3, 5, 2, 1, 4].  Each number is an identifier of an individual.
+                                Stored as a python array.
+                                Can be a total ranking of input data or a partial ranking of input data.
+        :param _pro_k: A set of identifiers from _ranking_k that represent members of the protected group
+                                e.g., [0, 2, 3].  Stored as a python array for convenience, order does not matter.
+        :param _user_N: The size of input items 
+        :param _pro_N: The size of input protected group                
+        :return: returns the value of ratio difference of this input ranking
+        # This version of rRD is consistent with poster of FATML instead of arXiv submission.
+    """
+    input_ratio=_pro_N/(_user_N-_pro_N)
+    unpro_k=_ranking_k-_pro_k
+    
+    if unpro_k==0: # manually set the case of denominator equals zero
+        current_ratio=0
+    else:
+        current_ratio=_pro_k/unpro_k
+
+    min_ratio=min(input_ratio,current_ratio)
+       
+    return abs(min_ratio-input_ratio)
+
+def calculateDiscountedFairness(_pro_mask,_pro_N,_cut_point,_gf_measure,_user_N=None):
+    """
+        Calculate the non-normalized, log-discounted group fairness value of rankings from their protected membership.
+        All cut points are evaluated in one vectorized pass on the prefix sums of the membership mask.
+        Called by function 'calculateNDFairness' and 'calculatePrefixNDFairness'.
+
+        :param _pro_mask: A boolean array whose last axis follows the ranking positions,
+                                True where the item at that position belongs to the protected group.
+                                Can be the top-k prefix of the rankings, then only cut points inside the prefix are evaluated.
+        :param _pro_N: The size of input protected group
+        :param _cut_point: Cut range for the calculation of group fairness, e.g., 10, 20, 30,...
+        :param _gf_measure: Group fairness measure to be used in the calculation,
+                            one of 'rKL', 'rND', 'rRD'.
+        :param _user_N: The size of input items, default is the length of the rankings in _pro_mask
+        :return: returns the discounted sum of group fairness over all cut points, one value per ranking in _pro_mask
+    """
+    ranking_k=_pro_mask.shape[-1]
+    user_N=ranking_k if _user_N is None else _user_N
+    cut_points=np.arange(_cut_point,ranking_k+1,_cut_point)
+    if len(cut_points)==0: # no cut point inside the ranking
+        return np.zeros(_pro_mask.shape[:-1])[()]
+
+    # protected count of every top-k prefix, read at the cut points only
+    pro_k=np.cumsum(_pro_mask,axis=-1)[...,cut_points-1]
+    return calculateCutPointFairness(cut_points,pro_k,user_N,_pro_N,_gf_measure)
+
+def calculateCutPointFairness(_cut_points,_pro_k,_user_N,_pro_N,_gf_measure):
+    """
+        Calculate the log-discounted sum of group fairness from the protected counts at the cut points.
+        Called by function 'calculateDiscountedFairness' and 'calculateExactNormalizer'.
+
+        :param _cut_points: An array of the cut points i.e. prefix sizes, in ranking order
+        :param _pro_k: An array of protected counts at each cut point, the last axis follows _cut_points
+        :param _user_N: The size of input items
+        :param _pro_N: The size of input protected group
+        :param _gf_measure: Group fairness measure to be used in the calculation,
+                            one of 'rKL', 'rND', 'rRD'.
+        :return: returns the discounted sum of group fairness over all cut points
+    """
+    gf=calculateFairnessArray(_cut_points,_pro_k,_user_N,_pro_N,_gf_measure)
+    # discount of each cut point, computed with math.log to match the scalar measures
+    discounts=np.array([math.log(ci+1,LOG_BASE) for ci in _cut_points])
+    # accumulate in ranking order so the sum is identical to adding cut points one by one
+    return np.cumsum(gf/discounts,axis=-1)[...,-1]
+
+def calculateFairnessArray(_ranking_k,_pro_k,_user_N,_pro_N,_gf_measure):
+    """
+        Array-valued counterpart of function 'calculateFairness'.
+        Called by function 'calculateDiscountedFairness'.
+
+        :param _ranking_k: An array of prefix sizes i.e. the cut points
+        :param _pro_k: An array of protected counts in each prefix, broadcastable against _ranking_k
+        :param _user_N: The size of input items
+        :param _pro_N: The size of input protected group
+        :param _gf_measure: The group fairness measure to be used in calculation
+        :return: returns the value of selected group fairness measure at each prefix
+    """
+    if _gf_measure==KL_DIVERGENCE: #for KL-divergence difference
+        gf=calculaterKLArray(_ranking_k,_pro_k,_user_N,_pro_N)
+
+    elif _gf_measure==ND_DIFFERENCE:#for normalized difference
+        gf=calculaterNDArray(_ranking_k,_pro_k,_user_N,_pro_N)
+
+    elif _gf_measure==RD_DIFFERENCE: #for ratio difference
+        gf=calculaterRDArray(_ranking_k,_pro_k,_user_N,_pro_N)
+
+    else:
+        raise ValueError("Input group fairness measure must be a string that choose from ['rKL', 'rND', 'rRD']")
+    return gf
+
+def calculaterKLArray(_ranking_k,_pro_k,_user_N,_pro_N):
+    """
+        Array-valued counterpart of function 'calculaterKL'.
+        :param _ranking_k: An array of prefix sizes
+        :param _pro_k: An array of protected counts in each prefix
+        :param _user_N: The size of input items
+        :param _pro_N: The size of input protected group
+        :return: returns the KL-divergence difference at each prefix
+    """
+    px=_pro_k/_ranking_k
+    qx=_pro_N/_user_N
+    # manually set the value of extreme case to avoid error of log function
+    px=np.where((px==0)|(px==1),0.001,px)
+    if qx == 0 or qx ==1:
+        qx=0.001
+    log_base=math.log(LOG_BASE)
+    return px*(np.log(px/qx)/log_base)+(1-px)*(np.log((1-px)/(1-qx))/log_base)
+
+def calculaterNDArray(_ranking_k,_pro_k,_user_N,_pro_N):
+    """
+        Array-valued counterpart of function 'calculaterND'.
+        :param _ranking_k: An array of prefix sizes
+        :param _pro_k: An array of protected counts in each prefix
+        :param _user_N: The size of input items
+        :param _pro_N: The size of input protected group
+        :return: returns the normalized difference at each prefix
+    """
+    return np.abs(_pro_k/_ranking_k-_pro_N/_user_N)
+
+def calculaterRDArray(_ranking_k,_pro_k,_user_N,_pro_N):
+    """
+        Array-valued counterpart of function 'calculaterRD'.
+        :param _ranking_k: An array of prefix sizes
+        :param _pro_k: An array of protected counts in each prefix
+        :param _user_N: The size of input items
+        :param _pro_N: The size of input protected group
+        :return: returns the ratio difference at each prefix
+    """
+    input_ratio=_pro_N/(_user_N-_pro_N)
+    unpro_k=_ranking_k-_pro_k
+
+    # manually set the case of denominator equals zero
+    current_ratio=np.where(unpro_k==0,0,_pro_k/np.maximum(unpro_k,1))
+
+    min_ratio=np.minimum(input_ratio,current_ratio)
+
+    return np.abs(min_ratio-input_ratio)
+
+def getProtectedMask(_ranking,_protected_group):
+    """
+        Build the protected membership of each ranking position.
+
+        :param _ranking: A ranking of item identifiers, or a 2-D array with one ranking per row
+        :param _protected_group: The identifiers of the protected group, or a ProtectedGroup
+        :return: returns a boolean array with the shape of _ranking, True where the item is protected
+    """
+    if isinstance(_protected_group, ProtectedGroup):
+        return _protected_group.getMask(_ranking)
+    ranking=np.asarray(_ranking)
+    protected_group=np.asarray(_protected_group)
+    if ranking.dtype.kind in 'iu' and protected_group.dtype.kind in 'iu' and ranking.size*protected_group.size>0:
+        id_min=min(ranking.min(),protected_group.min())
+        id_N=max(ranking.max(),protected_group.max())+1
+        if id_min>=0 and id_N<=2*ranking.shape[-1]:
+            # identifiers are (close to) 0..N-1, scatter them into a lookup table
+            is_protected=np.zeros(id_N,dtype=bool)
+            is_protected[protected_group]=True
+            return is_protected[ranking]
+    return np.in1d(ranking,protected_group).reshape(ranking.shape)
+
+def getNormalizer(_user_N,_pro_N,_gf_measure,_cut_point=None,_iterations=None,_mode=None,_prefix_k=None):
+    """
+        Retrieve the normalizer of the current setting in the process-level normalizer cache.
+        If not founded, call function 'calculateNormalizer' to calculate the normalizer of input group fairness measure at current setting,
+        and write it back to the external normalizer file so that later runs and other processes can reuse it.
+        Called separately from fairness computation for efficiency.
+
+        :param _user_N: The total user number of input ranking
+        :param _pro_N: The size of protected group in the input ranking        
+        :param _gf_measure: The group fairness measure to be used in calculation
+        :param _cut_point: The cut off point used in normalizer computation, default is NORM_CUTPOINT
+        :param _iterations: The iterations used in normalizer computation, default is NORM_ITERATION
+        :param _mode: The mode of normalizer computation, one of 'stochastic' and 'exact', default is NORM_MODE
+                      Exact normalizers are recorded with 0 iterations.
+        :param _prefix_k: The length of the evaluated prefix for 'calculatePrefixNDFairness', default is the whole ranking
+                          Prefix normalizers are recorded with the prefix length as an extra field.
+                          It must be at least the cut point, a shorter prefix has no cut point and no normalizer.
+        
+        :return: returns the maximum value of selected group fairness measure in _max_iter iterations
+    """
+    if _cut_point is None:
+        _cut_point=NORM_CUTPOINT
+    if _iterations is None:
+        _iterations=NORM_ITERATION
+    if _mode is None:
+        _mode=NORM_MODE
+    if _mode not in (NORM_STOCHASTIC,NORM_EXACT):
+        raise ValueError("Input normalizer mode must be a string that choose from ['stochastic', 'exact']")
+    if _mode==NORM_EXACT: # exact normalizers do not depend on iterations
+        _iterations=0
+
+    # error handling for type  
+    if not isinstance( _user_N, ( int, long ) ):
+        raise TypeError("Input user number must be an integer")
+    if not isinstance( _pro_N, ( int, long ) ):
+        raise TypeError("Input size of protected group must be an integer")
+    if not isinstance( _gf_measure, str ):
+        raise TypeError("Input group fairness measure must be a string that choose from ['rKL', 'rND', 'rRD']")
+    # error handling for value 
+    if _user_N <=0:
+        raise ValueError("Input a valud user number")
+    if _pro_N <=0:
+        raise ValueError("Input a valid protected group size")
+    if _pro_N >= _user_N:
+        raise ValueError("Input a valid protected group size")
+    if _prefix_k is not None and (not isinstance( _prefix_k, ( int, long ) ) or _prefix_k <= 0):
+        raise ValueError("Input prefix length must be an integer larger than 0")
+    if _prefix_k is not None and _prefix_k < _cut_point:
+        raise ValueError("Input prefix length must not be less than the cut point, a shorter prefix has no cut point to evaluate")
+
+    current_normalizer_key=(_user_N,_pro_N,_gf_measure,_cut_point,_iterations)
+    if _prefix_k is not None and _prefix_k < _user_N:
+        current_normalizer_key=current_normalizer_key+(_prefix_k,)
+    else:
+        _prefix_k=None
+    # read the normalizor dictionary that is computed externally for efficiency
+    normalizer_dic=loadNormalizerCache()
+    if current_normalizer_key not in normalizer_dic:
+        # another process may have recorded this setting since the cache was loaded
+        normalizer_dic=loadNormalizerCache(_reload=True)
+    if current_normalizer_key in normalizer_dic:
+        normalizer=normalizer_dic[current_normalizer_key]
+    else:
+        if _mode==NORM_EXACT:
+            normalizer=calculateExactNormalizer(_user_N,_pro_N,_gf_measure,_cut_point,_prefix_k)
+        else:
+            normalizer=calculateNormalizer(_user_N,_pro_N,_gf_measure,_cut_point,_iterations,_prefix_k)
+        saveNormalizer(current_normalizer_key,normalizer)
+    return float(normalizer)
+
+def loadNormalizerCache(_reload=False):
+    """
+        Return the process-level normalizer cache, reading the external normalizer file on first use only.
+        Called by function 'getNormalizer'.
+
+        :param _reload: Whether to merge in the current content of the external file again
+        :return: returns the normalizer cache, a dictionary keyed by (user_N,pro_N,gf_measure,cut_point,iterations)
+    """
+    global _normalizer_cache
+    first_load=_normalizer_cache is None
+    if first_load:
+        _normalizer_cache={}
+        _reload=True
+    if _reload:
+        # a missing file is only reported by the first read of the process
+        _normalizer_cache.update(readNormalizerDictionary(first_load))
+    return _normalizer_cache
+
+def readNormalizerDictionary(_report_missing=True):
+    """
+        Retrieve recorded normalizer from external txt file that is computed external for efficiency.
+        Normalizer file is a txt file that each row represents the normalizer of a combination of user number and protected group number.
+        Has the format like this: user_N,pro_N,_gf_measure,cut_point,iterations:normalizer
+        Normalizers of a top-k prefix have the format: user_N,pro_N,_gf_measure,cut_point,iterations,prefix_k:normalizer
+        Rows in the older format user_N,pro_N,_gf_measure:normalizer are read with NORM_CUTPOINT and NORM_ITERATION.
+        Called by function 'loadNormalizerCache' and function 'saveNormalizer'.
+
+        :param _report_missing: Whether to print a message when the normalizer file does not exist yet.
+                                The name of normalizer file is constant.
+        :return: returns normalizer dictionary computed externally, keyed by (user_N,pro_N,gf_measure,cut_point,iterations)
+                 and (user_N,pro_N,gf_measure,cut_point,iterations,prefix_k) for prefix normalizers.
+    """
+    lines=[]
+    try:
+        with open(NORM_FILE) as f:
+            lines = f.readlines()
+    except EnvironmentError as e:
+        if _report_missing or e.errno != errno.ENOENT:
+            print("Cannot find the normalizer txt file")
+    
+    normalizer_dic={}
+    for line in lines:
+        if ":" not in line:
+            continue
+        normalizer=line.strip().split(":")
+        setting=normalizer[0].split(",")
+        if len(setting)==3:
+            setting=setting+[NORM_CUTPOINT,NORM_ITERATION]
+        key=(int(setting[0]),int(setting[1]),setting[2])+tuple(int(si) for si in setting[3:])
+        normalizer_dic[key]=float(normalizer[1])
+    return normalizer_dic
+
+def saveNormalizer(_normalizer_key,_normalizer):
+    """
+        Record a new normalizer in the process-level cache and in the external normalizer file.
+        The file is re-read under an exclusive lock, merged, and replaced atomically through a temporary file,
+        so concurrent processes never lose each other's results or observe a partially written file.
+        Called by function 'getNormalizer'.
+
+        :param _normalizer_key: The setting of normalizer, (user_N,pro_N,gf_measure,cut_point,iterations)
+        :param _normalizer: The value of normalizer
+        :return: no returns.
+    """
+    loadNormalizerCache()[_normalizer_key]=float(_normalizer)
+
+    norm_dir=os.path.dirname(os.path.abspath(NORM_FILE))
+    with open(NORM_FILE+".lock","a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(),fcntl.LOCK_EX)
+        try:
+            # the first normalizer of a directory creates the file, so a missing file is expected here
+            normalizer_dic=readNormalizerDictionary(False)
+            normalizer_dic[_normalizer_key]=float(_normalizer)
+            tmp_fd,tmp_fn=tempfile.mkstemp(dir=norm_dir,prefix=".normalizer")
+            with os.fdopen(tmp_fd,"w") as tmp_file:
+                for key in sorted(normalizer_dic):
+                    tmp_file.write(",".join(str(ki) for ki in key)+":"+repr(normalizer_dic[key])+"\n")
+                tmp_file.flush()
+                os.fsync(tmp_file.fileno())
+            os.chmod(tmp_fn,0o644)
+            if hasattr(os,"replace"):
+                os.replace(tmp_fn,NORM_FILE)
+            else:
+                os.rename(tmp_fn,NORM_FILE)
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(),fcntl.LOCK_UN)
+    loadNormalizerCache().update(normalizer_dic)
+
+def calculateNormalizer(_user_N,_pro_N,_gf_measure,_cut_point=None,_iterations=None,_prefix_k=None):
+    """
+        Calculate the normalizer of input group fairness measure at input user and protected group setting.
+        The function use two constant: NORM_ITERATION AND NORM_CUTPOINT to specify the max iteration and batch size used in the calculation,
+        unless _iterations and _cut_point are given.
+        First, get the maximum value of input group fairness measure at different fairness probability.
+        Run the above calculation NORM_ITERATION times.
+        Then compute the average value of above results as the maximum value of each fairness probability.
+        Finally, choose the maximum of value as the normalizer of this group fairness measure.
+        
+        :param _user_N: The total user number of input ranking
+        :param _pro_N: The size of protected group in the input ranking 
+        :param _gf_measure: The group fairness measure to be used in calculation 
+        :param _cut_point: The cut off point used in the calculation, default is NORM_CUTPOINT
+        :param _iterations: The iterations used in the calculation, default is NORM_ITERATION
+        :param _prefix_k: The length of the evaluated prefix, only cut points inside it are counted, default is the whole ranking
+        
+        :return: returns the group fairness value for the unfair ranking generated at input setting
+
+    """
+    if _cut_point is None:
+        _cut_point=NORM_CUTPOINT
+    if _iterations is None:
+        _iterations=NORM_ITERATION
+    # set the range of fairness probability based on input group fairness measure
+    if _gf_measure==RD_DIFFERENCE: # if the group fairness measure is rRD, then use 0.5 as normalization range
+        f_probs=[0,0.5] 
+    else:
+        f_probs=[0,0.98] 
+    avg_maximums=[] #initialize the lists of average results of all iteration
+    input_ranking=[x for x in range(_user_N)]
+    protected_group=ProtectedGroup(np.arange(_pro_N),_user_N)
+    for fpi in f_probs:
+        # generate unfair rankings using algorithm
+        unfair_rankings=dataGenerator.generateUnfairRankings(input_ranking,protected_group,fpi,_iterations)
+        # calculate the non-normalized group fairness value of all iterations i.e. input normalized value as 1
+        if _prefix_k is None:
+            iter_results=calculateNDFairnessBatch(unfair_rankings,protected_group,_cut_point,[_gf_measure],[1])[:,0]
+        else:
+            # protected members are 0.._pro_N-1
+            iter_results=calculateDiscountedFairness(unfair_rankings[:,:_prefix_k]<_pro_N,_pro_N,_cut_point,_gf_measure,_user_N)
+        avg_maximums.append(np.mean(iter_results))
+    return max(avg_maximums)
+
+def calculateExactNormalizer(_user_N,_pro_N,_gf_measure,_cut_point=None,_prefix_k=None):
+    """
+        Calculate the normalizer of input group fairness measure analytically from the counts of the two groups.
+        The most unfair rankings rank one group first: all unprotected members before the protected group
+        (the ranking 'generateUnfairRanking' returns at fairness probability 0), or the protected group first.
+        Since rKL manually sets a fully protected prefix to 0.001, the protected-first ranking is also considered
+        with a single unprotected member on top.
+        The protected counts of these rankings at each cut point are known in closed form, so no ranking is generated
+        and the cost is O(_user_N/_cut_point), or O(_prefix_k/_cut_point) for a prefix.
+
+        :param _user_N: The total user number of input ranking
+        :param _pro_N: The size of protected group in the input ranking
+        :param _gf_measure: The group fairness measure to be used in calculation
+        :param _cut_point: The cut off point used in the calculation, default is NORM_CUTPOINT
+        :param _prefix_k: The length of the evaluated prefix, only cut points inside it are counted, default is the whole ranking
+
+        :return: returns the group fairness value of the most unfair of above rankings
+    """
+    if _cut_point is None:
+        _cut_point=NORM_CUTPOINT
+    ranking_k=_user_N if _prefix_k is None else min(_prefix_k,_user_N)
+    cut_points=np.arange(_cut_point,ranking_k+1,_cut_point)
+    if len(cut_points)==0: # no cut point inside the ranking
+        return 0.0
+    unpro_N=_user_N-_pro_N
+    # protected counts at each cut point for unprotected-first, protected-first
+    # and protected-first led by one unprotected member
+    pro_k=np.array([np.maximum(cut_points-unpro_N,0),
+                    np.minimum(cut_points,_pro_N),
+                    np.minimum(cut_points-1,_pro_N)])
+    extreme_gf=calculateCutPointFairness(cut_points,pro_k,_user_N,_pro_N,_gf_measure)
+    if _gf_measure==RD_DIFFERENCE: # as in 'calculateNormalizer', rRD is normalized by the unprotected-first ranking only
+        return float(extreme_gf[0])
+    return float(extreme_gf.max())
+
+def calculateScoreDifference(_scores1,_scores2):
+    """
+        Calculate the average position-wise score difference
+        between two sorted lists.  Lists are sorted in decreasing
+        order of scores.  If lists are not sorted by descending- error.
+
+        Only applied for two score lists with same size. 
+        # check for no division by 0
+        # check that each list is sorted in decreasing order of score
+
+        :param _scores1: The first list of scores
+        :param _scores2: The second list of scores         
+        :return: returns the average score difference of two input score lists.
+
+    """
+    # error handling 
+    if not isinstance(_scores1, (list, tuple, np.ndarray)) and not isinstance( _scores1, basestring ):
+        raise TypeError("First score list must be a list-wise structure defined by '[]' symbol")
+    if not isinstance(_scores2, (list, tuple, np.ndarray)) and not isinstance( _scores2, basestring ):
+        raise TypeError("Second score list must be a list-wise structure defined by '[]' symbol")
+    
+    if len(_scores1)*len(_scores2) ==0:
+        raise ValueError("Input score lists should have length larger than 0")
+        
+    if not descendingOrderCheck(_scores1):
+        raise ValueError("First score list is not ordered by descending order")
+    if not descendingOrderCheck(_scores2):
+        raise ValueError("Second score list is not ordered by descending order")
+
+    user_N=min(len(_scores1),len(_scores2)) # get the minimum user number of two score lists
+    score_diff = 0
+    for xi in range(user_N):        
+        score_diff+=abs(_scores1[xi]-_scores2[xi])         
+    score_diff=score_diff/user_N
+    return score_diff
+
+def calculatePositionDifference(_perm1,_perm2,_validation=None):
+    """
+        Calculate the average position difference for each item, 
+        between two permutations of the same items.
+        Positions are looked up through the inverse permutation in O(N), input can be python lists or numpy arrays.
+        CHECK THAT EACH list is a valid permutation
+        CHECK that lists are of the same size
+
+        :param _perm1: The first permutation
+        :param _perm2: The second permutation         
+        :param _validation: The validation mode of two permutations, one of 'full', 'sampled', 'trusted',
+                            default is the global mode of rankingValidation.py
+        :return: returns the average position difference of two input score lists.
+
+    """
+    completePermutaionCheck(_perm1,_perm2,_validation)
+    # position of each item in both permutations, read from the inverse permutation of _perm2
+    return calculatePositionDifferenceOfPositions(getItemPositions(_perm2,_perm1))
+
+def calculatePositionDifferenceOfPositions(_positions):
+    """
+        Calculate the average position difference of two permutations from the positions in the second permutation
+        of the items of the first one, e.g. when the inverse of the second permutation is computed once for many calls.
+
+        :param _positions: The numpy array of the position in the second permutation of each item of the first permutation,
+                           in the order of the first permutation
+        :return: returns the average position difference of two permutations.
+    """
+    user_N=len(_positions)
+    position_diff=int(np.abs(np.arange(user_N)-_positions).sum())
+    # get the average value of position difference
+    if(user_N%2==0):
+        position_diff=(2*position_diff)/(user_N*user_N)
+    else:
+        position_diff=(2*position_diff)/(user_N*user_N-1)
+    return position_diff
+
+def calculateKendallDistance(_perm1,_perm2,_validation=None):
+    """
+        Calculate the kendall distance between two permutations of the same items.
+        Counts the discordant pairs as the inversions of the positions in _perm2 listed in the order of _perm1,
+        which takes O(N log N) instead of comparing every pair of items.
+
+        :param _perm1: The first permutation
+        :param _perm2: The second permutation         
+        :param _validation: The validation mode of two permutations, one of 'full', 'sampled', 'trusted',
+                            default is the global mode of rankingValidation.py
+        :return: returns the kendall distance between two permutations.
+
+    """
+    completePermutaionCheck(_perm1,_perm2,_validation)
+    # position in _perm2 of each item of _perm1, in the order of _perm1
+    return calculateKendallDistanceOfPositions(getItemPositions(_perm2,_perm1))
+
+def calculateKendallDistanceOfPositions(_positions):
+    """
+        Calculate the kendall distance of two permutations from the positions in the second permutation
+        of the items of the first one, e.g. when the inverse of the second permutation is computed once for many calls.
+
+        :param _positions: The numpy array of the position in the second permutation of each item of the first permutation,
+                           in the order of the first permutation
+        :return: returns the kendall distance between two permutations.
+    """
+    user_N=len(_positions)
+    # every discordant pair is counted in both orders as in the pairwise definition
+    swapped_pairs = 2*countInversions(_positions)
+    return swapped_pairs/(user_N*(user_N-1))
+
+def calculateTopKKendallDistance(_perm1,_perm2,_k,_penalty=0.5,_validation=None):
+    """
+        Calculate the kendall distance between the top-k heads of two rankings,
+        following the top-k kendall distance with penalty parameter p of Fagin et al. (2003).
+        For a pair of items from the union of both heads, the penalty is
+        1 if both items are in both heads and ordered differently,
+        1 if both items are in one head, only one of them is in the other head, and the missing one is ranked higher,
+        1 if each item is only in a different head,
+        _penalty if both items are in one head and none of them is in the other head.
+
+        :param _perm1: The first ranking, only its first _k items are used
+        :param _perm2: The second ranking, only its first _k items are used
+        :param _k: The size of the heads to compare
+        :param _penalty: The penalty of a pair that only appears in one head, value in [0,1]
+        :param _validation: The validation mode of two rankings, one of 'full', 'sampled', 'trusted',
+                            default is the global mode of rankingValidation.py
+        :return: returns the top-k kendall distance normalized by the distance of two disjoint heads, value in [0,1].
+    """
+    completePermutaionCheck(_perm1,_perm2,_validation)
+    # error handling for input type
+    if not isinstance( _k, ( int, long ) ):
+        raise TypeError("Input k must be an integer")
+    # error handling for input value
+    if _k <= 1 or _k > len(_perm1) or _k > len(_perm2):
+        raise ValueError("Input k must be an integer larger than 1 and no larger than the length of input rankings")
+    if _penalty < 0 or _penalty > 1:
+        raise ValueError("Input penalty must be a number in [0,1]")
+
+    head1=np.asarray(_perm1)[:_k]
+    head2=np.asarray(_perm2)[:_k]
+    # membership of each head's items in the other head
+    in_head2=np.in1d(head1,head2)
+    in_head1=np.in1d(head2,head1)
+    common_N=int(in_head2.sum())
+    only_N=_k-common_N # items in one head only, same number for both heads
+
+    # pairs of common items ordered differently
+    swapped_pairs=countInversions(getItemPositions(head2,head1[in_head2]))
+    # pairs of a common item and an item missing in the other head that is ranked above the common item
+    for in_other in (in_head2,in_head1):
+        common_after=common_N-np.cumsum(in_other)
+        swapped_pairs+=int(common_after[~in_other].sum())
+    # pairs of items that are each in a different head only
+    swapped_pairs+=only_N*only_N
+    # pairs of items that are both in one head only
+    swapped_pairs+=_penalty*only_N*(only_N-1)
+
+    return swapped_pairs/(_k*_k+_penalty*_k*(_k-1))
+
+def getItemPositions(_perm,_items):
+    """
+        Get the positions of input items in a permutation through its inverse permutation.
+
+        :param _perm: The permutation
+        :param _items: The items to locate, each of them must be in _perm
+        :return: returns a numpy array of the position of each item of _items in _perm.
+    """
+    perm=np.asarray(_perm)
+    items=np.asarray(_items)
+    user_N=len(perm)
+    if perm.dtype.kind in 'iu' and items.dtype.kind in 'iu' and user_N>0 \
+            and perm.min()>=0 and perm.max()<2*user_N:
+        # items are (close to) 0..N-1, scatter the positions into the inverse permutation
+        inverse_perm=np.full(2*user_N,-1,dtype=np.int64)
+        inverse_perm[perm]=np.arange(user_N)
+        if len(items)==0:
+            return inverse_perm[:0]
+        if items.min()<0 or items.max()>=2*user_N:
+            raise ValueError("Input permutations should include the same items")
+        positions=inverse_perm[items]
+        if (positions<0).any():
+            raise ValueError("Input permutations should include the same items")
+        return positions
+    # otherwise locate the items by binary search on the sorted permutation
+    order=np.argsort(perm,kind='mergesort')
+    sorted_perm=perm[order]
+    idx=np.minimum(np.searchsorted(sorted_perm,items),max(user_N-1,0))
+    if user_N==0 or (sorted_perm[idx]!=items).any():
+        raise ValueError("Input permutations should include the same items")
+    return order[idx]
+
+def countInversions(_sequence):
+    """
+        Count the pairs i<j with _sequence[i]>_sequence[j] of a sequence of distinct integers.
+        Uses a most-significant-bit first radix sort: at every bit the items that agree on all higher bits form a group
+        in their input order, and a larger item before a smaller one is an inversion decided at the first bit they differ.
+        Each of the log(N) bits counts these pairs and stably partitions the groups with cumulative sums in O(N),
+        so the Python-level loop only runs over the bits.
+
+        :param _sequence: The sequence of distinct non-negative integers e.g. positions
+        :return: returns the number of inversions, a python integer.
+    """
+    # relabel the values as their ranks 0..N-1 so that they fit in log(N) bits
+    sequence=np.argsort(np.argsort(np.asarray(_sequence),kind='mergesort'),kind='mergesort').astype(np.int64)
+    user_N=len(sequence)
+    if user_N < 2:
+        return 0
+    inversions=0
+    index=np.arange(user_N)
+    for bi in range(int(user_N-1).bit_length()-1,-1,-1):
+        # items are grouped by their bits above bi and keep their input order inside a group
+        high=sequence>>(bi+1)
+        is_one=(sequence>>bi)&1
+        is_start=np.ones(user_N,dtype=bool)
+        is_start[1:]=high[1:]!=high[:-1]
+        group_start=np.maximum.accumulate(np.where(is_start,index,0))
+        # ones and zeros before each item inside its group
+        ones_before=np.cumsum(is_one)-is_one
+        ones_before=ones_before-ones_before[group_start]
+        zeros_before=index-group_start-ones_before
+        # a one before a zero of the same group is an inversion decided at bit bi
+        inversions+=int(ones_before[is_one==0].sum())
+        # stable partition of every group by bit bi, zeros first, so the groups follow the bits down to bi
+        group_id=np.cumsum(is_start)-1
+        group_zero_N=np.bincount(group_id,weights=1-is_one).astype(np.int64)[group_id]
+        new_position=group_start+np.where(is_one==1,group_zero_N+ones_before,zeros_before)
+        partitioned=np.empty_like(sequence)
+        partitioned[new_position]=sequence
+        sequence=partitioned
+    return inversions
+
+def calculateSpearmanR(_scores1,_scores2):
+
+    """
+        Use function 'spearmanr' in scipy.stats package to calculate spearman correlation coefficient between two score lists.
+        Only applied for two score lists with same size.
+
+        :param _scores1: The first list of scores stored in a python list
+        :param _scores2: The second list of scores stored in a python list        
+        :return: returns the spearman correlation coefficient between two input score lists, ignore the p-value to test for non-correlation. 
+    """
+    # error handling for input type
+    if not isinstance(_scores1, (list, tuple, np.ndarray)) and not isinstance( _scores1, basestring ):
+        raise TypeError("First score list must be a list-wise structure defined by '[]' symbol")
+    if not isinstance(_scores2, (list, tuple, np.ndarray)) and not isinstance( _scores2, basestring ):
+        raise TypeError("Second score list must be a list-wise structure defined by '[]' symbol")
+    # error handling for input value
+    if len(_scores1)*len(_scores2) ==0:
+        raise ValueError("Input score lists should have length larger than 0")
+    if len(_scores1) != len(_scores2):
+        raise ValueError("Input two score lists should have same size")   
+    
+    return spearmanr(_scores1,_scores2)[0]
+
+def calculatePearsonC(_scores1,_scores2):
+
+    """
+        Use function 'pearsonr' in scipy.stats package to calculate pearson correlation coefficient between two score lists.
+        Only applied for two score lists with same size.
+        
+        :param _scores1: The first list of scores stored in a python list
+        :param _scores2: The second list of scores stored in a python list        
+        :return: returns the pearson correlation coefficient between two input score lists, ignore the p-value to test for non-correlation.
+    """
+    # error handling for input type
+    if not isinstance(_scores1, (list, tuple, np.ndarray)) and not isinstance( _scores1, basestring ):
+        raise TypeError("First score list must be a list-wise structure defined by '[]' symbol")
+    if not isinstance(_scores2, (list, tuple, np.ndarray)) and not isinstance( _scores2, basestring ):
+        raise TypeError("Second score list must be a list-wise structure defined by '[]' symbol")
+    # error handling for input value
+    if len(_scores1)*len(_scores2) ==0:
+        raise ValueError("Input score lists should have length larger than 0")
+    if len(_scores1) != len(_scores2):
+        raise ValueError("Input two score lists should have same size")   
+    
+    return pearsonr(_scores1,_scores2)[0]
+
+# Functions for error handling
+def descendingOrderCheck(_ordered_list):
+    """
+        Check whether the input list is ordered descending. 
+        
+        :param _ordered_list: The input list that is ordered by descending order         
+        :return: returns true if order of _ordered_list is descending else returns false.
+
+    """       
+    return all(earlier >= later for earlier, later in zip(_ordered_list, _ordered_list[1:]))
+
+def completePermutaionCheck(_perm1,_perm2,_validation=None):
+    """
+        Check the valid of two input permutations. 
+        A ValidatedRanking is not checked again for repetitive items.
+
+        :param _perm1: The first permutation
+        :param _perm2: The second permutation         
+        :param _validation: The validation mode, one of 'full', 'sampled', 'trusted', default is the global mode
+                            of rankingValidation.py, which is 'full' unless changed
+        :return: no returns. Raise error if founded.
+
+    """
+    validation=rankingValidation.resolveValidation(_validation)
+    if validation == rankingValidation.VALIDATE_TRUSTED:
+        return
+    if validation == rankingValidation.VALIDATE_SAMPLED:
+        has_repetition=rankingValidation.hasSampleRepetition
+    else:
+        has_repetition=lambda _perm: len(set(_perm)) < len(_perm)
+    
+    if not isinstance(_perm1, (list, tuple, np.ndarray)) and not isinstance( _perm1, basestring ):
+        raise TypeError("First permutation must be a list-wise structure defined by '[]' symbol")
+    if not isinstance(_perm2, (list, tuple, np.ndarray)) and not isinstance( _perm2, basestring ):
+        raise TypeError("Second permutation must be a list-wise structure defined by '[]' symbol")
+    
+    # error handling for complete permutation
+    if len(_perm1)*len(_perm2) ==0:
+        raise ValueError("Input permutations should have length larger than 0")
+        
+    if not rankingValidation.isValidated(_perm1) and has_repetition(_perm1):
+        raise ValueError("First permutation include repetitive items")
+    if not rankingValidation.isValidated(_perm2) and has_repetition(_perm2):
+        raise ValueError("Second permutation include repetitive items")    
+    if len(_perm1) != len(_perm2):
         raise ValueError("Input permutations should have same size")
\ No newline at end of file
@@ -0,0 +1,198 @@
+import os
+import time
+import json
+import numpy as np
+# a python script define the opt-in profiler of the optimization objectives 'lbfgsOptimize' and 'lbfgsOptimizeGrad'
+# a profiler is passed to the objectives through the run state of function 'optimization.newRunState'
+# without a profiler the objectives only pay for entering an empty span per kernel call
+
+TRACE_JSONL="jsonl" # represent a trace file with one json event per line
+TRACE_CHROME="chrome" # represent a trace file in chrome trace event format, viewable in chrome://tracing or perfetto
+
+KERNEL="kernel" # represent the span of one kernel call
+LOSS="loss" # represent the span of the computation of one loss component, L_x, L_y or L_z
+GRADIENT="gradient" # represent the span of the backward pass of the analytic gradient
+EVALUATION="evaluation" # represent the span of one evaluation of the objective
+
+EVAL_REAL="real" # represent an evaluation at a point chosen by l-bfgs
+EVAL_FINITE_DIFFERENCE="finiteDifference" # represent an evaluation to approximate the gradient by finite differences
+
+class NullSpan(object):
+    """
+        The span used when no profiler is set, entering and leaving it does nothing.
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self,_type,_value,_traceback):
+        return False
+
+NULL_SPAN=NullSpan()
+
+class ProfileSpan(object):
+    """
+        Measure the wall time of a block of code and record it in the profiler when the block is left.
+    """
+    def __init__(self,_profiler,_name,_category):
+        self.profiler=_profiler
+        self.name=_name
+        self.category=_category
+
+    def __enter__(self):
+        self.start_time=time.time()
+        return self
+
+    def __exit__(self,_type,_value,_traceback):
+        self.profiler.recordSpan(self.name,self.category,self.start_time,time.time()-self.start_time)
+        return False
+
+def profileSpan(_profiler,_name,_category=KERNEL):
+    """
+        :param _profiler: An ObjectiveProfiler, or None when profiling is disabled
+        :param _name: The name of the span, e.g. the name of the kernel
+        :param _category: The category of the span, one of 'kernel', 'loss', 'gradient'
+        :return: returns a context manager that records the wall time of its block, or the shared empty span if _profiler is None.
+    """
+    if _profiler is None:
+        return NULL_SPAN
+    return ProfileSpan(_profiler,_name,_category)
+
+class ObjectiveProfiler(object):
+    """
+        Record the wall time of every kernel call and loss component of the objective evaluations,
+        the loss components of every evaluation, and whether an evaluation is real or a finite-difference one.
+        Events are written to the trace file as they are recorded, so long runs do not keep them in memory.
+
+        Evaluations are classified by their parameters: a finite-difference evaluation of l-bfgs with approximated gradient
+        differs from the last real evaluation in exactly one parameter.
+    """
+
+    def __init__(self,_trace_fn=None,_trace_format=TRACE_JSONL):
+        """
+            :param _trace_fn: The file name to write the trace, no trace is written if not given
+            :param _trace_format: The format of the trace file, one of 'jsonl', 'chrome'
+        """
+        if _trace_format not in (TRACE_JSONL, TRACE_CHROME):
+            raise ValueError("Input trace format must be a string that choose from ['jsonl', 'chrome']")
+        self.trace_format=_trace_format
+        self.pid=os.getpid()
+        self.origin=time.time()
+        self.totals={} # (category, name) to [calls, seconds]
+        self.eval_counts={EVAL_REAL: 0, EVAL_FINITE_DIFFERENCE: 0}
+        self.real_params=None
+        self.evaluation=None
+        self.trace_file=None
+        self.event_N=0
+        if _trace_fn is not None:
+            self.trace_file=open(_trace_fn,'w')
+            if self.trace_format==TRACE_CHROME:
+                self.trace_file.write("[\n")
+
+    def startEvaluation(self,_iters,_params):
+        """
+            Start recording one evaluation of the objective.
+            :param _iters: The evaluation count of the run
+            :param _params: The parameters of the evaluation
+            :return: no returns.
+        """
+        params=np.asarray(_params)
+        if self.real_params is not None and len(params)==len(self.real_params) and \
+                np.count_nonzero(params != self.real_params)==1:
+            kind=EVAL_FINITE_DIFFERENCE
+        else:
+            kind=EVAL_REAL
+            self.real_params=params.copy()
+        self.eval_counts[kind]+=1
+        self.evaluation=(_iters,kind,time.time())
+
+    def endEvaluation(self,_criterion,_L_x,_L_y,_L_z):
+        """
+            Finish recording the current evaluation with its loss components.
+            :param _criterion: The total loss of the evaluation
+            :param _L_x: The loss of reconstructing X
+            :param _L_y: The loss of ranking accuracy
+            :param _L_z: The loss of group fairness
+            :return: no returns.
+        """
+        iters,kind,start_time=self.evaluation
+        losses={"criterion": float(_criterion), "L_x": float(_L_x), "L_y": float(_L_y), "L_z": float(_L_z)}
+        args={"iters": iters, "kind": kind}
+        args.update(losses)
+        self.recordSpan("objective",EVALUATION,start_time,time.time()-start_time,args)
+        if self.trace_file is not None and self.trace_format==TRACE_CHROME:
+            # counter events draw the loss components over time
+            self.writeEvent({"name": "loss", "ph": "C", "ts": self.getTimestamp(time.time()), "pid": self.pid, "args": losses})
+        self.evaluation=None
+
+    def recordSpan(self,_name,_category,_start_time,_seconds,_args=None):
+        """
+            Record a span in the totals and the trace file.
+            :param _name: The name of the span
+            :param _category: The category of the span
+            :param _start_time: The start time of the span, from time.time()
+            :param _seconds: The wall time of the span
+            :param _args: The dictionary of extra values of the span
+            :return: no returns.
+        """
+        total=self.totals.setdefault((_category,_name),[0,0.0])
+        total[0]+=1
+        total[1]+=_seconds
+        if self.trace_file is None:
+            return
+        event={"name": _name, "cat": _category, "ph": "X", "ts": self.getTimestamp(_start_time),
+               "dur": round(_seconds*1e6,3), "pid": self.pid, "tid": 0}
+        if self.evaluation is not None:
+            event["args"]={"iters": self.evaluation[0]}
+        if _args is not None:
+            event["args"]=_args
+        self.writeEvent(event)
+
+    def getTimestamp(self,_time):
+        """
+            :param _time: A time from time.time()
+            :return: returns the microseconds since the profiler was created.
+        """
+        return round((_time-self.origin)*1e6,3)
+
+    def writeEvent(self,_event):
+        """
+            :param _event: The dictionary of one trace event
+            :return: no returns.
+        """
+        if self.trace_format==TRACE_CHROME and self.event_N > 0:
+            self.trace_file.write(",\n")
+        self.trace_file.write(json.dumps(_event))
+        if self.trace_format==TRACE_JSONL:
+            self.trace_file.write("\n")
+        self.event_N+=1
+
+    def getSummary(self):
+        """
+            :return: returns a dictionary with the count of real and finite-difference evaluations,
+                     and the calls, total and mean seconds of every span name grouped by category.
+        """
+        spans={}
+        for (category,name),(calls,seconds) in self.totals.items():
+            spans.setdefault(category,{})[name]={"calls": calls, "seconds": seconds, "mean_seconds": seconds/calls}
+        return {"evaluations": dict(self.eval_counts), "spans": spans}
+
+    def printSummary(self):
+        """
+            Print the evaluation counts and the spans sorted by total seconds.
+            :return: no returns.
+        """
+        print "Evaluations: "+", ".join(kind+" "+str(count) for kind,count in sorted(self.eval_counts.items()))
+        for (category,name),(calls,seconds) in sorted(self.totals.items(), key=lambda item: -item[1][1]):
+            print category+"/"+name+": "+str(calls)+" calls, "+str(seconds)+" seconds"
+
+    def close(self):
+        """
+            Finish the trace file.
+            :return: no returns.
+        """
+        if self.trace_file is None:
+            return
+        if self.trace_format==TRACE_CHROME:
+            self.trace_file.write("\n]\n")
+        self.trace_file.close()
+        self.trace_file=None
@@ -1,337 +1,759 @@
-from __future__ import division
-import numpy as np
-from numba.decorators import jit
-import measures # import for accuracy measures
-import utility # import for calculation of weighted scores
-
-# a python script define optimization process
-# test of this script can be found in testOptimization.py
-# Part of optimization code refers from github https://github.com/zjelveh/learning-fair-representations/blob/master/lfr.py 
-
-SCORE_DIVERGENCE="scoreDiff" # represent average score difference -ranking accuracy measure
-POSITION_DIFFERENCE="positionDiff" # represent average position difference -ranking accuracy measure
-KENDALL_DIS="kendallDis" # represent kendall distance -ranking accuracy measure
-SPEARMAN_COR="spearmanDis" # represent spearman correlation -ranking accuracy measure
-PEARSON_COR="pearsonDis" # represent pearson correlation -ranking accuracy measure
-
-
-def calculateEvaluateRez(_rez,_data,_inputscores,_k,_accmeasure):
-    """
-        Calculate estimated scores of all input user and ranking accuracy of the corresponding ranking after optimization converged.
-        :param _rez: The optimization parameter results of L-BFGS algorithm after converged
-        :param _data: The input data, each row is a feature vector of one user
-        :param _inputscores: The input scores of data that can be weighted scores or some score attributes
-        :param _k: The number of clusters in the intermediate layer of neural network
-        :param _accmeasure: The accuracy measure used in this function
-        :return: returns the estimated scores and ranking accuracy of corresponding ranking
-    """
-    user_N,att_N=_data.shape
-
-    # error handling for input type
-    if not isinstance(_rez, (list, tuple, np.ndarray)) and not isinstance( _rez, basestring ):
-        raise TypeError("Input parameter list must be a list-wise structure defined by '[]' symbol")
-    if not isinstance(_inputscores, (list, tuple, np.ndarray)) and not isinstance( _inputscores, basestring ):
-        raise TypeError("Input score list must be a list-wise structure defined by '[]' symbol")
-    if not isinstance( _k, ( int, long ) ):
-        raise TypeError("Input k must be an integer")
-    if not isinstance( _accmeasure, str ):
-        raise TypeError("Input accuracy measure must be a string that choose from ['scoreDiff', 'positionDiff', 'kendallDis', 'spearmanDis', 'pearsonDis'] defined in the begining of this file")
-    
-    # error handling for input value
-    if user_N == 0:
-        raise ValueError("Input data should not be empty")
-    if att_N == 0:
-        raise ValueError("Input data should have at least one attribute column")
-
-    if len(_rez) == 0:
-        raise ValueError("Input _rez should not be empty")
-    if len(_inputscores) == 0:
-        raise ValueError("Input estimated score list should not be empty")
-    if _k == 0:
-        raise ValueError("Input k must be an integer larger than 0")    
-
-    # initialize the clusters
-    clusters=np.matrix(_rez[0][(2 * att_N) + _k:]).reshape((_k, att_N))
-    alpha1 = _rez[0][att_N : 2 * att_N]
-    # get the distance between input user X and intermediate clusters Z
-    dists_x = distances(_data, clusters, alpha1, user_N, att_N, _k)
-    # compute the probability of each X maps to Z
-    Mnk_x=M_nk(dists_x, user_N, _k)
-    # get the estiamted scores and ranking accuracy
-    scores_hat, ranking_accuracy = calculateEstimateY(Mnk_x, _inputscores, clusters, user_N, _k, _accmeasure)
-    return scores_hat, ranking_accuracy
-
-@jit
-def distances(_X, _clusters, _alpha, _N, _P, _k): 
-    """
-        Calculate the distance between input X and clusters Z.
-        :param _X: The input user feature vector 
-        :param _clusters: The clusters in the intermediate Z
-        :param _alpha: The weight of each attribute in the input X
-        :param _N: The total user number in input X
-        :param _P: The attribute number in input X
-        :param _k: The number of clusters in the intermediate layer of neural network        
-        :return: returns the distance matrix between X and Z.
-    """
-    dists = np.zeros((_N, _k))
-    for i in range(_N):
-        for p in range(_P):
-            for j in range(_k):    
-                dists[i, j] += (_X[i, p] - _clusters[j, p]) * (_X[i, p] - _clusters[j, p]) 
-    return dists
-
-@jit
-def M_nk(_dists, _N, _k): 
-    """
-        Calculate the probability of input X maps to clusters Z.
-        :param _dists: The distance matrix between X and Z 
-        :param _clusters: The clusters in the intermediate Z
-        :param _alpha: The weight of each attribute in the input X
-        :param _N: The total user number in input X
-        :param _P: The attribute number in input X
-        :param _k: The number of clusters in the intermediate layer of neural network        
-        :return: returns the probability mapping matrix between X and Z.
-    """
-    M_nk = np.zeros((_N, _k))
-    exp = np.zeros((_N, _k))
-    denom = np.zeros(_N)
-    for i in range(_N):
-        for j in range(_k):
-            exp[i, j] = np.exp(-1 * _dists[i, j])
-            denom[i] += exp[i, j]
-        for j in range(_k):
-            if denom[i]:
-                M_nk[i, j] = exp[i, j] / denom[i]
-            else:
-                M_nk[i, j] = exp[i, j] / 1e-6
-    return M_nk
-@jit    
-def M_k(_M_nk, _N, _k): 
-    # print(_M_nk, _N, _k)
-    """
-        Calculate the summed probability of all input users.
-        :param _M_nk: The probability mapping matrix between X and Z 
-        :param _N: The total user number in input X
-        :param _k: The number of clusters in the intermediate layer of neural network        
-        :return: returns the summed probability matrix of all users.
-    """
-    M_k = np.zeros(_k)
-
-    for j in range(_k):
-        for i in range(_N):
-            M_k[j] += _M_nk[i, j]
-        M_k[j] /= _N
-    return M_k
-
-@jit    
-def x_n_hat(_X, _M_nk, _clusters, _N, _P, _k): 
-    """
-        Calculate the estimated X through clusters Z.
-        :param _X: The input user feature vector 
-        :param _M_nk: The probability mapping matrix between X and Z
-        :param _clusters: The clusters in the intermediate Z
-        :param _N: The total user number in input X
-        :param _P: The attribute number in input X
-        :param _k: The number of clusters in the intermediate layer of neural network        
-        :return: returns the estimated X and loss between input X and estimated X.
-    """
-    x_n_hat = np.zeros((_N, _P))
-    L_x = 0.0
-    for i in range(_N):
-        for p in range(_P):
-            for j in range(_k):
-                x_n_hat[i, p] += _M_nk[i, j] * _clusters[j, p]
-            L_x += (_X[i, p] - x_n_hat[i, p]) * (_X[i, p] - x_n_hat[i, p])
-    L_x=L_x/_N
-    return x_n_hat, L_x
-
-# @jit 
-def calculateEstimateY(_M_nk_x, _inputscores, _clusters, _N, _k,_accmeasure):
-    """
-        Calculate the estimated score and ranking accuracy of corresponding ranking.
-        :param _M_nk_x: The probability mapping matrix from input X and clusters Z 
-        :param _inputscores: The input scores of all users
-        :param _clusters: The clusters in the intermediate Z
-        :param _N: The total user number in input X        
-        :param _k: The number of clusters in the intermediate layer of neural network
-        :param _accmeasure: The ranking accuracy measure used in this function        
-        :return: returns the estimated X and loss between input X and estimated X.
-    """
-    score_hat = np.zeros(_N) # initialize the estimated scores
-    # calculate estimate score of each user by mapping probability between X and Z     
-    for ui in range(_N):
-        score_hat_u = 0.0
-        for ki in range(_k):
-            score_hat_u += (_M_nk_x[ui,ki] * _clusters[ki])                         
-        score_hat[ui] = utility.calculateWeightedScores(score_hat_u)
-        
-    ranking_loss = 0.0       
-    
-    score_hat=list(score_hat)    
-    _inputscores=list(_inputscores)
-    
-    # generate permutations of two score lists returned permutation of sorted id
-    per_scores_hat=sorted(range(len(score_hat)), key=lambda k: score_hat[k],reverse=True)
-    per_scores_input=sorted(range(len(_inputscores)), key=lambda k: _inputscores[k],reverse=True)
-    # sort the scores in descending order
-    sorted_score_hat = score_hat   
-    sorted_score_hat.sort(reverse=True)
-    sorted_inputscores = _inputscores   
-    sorted_inputscores.sort(reverse=True)
-
-    if _accmeasure==SCORE_DIVERGENCE:
-        L_y=measures.calculateScoreDifference(sorted_score_hat,sorted_inputscores) 
-        ranking_loss = L_y
-
-    elif _accmeasure==POSITION_DIFFERENCE:        
-        L_y=measures.calculatePositionDifference(per_scores_hat,per_scores_input) 
-        ranking_loss = L_y
-
-    elif _accmeasure==KENDALL_DIS: 
-        L_y=measures.calculateKendallDistance(per_scores_hat,per_scores_input) # kendall distance        
-        ranking_loss = L_y
-    
-    # for spearman and pearson relation, use the negative value to minimize during optimization
-    elif _accmeasure==SPEARMAN_COR:
-        L_y=measures.calculateSpearmanR(score_hat,_inputscores)
-        ranking_loss = -L_y 
-
-    elif _accmeasure==PEARSON_COR:
-        L_y=measures.calculatePearsonC(score_hat,_inputscores)
-        ranking_loss=-L_y
-    
-    return score_hat, ranking_loss
-
-def lbfgsOptimize(_params, _data, _pro_data, _unpro_data, 
-        _inputscores, _accmeasure, _k, A_x = 0.01, A_y = 1, A_z = 100, results=0):
-    
-    """
-        The function to run the optimization using l-bfgs algorithm.
-        :param _params: The initialized optimization parameters
-        :param _data: The input data of all users - X 
-        :param _pro_data: The input data of protected group
-        :param _unpro_data: The input data of unprotected group
-        :param _inputscores: The scores of input users which can be a score attribute or summed score of all attributes
-        :param _accmeasure: The ranking accuracy measure used in this function
-        :param _k: The number of clusters in the intermediate layer of neural network        
-        :param A_x: The super parameter - optimization weight for accuracy of reconstructing X
-        :param A_y: The super parameter - optimization weight for ranking accuracy
-        :param A_z: The super parameter - optimization weight for group fairness
-        :param results: The flag of optimization, initialize to 0, update to 1 when optimization converged 
-        :return: returns the estimated scores of all user and the probability mapping of protected and unprotected group if converged.
-                 returns the last loss during optimization if optimization doesn't converge.
-    """
-
-    lbfgsOptimize.iters += 1 
-    # get basic statistics
-    user_N, att_N= _data.shape
-    pro_N, pro_att_N = _pro_data.shape
-    unpro_N, unpro_att_N = _unpro_data.shape
-
-    # error handling for input type
-    if not isinstance(_inputscores, (list, tuple, np.ndarray)) and not isinstance( _inputscores, basestring ):
-        raise TypeError("Input score list must be a list-wise structure defined by '[]' symbol")
-    if not isinstance( _k, ( int, long ) ):
-        raise TypeError("Input k must be an integer")
-    if not isinstance( _accmeasure, str ):
-        raise TypeError("Input accuracy measure must be a string that choose from ['scoreDiff', 'positionDiff', 'kendallDis', 'spearmanDis', 'pearsonDis'] defined in the begining of this file")
-    
-    # error handling for input value
-    if user_N == 0:
-        raise ValueError("Input data should not be empty")
-    if (att_N *pro_att_N *unpro_att_N) == 0:
-        raise ValueError("Input data, protected group data, and unprotected group data should have at least one attribute column")
-    if att_N != pro_att_N:
-        raise ValueError("Input protected group data '_pro_data' should have same size with '_data'")
-    if att_N != unpro_att_N:
-        raise ValueError("Input unprotected group data '_unpro_data' should have same size with '_data'")
-
-    
-    if len(_inputscores) == 0:
-        raise ValueError("Input estimated score list should not be empty")
-    if _k == 0:
-        raise ValueError("Input k must be an integer larger than 0")
-
-
-    # initialize parameters of neural network
-    alpha0 = _params[:att_N]
-    alpha1 = _params[att_N : 2 * att_N]
-    w = _params[2 * att_N : (2 * att_N) + _k]
-    # initialize the starting clusters
-    clusters = np.matrix(_params[(2 * att_N) + _k:]).reshape((_k, att_N)) 
-    # compute the distance from X to Z    
-    dists_x = distances(_data, clusters, alpha1, user_N, att_N, _k)  
-    M_nk_x = M_nk(dists_x, user_N, _k)    
-    
-   
-    # based on the cluster centroid compute the distance of protected group and unprotected group
-    pro_dists = distances(_pro_data, clusters, alpha1, pro_N, att_N, _k)
-    unpro_dists = distances(_unpro_data, clusters, alpha0, unpro_N, att_N, _k)
-       
-    # compute the probability mapping from X to Z
-    pro_M_nk = M_nk(pro_dists, pro_N, _k)
-    unpro_M_nk = M_nk(unpro_dists, unpro_N, _k)
-    
-    # compute the summed probability of protected and unprotected group
-    pro_M_k = M_k(pro_M_nk, pro_N, _k)
-    unpro_M_k = M_k(unpro_M_nk, unpro_N, _k)
-    # compute the mapping difference between protected group and unprotected group i.e. sub-loss of group fairness
-    L_z = 0.0
-    for j in range(_k):
-        L_z += abs(pro_M_k[j] - unpro_M_k[j])
-    
-    # compute the estimated x hat from Z i.e. sub-loss of X
-    pro_x_n_hat, L_x1 = x_n_hat(_pro_data, pro_M_nk, clusters, pro_N, att_N, _k)
-    unpro_x_n_hat, L_x2 = x_n_hat(_unpro_data, unpro_M_nk, clusters, unpro_N, att_N, _k)
-    L_x = L_x1 + L_x2
-    
-    # compute the estimated scores and ranking accuracy i.e. sub-loss of ranking Y
-
-    estimate_scores, L_y = calculateEstimateY(M_nk_x, _inputscores, clusters, user_N, _k, _accmeasure)
-    
-    # generate the total loss    
-    criterion = A_x * L_x + A_y * L_y + A_z * L_z
-
-    # print out the current loss after each 250 iterations
-    if lbfgsOptimize.iters % 250 == 0:
-        print(lbfgsOptimize.iters, criterion)
-       
-    if results:
-        return estimate_scores, pro_M_nk, unpro_M_nk
-    else:
-        return criterion
-# after each optimization, reset the iteration to zero
-lbfgsOptimize.iters = 0
-
-def initOptimization(_data,_k):
-    """
-        Initialize the parameter and bound of optimization.
-        :param _data: The input data w.r.t X       
-        :param _k: The number of clusters in the intermediate layer of neural network
-        :return: returns the parameter vector and bound of optimization.
-    """
-    user_N,att_N=_data.shape
-
-    # error handling for input type    
-    if not isinstance( _k, ( int, long ) ):
-        raise TypeError("Input k must be an integer")
-
-    # error handling for input value
-    if user_N == 0:
-        raise ValueError("Input data should not be empty")
-    if att_N == 0:
-        raise ValueError("Input data should have at least one attribute column")
-    if _k == 0:
-        raise ValueError("Input k must be an integer larger than 0")    
-
-
-    # initialize the parameter vector for neural network
-    rez = np.random.uniform(size=_data.shape[1] * 2 + _k + _data.shape[1] * _k)
-    # initialize the bound of optimization algorithm
-    bnd = []
-    for i, k2 in enumerate(rez):
-        if i < _data.shape[1] * 2 or i >= _data.shape[1] * 2 + _k:
-            bnd.append((None, None))
-        else:
-            bnd.append((0, 1))
+from __future__ import division
+import numpy as np
+from scipy.stats import rankdata
+import measures # import for accuracy measures
+import utility # import for calculation of weighted scores
+from objectiveProfiler import profileSpan, LOSS, GRADIENT # opt-in profiling of objective evaluations
+# kernels of distances, probability mapping and estimated X, backend is selected by kernels.setKernelBackend
+from kernels import distances, M_nk, M_k, x_n_hat, M_nk_grad, distances_grad, x_n_hat_grad
+
+# a python script define optimization process
+# test of this script can be found in testOptimization.py
+# Part of optimization code refers from github https://github.com/zjelveh/learning-fair-representations/blob/master/lfr.py 
+
+SCORE_DIVERGENCE="scoreDiff" # represent average score difference -ranking accuracy measure
+POSITION_DIFFERENCE="positionDiff" # represent average position difference -ranking accuracy measure
+KENDALL_DIS="kendallDis" # represent kendall distance -ranking accuracy measure
+SPEARMAN_COR="spearmanDis" # represent spearman correlation -ranking accuracy measure
+PEARSON_COR="pearsonDis" # represent pearson correlation -ranking accuracy measure
+
+ADAM="adam" # represent adam first-order optimizer of the stochastic optimization
+MOMENTUM="momentum" # represent sgd with momentum first-order optimizer of the stochastic optimization
+ADAM_BETA1=0.9 # decay rate of the first moment estimate of adam
+ADAM_BETA2=0.999 # decay rate of the second moment estimate of adam
+ADAM_EPSILON=1e-8 # term added to the denominator of adam for numerical stability
+MOMENTUM_DECAY=0.9 # decay rate of the velocity of sgd with momentum
+
+
+def calculateEvaluateRez(_rez,_data,_inputscores,_k,_accmeasure):
+    """
+        Calculate estimated scores of all input user and ranking accuracy of the corresponding ranking after optimization converged.
+        :param _rez: The optimization parameter results of L-BFGS algorithm after converged
+        :param _data: The input data, each row is a feature vector of one user
+        :param _inputscores: The input scores of data that can be weighted scores or some score attributes
+        :param _k: The number of clusters in the intermediate layer of neural network
+        :param _accmeasure: The accuracy measure used in this function
+        :return: returns the estimated scores and ranking accuracy of corresponding ranking
+    """
+    user_N,att_N=_data.shape
+
+    # error handling for input type
+    if not isinstance(_rez, (list, tuple, np.ndarray)) and not isinstance( _rez, basestring ):
+        raise TypeError("Input parameter list must be a list-wise structure defined by '[]' symbol")
+    if not isinstance(_inputscores, (list, tuple, np.ndarray)) and not isinstance( _inputscores, basestring ):
+        raise TypeError("Input score list must be a list-wise structure defined by '[]' symbol")
+    if not isinstance( _k, ( int, long ) ):
+        raise TypeError("Input k must be an integer")
+    if not isinstance( _accmeasure, str ):
+        raise TypeError("Input accuracy measure must be a string that choose from ['scoreDiff', 'positionDiff', 'kendallDis', 'spearmanDis', 'pearsonDis'] defined in the begining of this file")
+    
+    # error handling for input value
+    if user_N == 0:
+        raise ValueError("Input data should not be empty")
+    if att_N == 0:
+        raise ValueError("Input data should have at least one attribute column")
+
+    if len(_rez) == 0:
+        raise ValueError("Input _rez should not be empty")
+    if len(_inputscores) == 0:
+        raise ValueError("Input estimated score list should not be empty")
+    if _k == 0:
+        raise ValueError("Input k must be an integer larger than 0")    
+
+    clusters, Mnk_x = calculateRepresentation(_rez[0], _data, _k)
+    # get the estiamted scores and ranking accuracy
+    scores_hat, ranking_accuracy = calculateEstimateY(Mnk_x, _inputscores, clusters, user_N, _k, _accmeasure)
+    return scores_hat, ranking_accuracy
+
+def calculateRepresentation(_params, _data, _k):
+    """
+        Map users to the clusters of optimized parameters, the forward pass shared by evaluation and scoring of new users.
+        The distances of all users are weighted by the attribute weights of protected group, as in the ranking accuracy of the objective.
+        :param _params: The optimization parameters
+        :param _data: The input data, each row is a feature vector of one user
+        :param _k: The number of clusters in the intermediate layer of neural network
+        :return: returns the clusters and the probability mapping matrix from the users to the clusters.
+    """
+    user_N, att_N = _data.shape
+    # initialize the clusters
+    clusters = np.matrix(_params[(2 * att_N) + _k:]).reshape((_k, att_N))
+    alpha1 = _params[att_N : 2 * att_N]
+    # get the distance between input user X and intermediate clusters Z
+    dists_x = distances(_data, clusters, alpha1, user_N, att_N, _k)
+    # compute the probability of each X maps to Z
+    return clusters, M_nk(dists_x, user_N, _k)
+
+def calculateEstimateScores(_M_nk_x, _clusters):
+    """
+        Calculate the estimated score of each user by mapping probability between X and Z, in one matrix product.
+        The weighted summation of all users is one product as well, whose result can differ from the per-user products
+        in the last bit, so users whose estimated scores tie up to rounding may be ranked in another order.
+        :param _M_nk_x: The probability mapping matrix from input X and clusters Z
+        :param _clusters: The clusters in the intermediate Z
+        :return: returns the numpy array of estimated scores, in the order of users.
+    """
+    return np.asarray(utility.calculateWeightedScores(np.dot(np.asarray(_M_nk_x), np.asarray(_clusters)))).ravel()
+
+class EstimateYContext(object):
+    """
+        The ranking of the input scores, computed once per optimization run and reused by every evaluation of the objective.
+        Holds the ranking of the input scores, the input scores sorted in descending order,
+        the inverse of the ranking i.e. the position of each user, and the ranks used by the differentiable surrogate.
+    """
+
+    def __init__(self, _inputscores):
+        """
+            :param _inputscores: The input scores of all users
+        """
+        self.inputscores = _inputscores
+        scores = np.asarray(_inputscores, dtype=float)
+        # same ranking as sorting the ids by score in descending order, users of equal score keep their order
+        self.order = utility.calculateRankingOrder(scores)
+        self.sorted_scores = scores[self.order]
+        self.positions = np.empty(len(scores), dtype=np.int64)
+        self.positions[self.order] = np.arange(len(scores))
+        self.ranks = rankdata(scores)
+
+    def isFor(self, _inputscores):
+        """
+            :param _inputscores: The input scores of an evaluation
+            :return: returns true if this context is computed from the same input scores object.
+        """
+        return self.inputscores is _inputscores
+
+# @jit 
+def calculateEstimateY(_M_nk_x, _inputscores, _clusters, _N, _k,_accmeasure, _context=None):
+    """
+        Calculate the estimated score and ranking accuracy of corresponding ranking.
+        The estimated scores are one matrix product, and ranking them is the only sort of each call
+        as the ranking of the input scores is taken from _context.
+        Ties of the estimated scores are broken by user order, see 'calculateEstimateScores' for estimated scores that tie up to rounding.
+        :param _M_nk_x: The probability mapping matrix from input X and clusters Z 
+        :param _inputscores: The input scores of all users
+        :param _clusters: The clusters in the intermediate Z
+        :param _N: The total user number in input X        
+        :param _k: The number of clusters in the intermediate layer of neural network
+        :param _accmeasure: The ranking accuracy measure used in this function        
+        :param _context: The EstimateYContext of _inputscores, computed in this call if not given
+        :return: returns the estimated scores sorted in descending order and the ranking loss.
+    """
+    if _context is None:
+        _context = EstimateYContext(_inputscores)
+    # calculate estimate score of each user by mapping probability between X and Z
+    score_hat = calculateEstimateScores(_M_nk_x, _clusters)
+
+    # generate the permutation of sorted id of the estimated scores, and sort the scores in descending order
+    per_scores_hat = utility.calculateRankingOrder(score_hat)
+    sorted_score_hat = score_hat[per_scores_hat]
+    ranking_loss = 0.0
+
+    if _accmeasure==SCORE_DIVERGENCE:
+        # average position-wise difference of the sorted scores, summed in order as 'measures.calculateScoreDifference'
+        ranking_loss = np.cumsum(np.abs(sorted_score_hat - _context.sorted_scores))[-1] / _N
+
+    elif _accmeasure==POSITION_DIFFERENCE:        
+        # position in the ranking of input scores of each user of the estimated ranking
+        ranking_loss = measures.calculatePositionDifferenceOfPositions(_context.positions[per_scores_hat])
+
+    elif _accmeasure==KENDALL_DIS: 
+        ranking_loss = measures.calculateKendallDistanceOfPositions(_context.positions[per_scores_hat]) # kendall distance
+    
+    # for spearman and pearson relation, use the negative value to minimize during optimization
+    # both relations are computed between the scores sorted in descending order
+    elif _accmeasure==SPEARMAN_COR:
+        L_y=measures.calculateSpearmanR(sorted_score_hat,_context.sorted_scores)
+        ranking_loss = -L_y 
+
+    elif _accmeasure==PEARSON_COR:
+        L_y=measures.calculatePearsonC(sorted_score_hat,_context.sorted_scores)
+        ranking_loss=-L_y
+    
+    return sorted_score_hat, ranking_loss
+
+def lbfgsOptimize(_params, _data, _pro_data, _unpro_data, 
+        _inputscores, _accmeasure, _k, A_x = 0.01, A_y = 1, A_z = 100, results=0, _run_state=None):
+    
+    """
+        The function to run the optimization using l-bfgs algorithm.
+        :param _params: The initialized optimization parameters
+        :param _data: The input data of all users - X 
+        :param _pro_data: The input data of protected group
+        :param _unpro_data: The input data of unprotected group
+        :param _inputscores: The scores of input users which can be a score attribute or summed score of all attributes
+        :param _accmeasure: The ranking accuracy measure used in this function
+        :param _k: The number of clusters in the intermediate layer of neural network        
+        :param A_x: The super parameter - optimization weight for accuracy of reconstructing X
+        :param A_y: The super parameter - optimization weight for ranking accuracy
+        :param A_z: The super parameter - optimization weight for group fairness
+        :param results: The flag of optimization, initialize to 0, update to 1 when optimization converged 
+        :param _run_state: The per-run state returned by function 'newRunState', keeps the evaluation count of this run.
+                           If not given, the evaluations are counted on the function attribute 'iters' shared by all runs.
+        :return: returns the estimated scores of all user and the probability mapping of protected and unprotected group if converged.
+                 returns the last loss during optimization if optimization doesn't converge.
+    """
+
+    iters = countEvaluation(lbfgsOptimize, _run_state)
+    profiler = getProfiler(_run_state)
+    if profiler is not None:
+        profiler.startEvaluation(iters, _params)
+    checkOptimizeInput(_data, _pro_data, _unpro_data, _inputscores, _accmeasure, _k)
+    # get basic statistics
+    user_N, att_N= _data.shape
+    pro_N = _pro_data.shape[0]
+    unpro_N = _unpro_data.shape[0]
+
+    # initialize parameters of neural network
+    alpha0 = _params[:att_N]
+    alpha1 = _params[att_N : 2 * att_N]
+    w = _params[2 * att_N : (2 * att_N) + _k]
+    # initialize the starting clusters
+    clusters = np.matrix(_params[(2 * att_N) + _k:]).reshape((_k, att_N)) 
+    # compute the distance from X to Z    
+    with profileSpan(profiler, "distances"):
+        dists_x = distances(_data, clusters, alpha1, user_N, att_N, _k)  
+    with profileSpan(profiler, "M_nk"):
+        M_nk_x = M_nk(dists_x, user_N, _k)    
+    
+   
+    # based on the cluster centroid compute the distance of protected group and unprotected group
+    with profileSpan(profiler, "distances"):
+        pro_dists = distances(_pro_data, clusters, alpha1, pro_N, att_N, _k)
+    with profileSpan(profiler, "distances"):
+        unpro_dists = distances(_unpro_data, clusters, alpha0, unpro_N, att_N, _k)
+       
+    # compute the probability mapping from X to Z
+    with profileSpan(profiler, "M_nk"):
+        pro_M_nk = M_nk(pro_dists, pro_N, _k)
+    with profileSpan(profiler, "M_nk"):
+        unpro_M_nk = M_nk(unpro_dists, unpro_N, _k)
+    
+    with profileSpan(profiler, "L_z", LOSS):
+        # compute the summed probability of protected and unprotected group
+        with profileSpan(profiler, "M_k"):
+            pro_M_k = M_k(pro_M_nk, pro_N, _k)
+        with profileSpan(profiler, "M_k"):
+            unpro_M_k = M_k(unpro_M_nk, unpro_N, _k)
+        # compute the mapping difference between protected group and unprotected group i.e. sub-loss of group fairness
+        L_z = 0.0
+        for j in range(_k):
+            L_z += abs(pro_M_k[j] - unpro_M_k[j])
+    
+    with profileSpan(profiler, "L_x", LOSS):
+        # compute the estimated x hat from Z i.e. sub-loss of X
+        with profileSpan(profiler, "x_n_hat"):
+            pro_x_n_hat, L_x1 = x_n_hat(_pro_data, pro_M_nk, clusters, pro_N, att_N, _k)
+        with profileSpan(profiler, "x_n_hat"):
+            unpro_x_n_hat, L_x2 = x_n_hat(_unpro_data, unpro_M_nk, clusters, unpro_N, att_N, _k)
+        L_x = L_x1 + L_x2
+    
+    # compute the estimated scores and ranking accuracy i.e. sub-loss of ranking Y
+
+    with profileSpan(profiler, "L_y", LOSS):
+        estimate_scores, L_y = calculateEstimateY(M_nk_x, _inputscores, clusters, user_N, _k, _accmeasure,
+                                                  getEstimateContext(_run_state, _inputscores))
+    
+    # generate the total loss    
+    criterion = A_x * L_x + A_y * L_y + A_z * L_z
+    if profiler is not None:
+        profiler.endEvaluation(criterion, L_x, L_y, L_z)
+
+    # print out the current loss after each 250 iterations
+    if iters % 250 == 0 and isDisplayed(_run_state):
+        print(iters, criterion)
+       
+    if results:
+        return estimate_scores, pro_M_nk, unpro_M_nk
+    else:
+        recordCriterion(_run_state, criterion)
+        return criterion
+# after each optimization, reset the iteration to zero
+lbfgsOptimize.iters = 0
+
+def calculateEstimateYGrad(_M_nk_x, _inputscores, _clusters, _N, _k, _accmeasure, _context=None):
+    """
+        Calculate the estimated score, a differentiable ranking loss and its gradient w.r.t. the estimated scores.
+        Score difference and pearson correlation compare the two score lists sorted in descending order, as 'calculateEstimateY' does,
+        so they equal the losses of 'lbfgsOptimize', and their (sub)gradient is passed back to the users through the sort permutation.
+        Position difference, kendall distance and spearman correlation are piecewise constant in the scores,
+        so they are replaced by a surrogate built on the pearson correlation r between the estimated scores
+        and the ranks of the input scores: -r for spearman correlation, (1-r)/2 for position difference and kendall distance.
+        These three losses differ from the ones of 'lbfgsOptimize' and 'calculateEvaluateRez'.
+        :param _M_nk_x: The probability mapping matrix from input X and clusters Z
+        :param _inputscores: The input scores of all users
+        :param _clusters: The clusters in the intermediate Z
+        :param _N: The total user number in input X
+        :param _k: The number of clusters in the intermediate layer of neural network
+        :param _accmeasure: The ranking accuracy measure used in this function
+        :param _context: The EstimateYContext of _inputscores, the ranks of the input scores are computed in this call if not given
+        :return: returns the estimated scores, the ranking loss and its gradient w.r.t. the estimated scores.
+    """
+    # estimated score of each user is the weighted summation of its mapped clusters
+    score_hat = np.dot(_M_nk_x, utility.calculateWeightedScores(np.asarray(_clusters)))
+    inputscores = np.asarray(_inputscores, dtype=float)
+
+    if _accmeasure==SCORE_DIVERGENCE:
+        # compare the scores position-wise after sorting both lists in descending order
+        order_hat = utility.calculateRankingOrder(score_hat)
+        diff = score_hat[order_hat] - np.sort(inputscores)[::-1]
+        ranking_loss = np.abs(diff).sum() / _N
+        grad_scores = np.zeros(_N)
+        grad_scores[order_hat] = np.sign(diff) / _N
+        return score_hat, ranking_loss, grad_scores
+
+    if _accmeasure==PEARSON_COR:
+        # correlate the sorted lists, the gradient of each sorted position belongs to the user ranked there
+        order_hat = utility.calculateRankingOrder(score_hat)
+        if _context is not None:
+            sorted_inputscores = _context.sorted_scores
+        else:
+            sorted_inputscores = np.sort(inputscores)[::-1]
+        cor, grad_sorted = calculatePearsonGrad(score_hat[order_hat], sorted_inputscores)
+        grad_cor = np.zeros(_N)
+        grad_cor[order_hat] = grad_sorted
+        # use the negative value to minimize during optimization
+        return score_hat, -cor, -grad_cor
+
+    if _context is not None:
+        target = _context.ranks
+    else:
+        target = rankdata(inputscores)
+    cor, grad_cor = calculatePearsonGrad(score_hat, target)
+
+    if _accmeasure in (POSITION_DIFFERENCE, KENDALL_DIS):
+        return score_hat, (1 - cor) / 2, -grad_cor / 2
+    # for spearman relation, use the negative value to minimize during optimization
+    return score_hat, -cor, -grad_cor
+
+def calculatePearsonGrad(_scores, _target):
+    """
+        Calculate the pearson correlation of two score arrays and its gradient w.r.t. the first one.
+        Called by function 'calculateEstimateYGrad'.
+        :param _scores: The estimated scores
+        :param _target: The scores to correlate with, in the same order as _scores
+        :return: returns the correlation and its gradient, 0 and a zero gradient if either array is constant.
+    """
+    centered_scores = _scores - _scores.mean()
+    centered_target = _target - _target.mean()
+    norm_scores = np.sqrt(np.dot(centered_scores, centered_scores))
+    norm_target = np.sqrt(np.dot(centered_target, centered_target))
+    if norm_scores == 0 or norm_target == 0: # correlation is not defined for constant scores
+        return 0.0, np.zeros(len(_scores))
+    cor = np.dot(centered_scores, centered_target) / (norm_scores * norm_target)
+    grad_cor = centered_target / (norm_scores * norm_target) - cor * centered_scores / (norm_scores * norm_scores)
+    return cor, grad_cor
+
+def lbfgsOptimizeGrad(_params, _data, _pro_data, _unpro_data, 
+        _inputscores, _accmeasure, _k, A_x = 0.01, A_y = 1, A_z = 100, results=0, _run_state=None):
+    """
+        The objective of function 'lbfgsOptimize' together with its analytic gradient, for l-bfgs without approximated gradient.
+        L_x and L_z are differentiated exactly, L_y is replaced by the differentiable surrogate of function 'calculateEstimateYGrad'.
+        :param _params: The optimization parameters
+        :param _data: The input data of all users - X 
+        :param _pro_data: The input data of protected group
+        :param _unpro_data: The input data of unprotected group
+        :param _inputscores: The scores of input users which can be a score attribute or summed score of all attributes
+        :param _accmeasure: The ranking accuracy measure used in this function
+        :param _k: The number of clusters in the intermediate layer of neural network        
+        :param A_x: The super parameter - optimization weight for accuracy of reconstructing X
+        :param A_y: The super parameter - optimization weight for ranking accuracy
+        :param A_z: The super parameter - optimization weight for group fairness
+        :param results: The flag of optimization, initialize to 0, update to 1 when optimization converged 
+        :param _run_state: The per-run state returned by function 'newRunState', keeps the evaluation count of this run.
+                           If not given, the evaluations are counted on the function attribute 'iters' shared by all runs.
+        :return: returns the estimated scores of all user and the probability mapping of protected and unprotected group if converged.
+                 returns the loss and its gradient w.r.t. _params if optimization doesn't converge.
+    """
+    iters = countEvaluation(lbfgsOptimizeGrad, _run_state)
+    profiler = getProfiler(_run_state)
+    if profiler is not None:
+        profiler.startEvaluation(iters, _params)
+    checkOptimizeInput(_data, _pro_data, _unpro_data, _inputscores, _accmeasure, _k)
+    # get basic statistics
+    user_N, att_N= _data.shape
+    pro_N = _pro_data.shape[0]
+    unpro_N = _unpro_data.shape[0]
+
+    # initialize parameters of neural network
+    alpha0 = _params[:att_N]
+    alpha1 = _params[att_N : 2 * att_N]
+    clusters = np.asarray(_params[(2 * att_N) + _k:]).reshape((_k, att_N))
+
+    # forward pass, same as function 'lbfgsOptimize'
+    with profileSpan(profiler, "distances"):
+        dists_x = distances(_data, clusters, alpha1, user_N, att_N, _k)
+    with profileSpan(profiler, "M_nk"):
+        M_nk_x = M_nk(dists_x, user_N, _k)
+    with profileSpan(profiler, "distances"):
+        pro_dists = distances(_pro_data, clusters, alpha1, pro_N, att_N, _k)
+    with profileSpan(profiler, "distances"):
+        unpro_dists = distances(_unpro_data, clusters, alpha0, unpro_N, att_N, _k)
+    with profileSpan(profiler, "M_nk"):
+        pro_M_nk = M_nk(pro_dists, pro_N, _k)
+    with profileSpan(profiler, "M_nk"):
+        unpro_M_nk = M_nk(unpro_dists, unpro_N, _k)
+    with profileSpan(profiler, "L_z", LOSS):
+        with profileSpan(profiler, "M_k"):
+            pro_M_k = M_k(pro_M_nk, pro_N, _k)
+        with profileSpan(profiler, "M_k"):
+            unpro_M_k = M_k(unpro_M_nk, unpro_N, _k)
+        L_z = np.abs(pro_M_k - unpro_M_k).sum()
+    with profileSpan(profiler, "L_x", LOSS):
+        with profileSpan(profiler, "x_n_hat"):
+            pro_x_n_hat, L_x1 = x_n_hat(_pro_data, pro_M_nk, clusters, pro_N, att_N, _k)
+        with profileSpan(profiler, "x_n_hat"):
+            unpro_x_n_hat, L_x2 = x_n_hat(_unpro_data, unpro_M_nk, clusters, unpro_N, att_N, _k)
+        L_x = L_x1 + L_x2
+    with profileSpan(profiler, "L_y", LOSS):
+        estimate_scores, L_y, grad_scores = calculateEstimateYGrad(M_nk_x, _inputscores, clusters, user_N, _k, _accmeasure,
+                                                                   getEstimateContext(_run_state, _inputscores))
+
+    criterion = A_x * L_x + A_y * L_y + A_z * L_z
+
+    # print out the current loss after each 25 evaluations, each evaluation already includes the gradient
+    if iters % 25 == 0 and isDisplayed(_run_state):
+        print(iters, criterion)
+
+    if results:
+        if profiler is not None:
+            profiler.endEvaluation(criterion, L_x, L_y, L_z)
+        return estimate_scores, pro_M_nk, unpro_M_nk
+    recordCriterion(_run_state, criterion)
+
+    # backward pass
+    with profileSpan(profiler, "backward", GRADIENT):
+        # gradient of L_z w.r.t. the probability mapping of both groups
+        sign_z = np.sign(pro_M_k - unpro_M_k)
+        grad_pro_M_nk = np.tile(A_z * sign_z / pro_N, (pro_N, 1))
+        grad_unpro_M_nk = np.tile(-A_z * sign_z / unpro_N, (unpro_N, 1))
+        # gradient of L_x w.r.t. the probability mapping and the clusters
+        with profileSpan(profiler, "x_n_hat_grad"):
+            pro_grad_M_nk, grad_clusters = x_n_hat_grad(_pro_data, pro_M_nk, clusters, pro_x_n_hat, pro_N, att_N, _k)
+        with profileSpan(profiler, "x_n_hat_grad"):
+            unpro_grad_M_nk, unpro_grad_clusters = x_n_hat_grad(_unpro_data, unpro_M_nk, clusters, unpro_x_n_hat, unpro_N, att_N, _k)
+        grad_pro_M_nk += A_x * pro_grad_M_nk
+        grad_unpro_M_nk += A_x * unpro_grad_M_nk
+        grad_clusters = A_x * (grad_clusters + unpro_grad_clusters)
+        # gradient of L_y w.r.t. the probability mapping and the clusters, score_hat = M_nk_x * clusters * weights
+        cluster_scores = utility.calculateWeightedScores(clusters)
+        grad_M_nk_x = A_y * np.outer(grad_scores, cluster_scores)
+        grad_clusters += A_y * np.outer(np.dot(M_nk_x.T, grad_scores), np.ones(att_N) / att_N)
+        # back-propagate the probability mappings through the distances to the clusters and attribute weights
+        grad_alpha1 = np.zeros(att_N)
+        for X, M, grad_M, alpha, N in ((_data, M_nk_x, grad_M_nk_x, alpha1, user_N),
+                                       (_pro_data, pro_M_nk, grad_pro_M_nk, alpha1, pro_N)):
+            with profileSpan(profiler, "M_nk_grad"):
+                grad_dists = M_nk_grad(M, grad_M, N, _k)
+            with profileSpan(profiler, "distances_grad"):
+                dist_grad_clusters, dist_grad_alpha = distances_grad(X, clusters, alpha, grad_dists, N, att_N, _k)
+            grad_clusters += dist_grad_clusters
+            grad_alpha1 += dist_grad_alpha
+        with profileSpan(profiler, "M_nk_grad"):
+            grad_dists = M_nk_grad(unpro_M_nk, grad_unpro_M_nk, unpro_N, _k)
+        with profileSpan(profiler, "distances_grad"):
+            grad_clusters_unpro, grad_alpha0 = distances_grad(_unpro_data, clusters, alpha0, grad_dists, unpro_N, att_N, _k)
+        grad_clusters += grad_clusters_unpro
+
+        # w does not enter the loss
+        grad = np.zeros(len(_params))
+        grad[:att_N] = grad_alpha0
+        grad[att_N : 2 * att_N] = grad_alpha1
+        grad[(2 * att_N) + _k:] = grad_clusters.flatten()
+    if profiler is not None:
+        profiler.endEvaluation(criterion, L_x, L_y, L_z)
+    return criterion, grad
+# after each optimization, reset the iteration to zero
+lbfgsOptimizeGrad.iters = 0
+
+class StratifiedBatches(object):
+    """
+        Draw mini-batches of users that keep the proportion of protected and unprotected group of the whole data.
+        Each group is shuffled once per pass over it and cut into consecutive slices, so drawing a batch costs
+        the size of the batch and not the size of the group.
+    """
+
+    def __init__(self, _pro_index, _unpro_index, _batch_size, _rng):
+        """
+            :param _pro_index: The row numbers of protected group
+            :param _unpro_index: The row numbers of unprotected group
+            :param _batch_size: The number of users of a batch, at least one user of each group is drawn
+            :param _rng: The numpy RandomState used to shuffle the groups
+        """
+        user_N = len(_pro_index) + len(_unpro_index)
+        pro_batch_N = min(max(int(round(_batch_size * len(_pro_index) / user_N)), 1), len(_pro_index))
+        unpro_batch_N = min(max(_batch_size - pro_batch_N, 1), len(_unpro_index))
+        self.rng = _rng
+        self.groups = [[np.asarray(_pro_index), pro_batch_N, None, 0], [np.asarray(_unpro_index), unpro_batch_N, None, 0]]
+
+    def next(self):
+        """
+            :return: returns the row numbers of the protected and of the unprotected users of the next batch.
+        """
+        batch = []
+        for group in self.groups:
+            index, batch_N, order, position = group
+            if order is None or position + batch_N > len(index):
+                # start a new pass over the group
+                order = self.rng.permutation(len(index))
+                position = 0
+            batch.append(index[order[position : position + batch_N]])
+            group[2], group[3] = order, position + batch_N
+        return batch[0], batch[1]
+
+def stochasticOptimize(_params, _bounds, _data, _pro_index, _inputscores, _accmeasure, _k, A_x = 0.01, A_y = 1, A_z = 100,
+                       _optimizer=ADAM, _learning_rate=0.01, _batch_size=1024, _steps=2000, _checkpoint_every=100,
+                       _patience=5, _tol=1e-4, _seed=None, _run_state=None, _disp=False):
+    """
+        Optimize the objective of function 'lbfgsOptimizeGrad' by a first-order method on stratified mini-batches of users.
+        Every step estimates L_x, L_y and L_z and their gradient on one batch that keeps the proportion of protected users.
+        The full data is only evaluated at checkpoints, the parameters of the best checkpoint are returned.
+        The parameters are the same as in the l-bfgs optimization, so both results are comparable.
+        The full-data loss is the one of function 'lbfgsOptimizeGrad', so for position difference, kendall distance
+        and spearman correlation its L_y is the differentiable surrogate, not the accuracy of function 'calculateEvaluateRez'.
+
+        :param _params: The initialized optimization parameters, from function 'initOptimization'
+        :param _bounds: The bounds of the parameters, from function 'initOptimization', parameters are clipped into them
+        :param _data: The input data of all users - X
+        :param _pro_index: The row numbers of protected group
+        :param _inputscores: The scores of input users
+        :param _accmeasure: The ranking accuracy measure used in this function
+        :param _k: The number of clusters in the intermediate layer of neural network
+        :param A_x: The super parameter - optimization weight for accuracy of reconstructing X
+        :param A_y: The super parameter - optimization weight for ranking accuracy
+        :param A_z: The super parameter - optimization weight for group fairness
+        :param _optimizer: The first-order optimizer, one of 'adam', 'momentum'
+        :param _learning_rate: The step size of the optimizer
+        :param _batch_size: The number of users of a batch
+        :param _steps: The maximum number of steps
+        :param _checkpoint_every: The number of steps between two evaluations of the full data
+        :param _patience: The number of checkpoints without improvement after which the optimization stops
+        :param _tol: The relative decrease of the best full-data loss that counts as improvement
+        :param _seed: The seed of the batches, uses the global numpy random state if not given
+        :param _run_state: The run state returned by function 'newRunState' of the batch evaluations, a new one is used if not given.
+                           The losses of single batches are never printed.
+        :param _disp: Whether to print the full-data loss of every checkpoint
+        :return: returns the parameters of the best checkpoint, its full-data loss and a dictionary of the number of steps,
+                 the (step, full-data loss) of every checkpoint and the optimizer.
+    """
+    if _optimizer not in (ADAM, MOMENTUM):
+        raise ValueError("Input optimizer must be a string that choose from ['adam', 'momentum']")
+    if not isinstance( _batch_size, ( int, long ) ) or _batch_size <= 1:
+        raise ValueError("Input batch size must be an integer larger than 1")
+    if not isinstance( _steps, ( int, long ) ) or _steps <= 0 or not isinstance( _checkpoint_every, ( int, long ) ) or _checkpoint_every <= 0:
+        raise ValueError("Input steps and checkpoint interval must be integers larger than 0")
+    user_N = _data.shape[0]
+    pro_index = np.asarray(_pro_index)
+    is_protected = np.zeros(user_N, dtype=bool)
+    is_protected[pro_index] = True
+    unpro_index = np.flatnonzero(~is_protected)
+    inputscores = np.asarray(_inputscores)
+    pro_data = _data[pro_index]
+    unpro_data = _data[unpro_index]
+
+    rng = np.random if _seed is None else np.random.RandomState(_seed)
+    batches = StratifiedBatches(pro_index, unpro_index, _batch_size, rng)
+    if _run_state is None:
+        _run_state = newRunState()
+    _run_state["disp"] = False # the loss of one batch says little about the progress
+    full_state = newRunState(_disp=False) # the full-data evaluations keep their own context of the input scores
+    lower = np.array([-np.inf if lo is None else lo for lo, up in _bounds])
+    upper = np.array([np.inf if up is None else up for lo, up in _bounds])
+
+    def evaluateFull(_current):
+        return float(lbfgsOptimizeGrad(_current, _data, pro_data, unpro_data, _inputscores, _accmeasure, _k,
+                                       A_x, A_y, A_z, 0, full_state)[0])
+
+    params = np.array(_params, dtype=float)
+    best_params, best_criterion = params.copy(), evaluateFull(params)
+    checkpoints = [(0, best_criterion)]
+    moment = np.zeros(len(params)) # first moment of adam, velocity of momentum
+    moment2 = np.zeros(len(params)) # second moment of adam
+    waited = 0
+    step = 0
+    while step < _steps:
+        step += 1
+        pro_batch, unpro_batch = batches.next()
+        batch = np.concatenate((pro_batch, unpro_batch))
+        criterion, grad = lbfgsOptimizeGrad(params, _data[batch], _data[pro_batch], _data[unpro_batch], inputscores[batch],
+                                            _accmeasure, _k, A_x, A_y, A_z, 0, _run_state)
+        if _optimizer == ADAM:
+            moment = ADAM_BETA1 * moment + (1 - ADAM_BETA1) * grad
+            moment2 = ADAM_BETA2 * moment2 + (1 - ADAM_BETA2) * grad * grad
+            moment_hat = moment / (1 - ADAM_BETA1 ** step)
+            moment2_hat = moment2 / (1 - ADAM_BETA2 ** step)
+            params = params - _learning_rate * moment_hat / (np.sqrt(moment2_hat) + ADAM_EPSILON)
+        else:
+            moment = MOMENTUM_DECAY * moment - _learning_rate * grad
+            params = params + moment
+        params = np.clip(params, lower, upper)
+
+        if step % _checkpoint_every == 0 or step == _steps:
+            criterion = evaluateFull(params)
+            checkpoints.append((step, criterion))
+            if _disp:
+                print "Checkpoint at step ", step, " full-data loss: ", criterion
+            if criterion < best_criterion - _tol * abs(best_criterion):
+                waited = 0
+            else:
+                waited += 1
+            if criterion < best_criterion:
+                best_params, best_criterion = params.copy(), criterion
+            if waited >= _patience:
+                break
+    return best_params, best_criterion, {"steps": step, "checkpoints": checkpoints, "optimizer": _optimizer}
+
+def newRunState(_callback=None, _profiler=None, _disp=True):
+    """
+        Create the state of one optimization run, so that several runs can be evaluated side by side.
+        :param _callback: The function called with the run state after each evaluation of the objective, can raise to stop the run
+        :param _profiler: The objectiveProfiler.ObjectiveProfiler that records the evaluations of this run, no profiling if not given
+        :param _disp: Whether the objective prints the current loss periodically
+        :return: returns the run state, a dictionary of the evaluation count, the l-bfgs iteration count, the last and the best criterion,
+                 the callback, the profiler, the display flag and the EstimateYContext of the input scores, created by the first evaluation.
+    """
+    return {"iters": 0, "steps": 0, "criterion": None, "best_criterion": None, "callback": _callback, "profiler": _profiler,
+            "disp": _disp, "estimate_context": None}
+
+def getProfiler(_run_state):
+    """
+        :param _run_state: The run state returned by function 'newRunState', or None
+        :return: returns the profiler of the run, None if the run is not profiled.
+    """
+    if _run_state is None:
+        return None
+    return _run_state.get("profiler")
+
+def isDisplayed(_run_state):
+    """
+        :param _run_state: The run state returned by function 'newRunState', or None
+        :return: returns whether the objective prints the current loss, True without run state.
+    """
+    if _run_state is None:
+        return True
+    return _run_state.get("disp", True)
+
+def getEstimateContext(_run_state, _inputscores):
+    """
+        Get the EstimateYContext of the input scores kept in the run state, created once per run.
+        :param _run_state: The run state returned by function 'newRunState', or None
+        :param _inputscores: The input scores of the evaluation
+        :return: returns the EstimateYContext of _inputscores, None without run state so that it is computed per call.
+    """
+    if _run_state is None:
+        return None
+    context = _run_state.get("estimate_context")
+    if context is None or not context.isFor(_inputscores):
+        context = EstimateYContext(_inputscores)
+        _run_state["estimate_context"] = context
+    return context
+
+def countEvaluation(_objective, _run_state):
+    """
+        Count one evaluation of the objective.
+        :param _objective: The objective function, whose attribute 'iters' is used if no run state is given
+        :param _run_state: The run state returned by function 'newRunState', or None
+        :return: returns the evaluation count of the run.
+    """
+    if _run_state is None:
+        _objective.iters += 1
+        return _objective.iters
+    _run_state["iters"] += 1
+    return _run_state["iters"]
+
+def countStep(_run_state):
+    """
+        Count one iteration of l-bfgs. An iteration takes one or more evaluations of the objective,
+        and len(params)+1 evaluations per gradient when the gradient is approximated by finite differences.
+        :param _run_state: The run state returned by function 'newRunState'
+        :return: returns the iteration count of the run.
+    """
+    _run_state["steps"] += 1
+    return _run_state["steps"]
+
+def recordCriterion(_run_state, _criterion):
+    """
+        Record the criterion of the last evaluation in the run state and call its callback.
+        :param _run_state: The run state returned by function 'newRunState', or None
+        :param _criterion: The total loss of the last evaluation
+        :return: no returns.
+    """
+    if _run_state is None:
+        return
+    _run_state["criterion"] = _criterion
+    if _run_state["best_criterion"] is None or _criterion < _run_state["best_criterion"]:
+        _run_state["best_criterion"] = _criterion
+    if _run_state["callback"] is not None:
+        _run_state["callback"](_run_state)
+
+def checkOptimizeInput(_data, _pro_data, _unpro_data, _inputscores, _accmeasure, _k):
+    """
+        Check the input of the optimization objective.
+        :param _data: The input data of all users - X
+        :param _pro_data: The input data of protected group
+        :param _unpro_data: The input data of unprotected group
+        :param _inputscores: The scores of input users
+        :param _accmeasure: The ranking accuracy measure
+        :param _k: The number of clusters in the intermediate layer of neural network
+        :return: no returns. Raise errors if founded.
+    """
+    user_N, att_N= _data.shape
+    pro_N, pro_att_N = _pro_data.shape
+    unpro_N, unpro_att_N = _unpro_data.shape
+
+    # error handling for input type
+    if not isinstance(_inputscores, (list, tuple, np.ndarray)) and not isinstance( _inputscores, basestring ):
+        raise TypeError("Input score list must be a list-wise structure defined by '[]' symbol")
+    if not isinstance( _k, ( int, long ) ):
+        raise TypeError("Input k must be an integer")
+    if not isinstance( _accmeasure, str ):
+        raise TypeError("Input accuracy measure must be a string that choose from ['scoreDiff', 'positionDiff', 'kendallDis', 'spearmanDis', 'pearsonDis'] defined in the begining of this file")
+    
+    # error handling for input value
+    if user_N == 0:
+        raise ValueError("Input data should not be empty")
+    if (att_N *pro_att_N *unpro_att_N) == 0:
+        raise ValueError("Input data, protected group data, and unprotected group data should have at least one attribute column")
+    if att_N != pro_att_N:
+        raise ValueError("Input protected group data '_pro_data' should have same size with '_data'")
+    if att_N != unpro_att_N:
+        raise ValueError("Input unprotected group data '_unpro_data' should have same size with '_data'")
+
+    
+    if len(_inputscores) == 0:
+        raise ValueError("Input estimated score list should not be empty")
+    if _k == 0:
+        raise ValueError("Input k must be an integer larger than 0")
+
+def initOptimization(_data,_k,_seed=None):
+    """
+        Initialize the parameter and bound of optimization.
+        :param _data: The input data w.r.t X       
+        :param _k: The number of clusters in the intermediate layer of neural network
+        :param _seed: The seed of the random starting point, uses the global numpy random state if not given
+        :return: returns the parameter vector and bound of optimization.
+    """
+    user_N,att_N=_data.shape
+
+    # error handling for input type    
+    if not isinstance( _k, ( int, long ) ):
+        raise TypeError("Input k must be an integer")
+
+    # error handling for input value
+    if user_N == 0:
+        raise ValueError("Input data should not be empty")
+    if att_N == 0:
+        raise ValueError("Input data should have at least one attribute column")
+    if _k == 0:
+        raise ValueError("Input k must be an integer larger than 0")    
+
+
+    # initialize the parameter vector for neural network
+    random_state = np.random if _seed is None else np.random.RandomState(_seed)
+    rez = random_state.uniform(size=_data.shape[1] * 2 + _k + _data.shape[1] * _k)
+    # initialize the bound of optimization algorithm
+    bnd = []
+    for i, k2 in enumerate(rez):
+        if i < _data.shape[1] * 2 or i >= _data.shape[1] * 2 + _k:
+            bnd.append((None, None))
+        else:
+            bnd.append((0, 1))
     return rez, bnd
\ No newline at end of file
@@ -0,0 +1,68 @@
+import numpy as np
+# a python script define the protected group structure shared by measures, data generator and run scripts
+# it can be passed wherever a protected group list is accepted
+
+class ProtectedGroup(object):
+    """
+        A protected group of individuals identified by non-negative integers, stored as a boolean array over identifiers.
+        Membership of one identifier is O(1) and the membership of a whole ranking is one vectorized lookup,
+        so no set of the protected group is built per call. The size of the group is counted once.
+        Iterating yields the identifiers in increasing order, so it also works where a list of identifiers is expected.
+    """
+
+    def __init__(self,_members,_id_N=None):
+        """
+            :param _members: The identifiers of protected group, e.g., [0, 2, 3], order does not matter
+            :param _id_N: The number of identifiers (0.._id_N-1) the lookup covers, default is the largest member plus one
+        """
+        members=np.asarray(list(_members) if isinstance(_members, (set, frozenset)) else _members)
+        if members.size and members.dtype.kind not in 'iu':
+            raise TypeError("Input protected group must be non-negative integer identifiers")
+        members=members.astype(np.int64).ravel()
+        if members.size and members.min() < 0:
+            raise ValueError("Input protected group must be non-negative integer identifiers")
+        if len(np.unique(members)) != len(members): # check repetition of protected group
+            raise ValueError("Please input a valid protected group that have no repetitive members")
+
+        id_N=int(members.max())+1 if members.size else 0
+        if _id_N is not None:
+            if _id_N < id_N:
+                raise ValueError("Input number of identifiers must be larger than the largest member")
+            id_N=_id_N
+        self.is_protected=np.zeros(id_N,dtype=bool)
+        self.is_protected[members]=True
+        self.members=np.sort(members)
+        self.pro_N=len(self.members)
+
+    def __len__(self):
+        return self.pro_N
+
+    def __iter__(self):
+        return iter(self.members.tolist())
+
+    def __contains__(self,_item):
+        if not isinstance( _item, ( int, long, np.integer ) ): # not an integer identifier
+            return False
+        return 0 <= _item < len(self.is_protected) and bool(self.is_protected[_item])
+
+    def getMask(self,_ranking):
+        """
+            Look up the protected membership of every identifier of a ranking at once.
+            :param _ranking: A ranking of identifiers, or a 2-D array with one ranking per row
+            :return: returns a boolean array with the shape of _ranking, True where the individual is protected.
+        """
+        ranking=np.asarray(_ranking)
+        if ranking.size and ranking.dtype.kind not in 'iu':
+            return np.in1d(ranking,self.members).reshape(ranking.shape)
+        ranking=ranking.astype(np.int64)
+        inside=(ranking >= 0) & (ranking < len(self.is_protected))
+        if inside.all():
+            return self.is_protected[ranking]
+        return np.where(inside,self.is_protected[np.where(inside,ranking,0)],False) if len(self.is_protected) else np.zeros(ranking.shape,dtype=bool)
+
+    def countIn(self,_ranking):
+        """
+            :param _ranking: A ranking of identifiers
+            :return: returns the number of protected individuals in the ranking.
+        """
+        return int(self.getMask(_ranking).sum())
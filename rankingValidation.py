@@ -0,0 +1,117 @@
+import numpy as np
+from protectedGroup import ProtectedGroup
+# a python script define the validation policy of the rankings and permutations checked by measures and data generator
+# the policy can be set globally by function 'setValidationMode' or per call by the '_validation' parameter of a measure
+
+VALIDATE_FULL="full" # represent the complete checks of every item, the default
+VALIDATE_SAMPLED="sampled" # represent the checks of types, sizes and repetitions among a random sample of items
+VALIDATE_TRUSTED="trusted" # represent no checks, for input that is valid by construction
+VALIDATION_SAMPLE_N=64 # number of items checked for repetitions in sampled validation
+
+VALIDATION_MODE=VALIDATE_FULL # default mode used when no mode is given per call
+
+_sample_rng=np.random.RandomState(0) # sampled validation draws from its own generator, not the global random state
+
+def setValidationMode(_mode):
+    """
+        Select the validation mode used by the checks of measures and data generator when no mode is given per call.
+        :param _mode: The validation mode, one of 'full', 'sampled', 'trusted'
+        :return: no returns.
+    """
+    global VALIDATION_MODE
+    VALIDATION_MODE=resolveValidation(_mode)
+
+def getValidationMode():
+    """
+        Get the validation mode used when no mode is given per call.
+        :return: returns the name of the current validation mode.
+    """
+    return VALIDATION_MODE
+
+def resolveValidation(_validation):
+    """
+        :param _validation: The validation mode of one call, None means the global mode
+        :return: returns the validation mode to apply. Raise errors if the mode is unknown.
+    """
+    if _validation is None:
+        return VALIDATION_MODE
+    if _validation not in (VALIDATE_FULL, VALIDATE_SAMPLED, VALIDATE_TRUSTED):
+        raise ValueError("Input validation mode must be a string that choose from ['full', 'sampled', 'trusted']")
+    return _validation
+
+def sampleItems(_items):
+    """
+        Draw the items at up to VALIDATION_SAMPLE_N random positions, each position at most once.
+        :param _items: A list-wise structure
+        :return: returns a list of the sampled items.
+    """
+    if len(_items) <= VALIDATION_SAMPLE_N:
+        return list(_items)
+    positions=np.unique(_sample_rng.randint(0,len(_items),VALIDATION_SAMPLE_N))
+    if isinstance(_items, np.ndarray):
+        return _items[positions].tolist()
+    return [_items[pi] for pi in positions]
+
+def hasSampleRepetition(_items):
+    """
+        :param _items: A list-wise structure
+        :return: returns true if the sampled items of _items include repetitive items.
+    """
+    sample=sampleItems(_items)
+    return len(set(sample)) != len(sample)
+
+def isValidated(_ranking):
+    """
+        :param _ranking: A ranking or permutation
+        :return: returns true if _ranking is a ValidatedRanking that passed its checks.
+    """
+    return getattr(_ranking, "is_validated", False)
+
+class ValidatedRanking(np.ndarray):
+    """
+        A read-only ranking or permutation that remembers that it passed the checks.
+        It is checked once for repetitive items when created, then the checks of every measure skip it,
+        and each ProtectedGroup it passes 'dataGenerator.completeCheckRankingProperties' with is remembered as well.
+        Slices and other arrays derived from it are not validated, since they can be incomplete rankings.
+    """
+
+    def __new__(cls,_ranking):
+        """
+            :param _ranking: A ranking, e.g., [0, 3, 5, 2, 1, 4]. Each number is an identifier of an individual.
+        """
+        if not isinstance(_ranking, (list, tuple, np.ndarray)):
+            raise TypeError("Input ranking must be a list-wise structure defined by '[]' symbol")
+        ranking=np.array(_ranking)
+        if ranking.ndim != 1 or len(ranking) == 0:
+            raise ValueError("Please input a valid ranking")
+        if len(np.unique(ranking)) != len(ranking): # check for repetition in input ranking
+            raise ValueError("Please input a valid complete ranking")
+        obj=ranking.view(cls)
+        obj.flags.writeable=False # the checks stay valid because the items cannot change
+        obj.is_validated=True
+        return obj
+
+    def __array_finalize__(self,_obj):
+        self.is_validated=False
+        self.protected_groups=[]
+
+    def __reduce__(self):
+        # pickled copies are rebuilt through the checks, e.g. when sent to worker processes
+        return (ValidatedRanking, (np.asarray(self),))
+
+    def hasPassed(self,_protected_group):
+        """
+            :param _protected_group: The protected group of a check
+            :return: returns true if this ranking passed the checks with the same ProtectedGroup object before.
+        """
+        return self.is_validated and any(gi is _protected_group for gi in self.protected_groups)
+
+    def markPassed(self,_protected_group):
+        """
+            Remember a ProtectedGroup this ranking passed the checks with. Lists of identifiers can be changed in place,
+            so only ProtectedGroup objects are remembered.
+            :param _protected_group: The protected group of a passed check
+            :return: no returns.
+        """
+        if self.is_validated and isinstance(_protected_group, ProtectedGroup) and not self.hasPassed(_protected_group):
+            self.protected_groups.append(_protected_group)
@@ -0,0 +1,292 @@
+from __future__ import division
+import os
+import time
+import shutil
+import tempfile
+import numpy as np
+import measures
+import dataGenerator
+import optimization
+import utility
+import runOptimization
+# a python script to benchmark the hot paths of measures, data generator and optimization. Can be run from command line by following command
+# runBenchmarks output_fn user_Ns repeats history_fn threshold label
+# output_fn represents the output file of benchmark results of this run
+# user_Ns is the list of ranking sizes of the measure and generator benchmarks, e.g. [1000, 10000, 100000, 1000000]
+# repeats is the number of timed calls of each benchmark, the best one is compared with the history
+# history_fn represents the csv file that keeps the results of all runs, this run is appended to it
+# threshold is the fraction a best time may exceed the baseline of the history before it is flagged as regression
+# label is a free text to identify this run in the history, e.g. a commit id
+
+SUITES=["measures","dataGenerator","optimization","runOptimization"] # modules covered by the benchmarks
+USER_NS=[1000,10000,100000,1000000] # default ranking sizes of the measure and generator benchmarks
+PRO_FRACTION=0.3 # size of protected group relative to the ranking size
+BENCHMARK_K=4 # size of intermediate layer of neural network in optimization benchmarks
+BENCHMARK_CUTPOINT=10 # cut point of fairness measures in optimization benchmarks
+BENCHMARK_DATA=[("GermanCredit_age25.csv",1),("ProPublica_race.csv",2)] # bundled data sets and their target column
+MIN_SAMPLE_SECONDS=0.1 # fast benchmarks are called repeatedly in one timed sample of at least this length
+
+HISTORY_FILE="benchmarkHistory.csv" # default file of the results of all runs
+HISTORY_WINDOW=5 # number of latest runs of a benchmark whose median best time is the baseline
+HISTORY_HEADER="Timestamp,Label,Suite,Benchmark,Params,Repeats,bestSeconds,medianSeconds\n"
+RESULT_HEADER="Suite,Benchmark,Params,bestSeconds,medianSeconds,baselineSeconds,ratio,Status\n"
+
+NEW="new" # represent a benchmark without history
+OK="ok" # represent a best time within the threshold of the baseline
+REGRESSION="regression" # represent a best time slower than the baseline by more than the threshold
+IMPROVED="improved" # represent a best time faster than the baseline by more than the threshold
+
+def main(_rez_fn,_user_Ns=None,_repeats=3,_history_fn=HISTORY_FILE,_threshold=0.2,_label="",_suites=None):
+    """
+        Run the benchmarks of the selected suites, compare the best time of each with its history and append this run to the history.
+        Output the timing, baseline and status of each benchmark as csv file.
+
+        :param _rez_fn: The file name to output benchmark results of this run
+        :param _user_Ns: The list of ranking sizes of the measure and generator benchmarks, default is USER_NS
+        :param _repeats: The number of timed calls of each benchmark after one warm-up call
+        :param _history_fn: The csv file that keeps the results of all runs
+        :param _threshold: The fraction a best time may exceed its baseline before it is flagged as regression
+        :param _label: The text to identify this run in the history
+        :param _suites: The list of suites to run, each one of SUITES, default is all
+        :return: returns the list of (suite, benchmark, params, ratio) of the regressions.
+    """
+    if not isinstance( _repeats, ( int, long ) ) or _repeats <= 0:
+        raise ValueError("Input number of repeats must be an integer larger than 0")
+    if _threshold < 0:
+        raise ValueError("Input regression threshold must be a number not less than 0")
+    if "," in _label:
+        raise ValueError("Input label should not include ',' symbol")
+    suites=SUITES if _suites is None else _suites
+    for si in suites:
+        if si not in SUITES:
+            raise ValueError("Input suite must be a string that choose from "+str(SUITES))
+    user_Ns=USER_NS if _user_Ns is None else _user_Ns
+
+    history=readHistory(_history_fn)
+    timestamp=time.strftime("%Y-%m-%dT%H:%M:%S")
+    if not os.path.exists(_history_fn):
+        with open(_history_fn,'w') as mf:
+            mf.write(HISTORY_HEADER)
+
+    result_fn=_rez_fn+".csv"
+    with open(result_fn,'w') as mf:
+        mf.write(RESULT_HEADER)
+    rez_file=open(result_fn, 'a')
+    history_file=open(_history_fn, 'a')
+    regressions=[]
+    try:
+        for suite,name,params,setup in getBenchmarkCases(suites,user_Ns):
+            best,median=timeBenchmark(setup,_repeats)
+            baseline=getBaseline(history.get((suite,name,params),[]))
+            status,ratio=compareBaseline(best,baseline,_threshold)
+            if status==REGRESSION:
+                regressions.append((suite,name,params,ratio))
+            rez_fline=",".join(str(fi) for fi in [suite,name,params,best,median,baseline if baseline is not None else "",
+                                                   ratio if ratio is not None else "",status])+"\n"
+            rez_file.write(rez_fline)
+            rez_file.flush()
+            print(rez_fline.strip())
+            history_file.write(",".join(str(fi) for fi in [timestamp,_label,suite,name,params,_repeats,best,median])+"\n")
+            history_file.flush()
+    finally:
+        rez_file.close()
+        history_file.close()
+
+    for suite,name,params,ratio in regressions:
+        print "Regression of "+suite+"."+name+" ("+params+"): "+str(ratio)+" times the baseline"
+    return regressions
+
+def getBenchmarkCases(_suites,_user_Ns):
+    """
+        Generate the benchmarks of the selected suites. The input of each benchmark is created by its setup function,
+        so only the input of the running benchmark is kept in memory.
+
+        :param _suites: The list of suites to run
+        :param _user_Ns: The list of ranking sizes of the measure and generator benchmarks
+        :return: yields the suite, benchmark name, params text and setup function of each benchmark,
+                 the setup function returns the function to time.
+    """
+    if "measures" in _suites:
+        for user_N in _user_Ns:
+            for gfi in [measures.KL_DIVERGENCE,measures.ND_DIFFERENCE,measures.RD_DIFFERENCE]:
+                yield "measures","calculateNDFairness","N="+str(user_N)+";measure="+gfi,setupNDFairness(user_N,gfi)
+        for user_N in _user_Ns:
+            yield "measures","calculateKendallDistance","N="+str(user_N),setupPermutations(measures.calculateKendallDistance,user_N)
+            yield "measures","calculatePositionDifference","N="+str(user_N),setupPermutations(measures.calculatePositionDifference,user_N)
+        for user_N in _user_Ns:
+            yield "measures","calculateNormalizer","N="+str(user_N)+";measure="+measures.ND_DIFFERENCE,setupNormalizer(user_N)
+    if "dataGenerator" in _suites:
+        for user_N in _user_Ns:
+            yield "dataGenerator","generateUnfairRanking","N="+str(user_N),setupUnfairRanking(user_N)
+    if "optimization" in _suites:
+        for data_fn,target_col in BENCHMARK_DATA:
+            for acci in [optimization.SCORE_DIVERGENCE,optimization.KENDALL_DIS]:
+                yield "optimization","lbfgsOptimize","data="+data_fn+";k="+str(BENCHMARK_K)+";acc="+acci,setupObjective(data_fn,target_col,acci)
+    if "runOptimization" in _suites:
+        for data_fn,target_col in BENCHMARK_DATA:
+            yield "runOptimization","main","data="+data_fn+";k="+str(BENCHMARK_K)+";acc="+optimization.KENDALL_DIS,setupEndToEnd(data_fn,target_col)
+
+def getProtectedGroup(_rng,_user_N):
+    """
+        :param _rng: The random state to draw the protected group
+        :param _user_N: The size of the ranking
+        :return: returns a random protected group of PRO_FRACTION of the identifiers 0.._user_N-1, as a python list.
+    """
+    return _rng.choice(_user_N,max(int(_user_N*PRO_FRACTION),1),replace=False).tolist()
+
+def setupNDFairness(_user_N,_gf_measure):
+    """
+        :param _user_N: The size of the random ranking
+        :param _gf_measure: The group fairness measure, one of 'rKL', 'rND', 'rRD'
+        :return: returns the setup function of the benchmark of 'measures.calculateNDFairness'.
+    """
+    def setup():
+        rng=np.random.RandomState(0)
+        ranking=rng.permutation(_user_N).tolist()
+        protected_group=getProtectedGroup(rng,_user_N)
+        return lambda: measures.calculateNDFairness(ranking,protected_group,measures.NORM_CUTPOINT,_gf_measure,1.0)
+    return setup
+
+def setupPermutations(_measure,_user_N):
+    """
+        :param _measure: The accuracy measure of two permutations, e.g. 'measures.calculateKendallDistance'
+        :param _user_N: The size of the random permutations
+        :return: returns the setup function of the benchmark of _measure.
+    """
+    def setup():
+        rng=np.random.RandomState(0)
+        perm1=rng.permutation(_user_N).tolist()
+        perm2=rng.permutation(_user_N).tolist()
+        return lambda: _measure(perm1,perm2)
+    return setup
+
+def setupNormalizer(_user_N):
+    """
+        :param _user_N: The size of the rankings
+        :return: returns the setup function of the benchmark of 'measures.calculateNormalizer'.
+    """
+    def setup():
+        pro_N=max(int(_user_N*PRO_FRACTION),1)
+        return lambda: measures.calculateNormalizer(_user_N,pro_N,measures.ND_DIFFERENCE)
+    return setup
+
+def setupUnfairRanking(_user_N):
+    """
+        :param _user_N: The size of the random ranking
+        :return: returns the setup function of the benchmark of 'dataGenerator.generateUnfairRanking'.
+    """
+    def setup():
+        rng=np.random.RandomState(0)
+        ranking=rng.permutation(_user_N).tolist()
+        protected_group=getProtectedGroup(rng,_user_N)
+        return lambda: dataGenerator.generateUnfairRanking(ranking,protected_group,0.5)
+    return setup
+
+def setupObjective(_data_fn,_target_col,_accmeasure):
+    """
+        :param _data_fn: The file name of a bundled data set
+        :param _target_col: The target column ranked on
+        :param _accmeasure: The accuracy measure of the objective
+        :return: returns the setup function of the benchmark of one evaluation of 'optimization.lbfgsOptimize'.
+    """
+    def setup():
+        data,input_scores,pro_data,unpro_data,pro_index=utility.transformCSVdata(getDataPath(_data_fn),_target_col,1)
+        params=optimization.initOptimization(data,BENCHMARK_K,0)[0]
+        run_state=optimization.newRunState()
+        return lambda: optimization.lbfgsOptimize(params,data,pro_data,unpro_data,input_scores,_accmeasure,BENCHMARK_K,
+                                                  _run_state=run_state)
+    return setup
+
+def setupEndToEnd(_data_fn,_target_col):
+    """
+        :param _data_fn: The file name of a bundled data set
+        :param _target_col: The target column ranked on
+        :return: returns the setup function of the benchmark of 'runOptimization.main' from a fixed starting point.
+    """
+    def setup():
+        def run():
+            # optimization results are written to a temporary folder and removed
+            rez_folder=tempfile.mkdtemp()
+            try:
+                runOptimization.main(getDataPath(_data_fn),_target_col,1,BENCHMARK_K,optimization.KENDALL_DIS,
+                                     BENCHMARK_CUTPOINT,os.path.join(rez_folder,"rez"),_seed=0)
+            finally:
+                shutil.rmtree(rez_folder)
+        return run
+    return setup
+
+def getDataPath(_data_fn):
+    """
+        :param _data_fn: The file name of a bundled data set
+        :return: returns the path of the data set in the datasets folder next to this script.
+    """
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)),"datasets",_data_fn)
+
+def timeBenchmark(_setup,_repeats):
+    """
+        Time a benchmark after one warm-up call.
+        A benchmark faster than MIN_SAMPLE_SECONDS is called repeatedly in each sample, and the sample is divided by the calls,
+        so that the timer resolution and scheduling noise do not dominate its history.
+
+        :param _setup: The setup function of the benchmark, returns the function to time
+        :param _repeats: The number of timed samples
+        :return: returns the best and the median seconds per call of the timed samples.
+    """
+    benchmark=_setup()
+    start_time=time.time()
+    benchmark() # warm-up call, fills caches and lazily loaded data
+    call_N=max(int(MIN_SAMPLE_SECONDS/max(time.time()-start_time,1e-6)),1)
+    spents=[]
+    for ri in range(_repeats):
+        start_time=time.time()
+        for ci in range(call_N):
+            benchmark()
+        spents.append((time.time()-start_time)/call_N)
+    return min(spents),float(np.median(spents))
+
+def readHistory(_history_fn):
+    """
+        Read the best times of previous runs from the history file.
+
+        :param _history_fn: The csv file that keeps the results of all runs
+        :return: returns a dictionary of (suite, benchmark, params) to the list of best seconds, in the order of runs.
+    """
+    history={}
+    if not os.path.exists(_history_fn):
+        return history
+    with open(_history_fn) as mf:
+        mf.readline() # skip header
+        for line in mf:
+            fields=line.strip().split(",")
+            if len(fields) != HISTORY_HEADER.count(",")+1: # skip a partial line of an interrupted run
+                continue
+            history.setdefault((fields[2],fields[3],fields[4]),[]).append(float(fields[6]))
+    return history
+
+def getBaseline(_bests):
+    """
+        :param _bests: The best seconds of previous runs of one benchmark, in the order of runs
+        :return: returns the median of the latest HISTORY_WINDOW best seconds, None if there is no history.
+    """
+    if len(_bests)==0:
+        return None
+    return float(np.median(_bests[-HISTORY_WINDOW:]))
+
+def compareBaseline(_best,_baseline,_threshold):
+    """
+        :param _best: The best seconds of this run
+        :param _baseline: The baseline seconds from the history, None if there is no history
+        :param _threshold: The fraction a best time may differ from its baseline
+        :return: returns the status of the benchmark and the ratio of best to baseline seconds, None if there is no history.
+    """
+    if _baseline is None:
+        return NEW,None
+    ratio=_best/max(_baseline,1e-9)
+    if ratio > 1+_threshold:
+        return REGRESSION,ratio
+    if ratio < 1-_threshold:
+        return IMPROVED,ratio
+    return OK,ratio
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+from __future__ import division
+import time
+import numpy as np
+import kernels
+# a python script to benchmark the kernel backends of optimization process. Can be run from command line by following command
+# runKernelBenchmark user_N att_N k repeats output_fn
+# user_N, att_N are the size of the random input data
+# k represents the size of intermediate layer of neural network
+# repeats is the number of timed calls of each kernel, the best one is reported
+# output_fn represents the output file of benchmark results
+
+BACKENDS=[kernels.LOOPS_BACKEND,kernels.NUMPY_BACKEND,kernels.NUMBA_BACKEND] # loops is the reference implementation
+
+def main(_user_N,_att_N,_k,_repeats,_rez_fn):
+    """
+        Run every kernel of every available backend on the same random input.
+        Output the best time of each kernel and its maximum absolute difference from the loops backend as csv file.
+
+        :param _user_N: The total user number of random input data
+        :param _att_N: The attribute number of random input data
+        :param _k: The number of clusters in the intermediate layer of neural network
+        :param _repeats: The number of timed calls of each kernel after one warm-up call
+        :param _rez_fn: The file name to output benchmark results
+        :return: no returns.
+    """
+    np.random.seed(0)
+    X=np.random.uniform(size=(_user_N,_att_N))
+    clusters=np.random.uniform(size=(_k,_att_N))
+    alpha=np.random.uniform(size=_att_N)
+    dists=kernels._distancesNumpy(X,clusters,alpha,_user_N,_att_N,_k)
+    M=kernels._M_nkNumpy(dists,_user_N,_k)
+    X_hat=np.dot(M,clusters)
+    grad_M=np.random.normal(size=(_user_N,_k))
+    kernel_args=[("distances",(X,clusters,alpha,_user_N,_att_N,_k)),
+                 ("M_nk",(dists,_user_N,_k)),
+                 ("M_k",(M,_user_N,_k)),
+                 ("x_n_hat",(X,M,clusters,_user_N,_att_N,_k)),
+                 ("M_nk_grad",(M,grad_M,_user_N,_k)),
+                 ("distances_grad",(X,clusters,alpha,grad_M,_user_N,_att_N,_k)),
+                 ("x_n_hat_grad",(X,M,clusters,X_hat,_user_N,_att_N,_k))]
+
+    previous_backend=kernels.getKernelBackend()
+    result_fn=_rez_fn+".csv"
+    with open(result_fn,'w') as mf:
+        mf.write("Backend,Kernel,UserN,AttN,K,seconds,speedup,maxAbsDiff\n")
+    rez_file=open(result_fn, 'a')
+    reference={}
+    try:
+        for backend in BACKENDS:
+            try:
+                kernels.setKernelBackend(backend)
+            except ValueError as e:
+                print(e)
+                continue
+            for name,args in kernel_args:
+                kernel=getattr(kernels,name)
+                output=kernel(*args) # warm-up call, includes numba compilation
+                best=None
+                for ri in range(_repeats):
+                    start_time=time.time()
+                    kernel(*args)
+                    spent=time.time()-start_time
+                    if best is None or spent<best:
+                        best=spent
+                outputs=output if isinstance(output,tuple) else (output,)
+                if backend==kernels.LOOPS_BACKEND:
+                    reference[name]=(best,outputs)
+                ref_best,ref_outputs=reference[name]
+                max_diff=max(np.max(np.abs(np.asarray(oi)-np.asarray(ri))) for oi,ri in zip(outputs,ref_outputs))
+                rez_fline=backend+","+name+","+str(_user_N)+","+str(_att_N)+","+str(_k)+","+str(best)+","+str(ref_best/max(best,1e-9))+","+str(max_diff)+"\n"
+                rez_file.write(rez_fline)
+                print(rez_fline.strip())
+    finally:
+        rez_file.close()
+        kernels.setKernelBackend(previous_backend)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+from __future__ import division
+import time
+import multiprocessing
+import numpy as np
+import optimization
+import measures
+import utility
+import runOptimization
+# a python script for multi-start optimization. Can be run from command line by following command
+# runMultiStartOptimization input_fn target_att sensi_value ks acc_measures restarts cut_point output_fn
+# input_fn represents the csv file stores the source data
+# target_att represents the target attribute to rank on
+# sensi_value is the value of sentitive attribute represents the protected group
+# ks is the list of sizes of intermediate layer of neural network
+# acc_measures is the list of accuracy measures choose from ["scoreDiff", "positionDiff", "kendallDis", "spearmanDis", "pearsonDis"]
+# restarts is the number of random starting points of each k and accuracy measure
+# cut_point is the cut position of ranking to compute split fairness measures.
+# output_fn represents the output file of optimization results
+
+KL_DIVERGENCE="rKL" # represent kl-divergence group fairness measure
+ND_DIFFERENCE="rND" # represent normalized difference group fairness measure
+RD_DIFFERENCE="rRD" # represent ratio difference group fairness measure
+
+FINISHED="finished" # represent a restart that converged
+CANCELLED="cancelled" # represent a restart cancelled because it is dominated by a finished restart
+
+RESULT_HEADER="UserN,pro_N,K,TargetAtt,AccMeasure,Restart,Seed,Status,Evaluations,criterion,acc_value,rKL_input,rKL_converged,rND_input,rND_converged,rRD_input,rRD_converged,secondsSpent\n"
+
+class DominatedRunError(Exception):
+    """
+        Raised inside the objective to cancel a restart whose loss is clearly worse than the best finished restart.
+    """
+    pass
+
+_worker_setting=None # setting of the worker process, initialized once by function 'initWorker'
+
+def main(_csv_fn,_target_col,_sensi_bound,_ks,_accmeasures,_restarts,_cut_point,_rez_fn,
+         _processes=None,_seed=0,_dominance_margin=0.5,_min_iterations=10,_approx_grad=False,_use_binary=False):
+    """
+        Run the optimization process from several random starting points for every k and accuracy measure in parallel.
+        Output evaluation results of all restarts as csv file, rows are written as restarts complete.
+        Output the best restart of each k and accuracy measure, by final loss, as a second csv file.
+
+        :param _csv_fn: The file name of input data stored in csv file
+        :param _target_col: The target attribute ranked on i.e. score of ranking
+        :param _sensi_bound: The value of sensitve attribute to use as protected group, 0 or 1
+        :param _ks: The list of the number of clusters in the intermediate layer of neural network
+        :param _accmeasures: The list of accuracy measures, each one of constant string defined in runOptimization.py
+        :param _restarts: The number of random starting points of each k and accuracy measure
+        :param _cut_point: The cut off point of set-wise group fairness calculation
+        :param _rez_fn: The file name to output optimization results
+        :param _processes: The number of worker processes, default is the number of cores
+        :param _seed: The base seed, restart i of the task list uses seed _seed+i so results do not depend on scheduling
+        :param _dominance_margin: A restart is cancelled when its best loss stays above the best final loss of
+                                  its k and accuracy measure by more than this fraction
+        :param _min_iterations: The number of l-bfgs iterations of a restart before it can be cancelled, counted in iterations
+                                rather than objective evaluations since one approximated gradient takes len(params)+1 evaluations
+        :param _approx_grad: Whether to approximate the gradient by finite differences of the original objective
+        :param _use_binary: Whether to read the input data from its memory-mapped binary format, converted on first use,
+                            so that all worker processes share the pages of the data
+        :return: returns a dictionary of the best restart of each (k, accuracy measure), its result line and optimized parameters.
+    """
+    if not isinstance( _restarts, ( int, long ) ) or _restarts <= 0:
+        raise ValueError("Input number of restarts must be an integer larger than 0")
+    if len(_ks)*len(_accmeasures) == 0:
+        raise ValueError("Input lists of k and accuracy measures should not be empty")
+
+    data,input_scores,pro_data,unpro_data,pro_index=utility.transformCSVdata(_csv_fn,_target_col,_sensi_bound,_use_binary=_use_binary)
+    user_N = len(data)
+    pro_N = len(pro_data)
+    # get the maximum value first, shared by all restarts
+    normalizers=[measures.getNormalizer(user_N,pro_N,gfi) for gfi in [KL_DIVERGENCE,ND_DIFFERENCE,RD_DIFFERENCE]]
+    input_fairness=runOptimization.evaluateFairness(input_scores,pro_index,_cut_point,normalizers)
+    print "Finished fairness normalizer calculation!"
+
+    tasks=[]
+    for ki in _ks:
+        for acci in _accmeasures:
+            for ri in range(_restarts):
+                tasks.append((ki,acci,ri,_seed+len(tasks)))
+
+    manager=multiprocessing.Manager()
+    best_criteria=manager.dict() # best final loss of each (k, accuracy measure), shared by all workers
+    best_lock=manager.Lock()
+    worker_setting=(_csv_fn,_target_col,_sensi_bound,_use_binary,_cut_point,normalizers,input_fairness,
+                    best_criteria,best_lock,_dominance_margin,_min_iterations,_approx_grad)
+    pool=multiprocessing.Pool(_processes,initializer=initWorker,initargs=(worker_setting,))
+
+    result_fn=_rez_fn+".csv"
+    with open(result_fn,'w') as mf:
+        mf.write(RESULT_HEADER)
+    rez_file=open(result_fn, 'a')
+    best_runs={}
+    try:
+        for rez_fline,status,criterion,params in pool.imap_unordered(runRestart,tasks):
+            rez_file.write(rez_fline)
+            rez_file.flush()
+            fields=rez_fline.split(",")
+            group=(int(fields[2]),fields[4])
+            if status==FINISHED and (group not in best_runs or criterion<best_runs[group][1]):
+                best_runs[group]=(rez_fline,criterion,params)
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+        rez_file.close()
+        manager.shutdown()
+
+    # output the best restart of each k and accuracy measure
+    with open(_rez_fn+"_best.csv",'w') as mf:
+        mf.write(RESULT_HEADER)
+        for group in sorted(best_runs):
+            mf.write(best_runs[group][0])
+    return dict((group,(rez_fline,params)) for group,(rez_fline,criterion,params) in best_runs.items())
+
+def initWorker(_setting):
+    """
+        Load the input data once in each worker process.
+        Called by the process pool of function 'main'.
+
+        :param _setting: The tuple of input file, target column, sensitive value, binary format flag, cut point, normalizers,
+                         input fairness, shared best losses and their lock, dominance margin,
+                         minimum iterations and gradient approximation flag
+        :return: no returns.
+    """
+    global _worker_setting
+    csv_fn,target_col,sensi_bound,use_binary=_setting[:4]
+    _worker_setting=(utility.transformCSVdata(csv_fn,target_col,sensi_bound,_use_binary=use_binary),target_col)+tuple(_setting[4:])
+
+def runRestart(_task):
+    """
+        Run one restart of the optimization in a worker process.
+        The restart is cancelled as soon as it is dominated by the best finished restart of the same k and accuracy measure.
+
+        :param _task: The tuple of k, accuracy measure, restart number and seed
+        :return: returns the result line, the status, the final loss and the optimized parameters of this restart.
+    """
+    (data,input_scores,pro_data,unpro_data,pro_index),target_col,cut_point,normalizers,input_fairness,\
+        best_criteria,best_lock,dominance_margin,min_iterations,approx_grad=_worker_setting
+    k,accmeasure,restart,seed=_task
+    group=(k,accmeasure)
+
+    def cancelIfDominated(_run_state):
+        # a restart is only compared with finished restarts after l-bfgs moved it away from its starting point
+        if _run_state["steps"] < min_iterations:
+            return
+        best_criterion=best_criteria.get(group)
+        if best_criterion is not None and _run_state["best_criterion"] > best_criterion+dominance_margin*abs(best_criterion):
+            raise DominatedRunError()
+
+    run_state=optimization.newRunState(cancelIfDominated)
+    start_time=time.time()
+    try:
+        rez=runOptimization.runLBFGS(data,pro_data,unpro_data,input_scores,k,accmeasure,approx_grad,seed,run_state,0)
+    except DominatedRunError:
+        rez_fline=",".join(str(fi) for fi in [len(data),len(pro_data),k,target_col,accmeasure,restart,seed,CANCELLED,
+                                               run_state["iters"],run_state["best_criterion"],"","","","","","",""])
+        rez_fline=rez_fline+","+str(time.time()-start_time)+"\n"
+        return rez_fline,CANCELLED,run_state["best_criterion"],None
+    criterion=float(rez[1])
+    with best_lock:
+        if group not in best_criteria or criterion < best_criteria[group]:
+            best_criteria[group]=criterion
+    end_time=time.time()
+
+    # evaluation after converged
+    estimate_scores,acc_value=optimization.calculateEvaluateRez(rez,data,input_scores,k,accmeasure)
+    eval_fairness=runOptimization.evaluateFairness(estimate_scores,pro_index,cut_point,normalizers)
+    print "Finished restart ",restart," @ ",k,"ACCM ",accmeasure," loss: ",criterion
+
+    rez_fline=",".join(str(fi) for fi in [len(data),len(pro_data),k,target_col,accmeasure,restart,seed,FINISHED,run_state["iters"],criterion,acc_value,
+                                           input_fairness[0],eval_fairness[0],input_fairness[1],eval_fairness[1],input_fairness[2],eval_fairness[2],
+                                           end_time-start_time])+"\n"
+    return rez_fline,FINISHED,criterion,np.asarray(rez[0])
+
+if __name__ == "__main__":
+    main()
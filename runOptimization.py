@@ -1,109 +1,196 @@
-from __future__ import division
-import numpy as np
-import scipy.optimize as optim
-import time
-import optimization
-import measures
-import utility
-# a python script for optimization. Can be run from command line by following command
-# runOptimization input_fn target_att sensi_value k acc_measure cut_point output_fn
-# input_fn represents the csv file stores the source data
-# target_att represents the target attribute to rank on 
-# sensi_value is the value of sentitive attribute represents the protected group
-# k represents the size of intermediate layer of neural network
-# acc_measure is choose from ["scoreDiff", "positionDiff", "kendallDis", "spearmanDis", "pearsonDis"]
-# cut_point is the cut position of ranking to compute split fairness measures.
-# output_fn represents the output file of optimization results
-
-# test of this script can be found in testOptimization.py
-
-# constant of opmitization script
-KL_DIVERGENCE="rKL" # represent kl-divergence group fairness measure
-ND_DIFFERENCE="rND" # represent normalized difference group fairness measure
-RD_DIFFERENCE="rRD" # represent ratio difference group fairness measure
-
-SCORE_DIVERGENCE="scoreDiff" # represent average score difference -ranking accuracy measure
-POSITION_DIFFERENCE="positionDiff" # represent average position difference -ranking accuracy measure
-KENDALL_DIS="kendallDis" # represent kendall distance -ranking accuracy measure
-SPEARMAN_COR="spearmanDis" # represent spearman correlation -ranking accuracy measure
-PEARSON_COR="pearsonDis" # represent pearson correlation -ranking accuracy measure
-
-def main(_csv_fn,_target_col,_sensi_bound,_k,_accmeasure,_cut_point,_rez_fn):
-    """
-        Run the optimization process.
-        Output evaluation results as csv file.
-        Output results (accuracy, group fairness in op, values of group fairness measures) during optimization as txt files. 
-        
-        :param _csv_fn: The file name of input data stored in csv file
-                        In csv file, one column represents one attribute of user
-                        one row represents the feature vector of one user
-        :param _target_col: The target attribute ranked on i.e. score of ranking
-        :param _sensi_bound: The value of sensitve attribute to use as protected group, 0 or 1, usually 1 represnts belonging to protected group 
-                             Applied for binary sensitve attribute
-        :param _k: The number of clusters in the intermediate layer of neural network
-        :param _accmeasure: The accuracy measure used in this function, one of constant string defined in this py file
-        :param _cut_point: The cut off point of set-wise group fairness calculation
-        :param _rez_fn: The file name to output optimization results
-        :return: no returns.
-    """        
-
-    data,input_scores,pro_data,unpro_data,pro_index=utility.transformCSVdata(_csv_fn,_target_col,_sensi_bound)
-    
-    user_N = len(data)
-    pro_N = len(pro_data)
-
-	# get the maximum value first to run fast        
-    max_rKL=measures.getNormalizer(user_N,pro_N,KL_DIVERGENCE) 
-    max_rND=measures.getNormalizer(user_N,pro_N,ND_DIFFERENCE)
-    max_rRD=measures.getNormalizer(user_N,pro_N,RD_DIFFERENCE)    
-    
-    print "Finished fairness normalizer calculation!"
-    input_ranking=sorted(range(len(input_scores)), key=lambda k: input_scores[k],reverse=True)
-
-    input_rKL=measures.calculateNDFairness(input_ranking,pro_index,_cut_point,KL_DIVERGENCE,max_rKL)
-    input_rND=measures.calculateNDFairness(input_ranking,pro_index,_cut_point,ND_DIFFERENCE,max_rND)
-    input_rRD=measures.calculateNDFairness(input_ranking,pro_index,_cut_point,RD_DIFFERENCE,max_rRD)
-
-
-    # record the start time of optimization
-    start_time = time.time()
-    print "Starting optimization @ ",_k,"ACCM ",_accmeasure," time: ", start_time
-
-    # initialize the optimization
-    rez,bnd=optimization.initOptimization(data,_k) 
-    
-    optimization.lbfgsOptimize.iters=0                
-    rez = optim.fmin_l_bfgs_b(optimization.lbfgsOptimize, x0=rez, disp=1, epsilon=1e-5, 
-                   args=(data, pro_data, unpro_data, input_scores, _accmeasure, _k, 0.01,
-                         1, 100, 0), bounds = bnd,approx_grad=True, factr=1e12, pgtol=1e-04,maxfun=15000, maxiter=15000)
-    end_time = time.time()
-    print "Ending optimization @ ",_k,"ACCM ",_accmeasure," time: ", end_time
-    # evaluation after converged
-    estimate_scores,acc_value=optimization.calculateEvaluateRez(rez,data,input_scores,_k,_accmeasure)
-    estimate_ranking=sorted(range(len(estimate_scores)), key=lambda k: estimate_scores[k],reverse=True)
-    # compute the value of fairness measure after converged
-    eval_rKL=measures.calculateNDFairness(estimate_ranking,pro_index,_cut_point,KL_DIVERGENCE,max_rKL)
-    eval_rND=measures.calculateNDFairness(estimate_ranking,pro_index,_cut_point,ND_DIFFERENCE,max_rND)
-    eval_rRD=measures.calculateNDFairness(estimate_ranking,pro_index,_cut_point,RD_DIFFERENCE,max_rRD)
-    
-    # prepare the result line to write
-    # initialize the outputted csv file
-    result_fn=_rez_fn+".csv"
-    with open(result_fn,'w') as mf:
-        mf.write("UserN,pro_N,K,TargetAtt,AccMeasure,acc_value,rKL_input,rKL_converged,rND_input,rND_converged,rRD_input,rRD_converged,secondsSpent\n")
-    rez_file=open(result_fn, 'a')
-    
-    rez_fline=str(user_N)+","+str(pro_N)+","+str(_k)+","+str(_target_col)+","+str(_accmeasure)+","+str(acc_value)+","+str(input_rKL)+","+str(eval_rKL)+","+str(input_rND)+","+str(eval_rND)+","+str(input_rRD)+","+str(eval_rRD)+","+str(end_time-start_time)+"\n"
-    rez_file.write(rez_fline)
-    rez_file.close()
-
-if __name__ == "__main__":
-    main()
-
-
-
-
-            
-            
-            
+from __future__ import division
+import numpy as np
+import scipy.optimize as optim
+import time
+import optimization
+import measures
+import utility
+import objectiveProfiler
+from protectedGroup import ProtectedGroup
+from rankingValidation import ValidatedRanking
+# a python script for optimization. Can be run from command line by following command
+# runOptimization input_fn target_att sensi_value k acc_measure cut_point output_fn
+# input_fn represents the csv file stores the source data
+# target_att represents the target attribute to rank on 
+# sensi_value is the value of sentitive attribute represents the protected group
+# k represents the size of intermediate layer of neural network
+# acc_measure is choose from ["scoreDiff", "positionDiff", "kendallDis", "spearmanDis", "pearsonDis"]
+# cut_point is the cut position of ranking to compute split fairness measures.
+# output_fn represents the output file of optimization results
+
+# test of this script can be found in testOptimization.py
+
+# constant of opmitization script
+KL_DIVERGENCE="rKL" # represent kl-divergence group fairness measure
+ND_DIFFERENCE="rND" # represent normalized difference group fairness measure
+RD_DIFFERENCE="rRD" # represent ratio difference group fairness measure
+
+SCORE_DIVERGENCE="scoreDiff" # represent average score difference -ranking accuracy measure
+POSITION_DIFFERENCE="positionDiff" # represent average position difference -ranking accuracy measure
+KENDALL_DIS="kendallDis" # represent kendall distance -ranking accuracy measure
+SPEARMAN_COR="spearmanDis" # represent spearman correlation -ranking accuracy measure
+PEARSON_COR="pearsonDis" # represent pearson correlation -ranking accuracy measure
+
+LBFGS="lbfgs" # represent l-bfgs optimization on the full data
+
+def main(_csv_fn,_target_col,_sensi_bound,_k,_accmeasure,_cut_point,_rez_fn,_approx_grad=False,_use_binary=False,_seed=None,
+         _trace_fn=None,_trace_format=objectiveProfiler.TRACE_JSONL,_optimizer=LBFGS):
+    """
+        Run the optimization process.
+        Output evaluation results as csv file.
+        Output results (accuracy, group fairness in op, values of group fairness measures) during optimization as txt files. 
+        
+        :param _csv_fn: The file name of input data stored in csv file
+                        In csv file, one column represents one attribute of user
+                        one row represents the feature vector of one user
+        :param _target_col: The target attribute ranked on i.e. score of ranking
+        :param _sensi_bound: The value of sensitve attribute to use as protected group, 0 or 1, usually 1 represnts belonging to protected group 
+                             Applied for binary sensitve attribute
+        :param _k: The number of clusters in the intermediate layer of neural network
+        :param _accmeasure: The accuracy measure used in this function, one of constant string defined in this py file
+        :param _cut_point: The cut off point of set-wise group fairness calculation
+        :param _rez_fn: The file name to output optimization results
+        :param _approx_grad: Whether to approximate the gradient by finite differences of the original objective,
+                             instead of the analytic gradient, exact for scoreDiff and pearsonDis and with a differentiable surrogate
+                             of the ranking accuracy for the other measures, see function 'calculateEstimateYGrad'
+        :param _use_binary: Whether to read the input data from its memory-mapped binary format, converted on first use
+        :param _seed: The seed of the random starting point, uses the global numpy random state if not given
+        :param _trace_fn: The file name to write the profile trace of the objective evaluations, no profiling if not given
+        :param _trace_format: The format of the trace file, 'jsonl' (one event per line) or 'chrome' (chrome trace event format)
+        :param _optimizer: The optimizer, 'lbfgs' on the full data, or 'adam' or 'momentum' on stratified mini-batches,
+                           see function 'runStochastic'
+        :return: no returns.
+    """        
+
+    data,input_scores,pro_data,unpro_data,pro_index=utility.transformCSVdata(_csv_fn,_target_col,_sensi_bound,_use_binary=_use_binary)
+    
+    user_N = len(data)
+    pro_N = len(pro_data)
+
+	# get the maximum value first to run fast        
+    max_rKL=measures.getNormalizer(user_N,pro_N,KL_DIVERGENCE) 
+    max_rND=measures.getNormalizer(user_N,pro_N,ND_DIFFERENCE)
+    max_rRD=measures.getNormalizer(user_N,pro_N,RD_DIFFERENCE)    
+    
+    print "Finished fairness normalizer calculation!"
+    input_rKL,input_rND,input_rRD=evaluateFairness(input_scores,pro_index,_cut_point,[max_rKL,max_rND,max_rRD])
+
+
+    # record the start time of optimization
+    start_time = time.time()
+    print "Starting optimization @ ",_k,"ACCM ",_accmeasure," time: ", start_time
+
+    profiler=None
+    if _trace_fn is not None:
+        profiler=objectiveProfiler.ObjectiveProfiler(_trace_fn,_trace_format)
+    try:
+        if _optimizer==LBFGS:
+            rez = runLBFGS(data,pro_data,unpro_data,input_scores,_k,_accmeasure,_approx_grad,_seed,optimization.newRunState(_profiler=profiler))
+        else:
+            rez = runStochastic(data,pro_index,input_scores,_k,_accmeasure,_optimizer,_seed,optimization.newRunState(_profiler=profiler))
+    finally:
+        if profiler is not None:
+            profiler.close()
+    end_time = time.time()
+    print "Ending optimization @ ",_k,"ACCM ",_accmeasure," time: ", end_time
+    if profiler is not None:
+        profiler.printSummary()
+    # evaluation after converged
+    estimate_scores,acc_value=optimization.calculateEvaluateRez(rez,data,input_scores,_k,_accmeasure)
+    # compute the value of fairness measure after converged
+    eval_rKL,eval_rND,eval_rRD=evaluateFairness(estimate_scores,pro_index,_cut_point,[max_rKL,max_rND,max_rRD])
+    
+    # prepare the result line to write
+    # initialize the outputted csv file
+    result_fn=_rez_fn+".csv"
+    with open(result_fn,'w') as mf:
+        mf.write("UserN,pro_N,K,TargetAtt,AccMeasure,acc_value,rKL_input,rKL_converged,rND_input,rND_converged,rRD_input,rRD_converged,secondsSpent\n")
+    rez_file=open(result_fn, 'a')
+    
+    rez_fline=str(user_N)+","+str(pro_N)+","+str(_k)+","+str(_target_col)+","+str(_accmeasure)+","+str(acc_value)+","+str(input_rKL)+","+str(eval_rKL)+","+str(input_rND)+","+str(eval_rND)+","+str(input_rRD)+","+str(eval_rRD)+","+str(end_time-start_time)+"\n"
+    rez_file.write(rez_fline)
+    rez_file.close()
+
+def runLBFGS(_data,_pro_data,_unpro_data,_input_scores,_k,_accmeasure,_approx_grad=False,_seed=None,_run_state=None,_disp=1):
+    """
+        Run the l-bfgs optimization from a random starting point.
+
+        :param _data: The input data of all users
+        :param _pro_data: The input data of protected group
+        :param _unpro_data: The input data of unprotected group
+        :param _input_scores: The scores of input users to rank on
+        :param _k: The number of clusters in the intermediate layer of neural network
+        :param _accmeasure: The accuracy measure used in this function, one of constant string defined in this py file
+        :param _approx_grad: Whether to approximate the gradient by finite differences of the original objective
+        :param _seed: The seed of the random starting point, uses the global numpy random state if not given
+        :param _run_state: The run state returned by 'optimization.newRunState', a new one is used if not given
+        :param _disp: The verbosity of l-bfgs algorithm
+        :return: returns the result of l-bfgs algorithm i.e. the optimized parameters, the final loss and the convergence information.
+    """
+    # initialize the optimization
+    rez,bnd=optimization.initOptimization(_data,_k,_seed) 
+    if _run_state is None:
+        _run_state=optimization.newRunState()
+    if _approx_grad:
+        objective=optimization.lbfgsOptimize
+    else:
+        objective=optimization.lbfgsOptimizeGrad
+    rez = optim.fmin_l_bfgs_b(objective, x0=rez, disp=_disp, epsilon=1e-5, 
+                   args=(_data, _pro_data, _unpro_data, _input_scores, _accmeasure, _k, 0.01,
+                         1, 100, 0, _run_state), bounds = bnd,approx_grad=_approx_grad, factr=1e12, pgtol=1e-04,maxfun=15000, maxiter=15000,
+                   callback=lambda _params: optimization.countStep(_run_state))
+    return rez
+
+def runStochastic(_data,_pro_index,_input_scores,_k,_accmeasure,_optimizer=optimization.ADAM,_seed=None,_run_state=None,
+                  _learning_rate=0.01,_batch_size=1024,_steps=2000,_checkpoint_every=100,_disp=False):
+    """
+        Run the stochastic optimization on stratified mini-batches from a random starting point,
+        for populations too large to evaluate the full data at every step.
+
+        :param _data: The input data of all users
+        :param _pro_index: The row numbers of protected group
+        :param _input_scores: The scores of input users to rank on
+        :param _k: The number of clusters in the intermediate layer of neural network
+        :param _accmeasure: The accuracy measure used in this function, one of constant string defined in this py file
+        :param _optimizer: The first-order optimizer, one of 'adam', 'momentum'
+        :param _seed: The seed of the random starting point and of the batches, uses the global numpy random state if not given
+        :param _run_state: The run state returned by 'optimization.newRunState' of the batch evaluations, a new one is used if not given
+        :param _learning_rate: The step size of the optimizer
+        :param _batch_size: The number of users of a batch
+        :param _steps: The maximum number of steps
+        :param _checkpoint_every: The number of steps between two evaluations of the full data
+        :param _disp: Whether to print the full-data loss of every checkpoint
+        :return: returns the result in the form of l-bfgs algorithm i.e. the optimized parameters, the final loss and the information of the run.
+    """
+    # initialize the optimization with the same parameters as l-bfgs
+    rez,bnd=optimization.initOptimization(_data,_k,_seed)
+    return optimization.stochasticOptimize(rez,bnd,_data,_pro_index,_input_scores,_accmeasure,_k,0.01,1,100,
+                                           _optimizer,_learning_rate,_batch_size,_steps,_checkpoint_every,_seed=_seed,_run_state=_run_state,
+                                           _disp=_disp)
+
+def evaluateFairness(_scores,_pro_index,_cut_point,_normalizers):
+    """
+        Compute the value of all group fairness measures of the ranking by scores.
+
+        :param _scores: The scores of all users, higher is better
+        :param _pro_index: The index of protected group
+        :param _cut_point: The cut off point of set-wise group fairness calculation
+        :param _normalizers: The normalizers of rKL, rND and rRD
+        :return: returns the rKL, rND and rRD value of the ranking.
+    """
+    # validate the ranking and look up the protected group once for all measures
+    ranking=ValidatedRanking(sorted(range(len(_scores)), key=lambda k: _scores[k],reverse=True))
+    protected_group=ProtectedGroup(_pro_index,len(_scores))
+    return tuple(measures.calculateNDFairness(ranking,protected_group,_cut_point,gfi,normi) 
+                 for gfi,normi in zip([KL_DIVERGENCE,ND_DIFFERENCE,RD_DIFFERENCE],_normalizers))
+
+if __name__ == "__main__":
+    main()
+
+
+
+
+            
+            
+            
             
\ No newline at end of file
@@ -1,17 +1,32 @@
 from __future__ import division
+import os
+import json
+import multiprocessing
 import pandas as pd
+import numpy as np
+try:
+    import yaml
+except ImportError: # yaml experiment specs need PyYAML, json specs do not
+    yaml=None
 import measures
+import utility
+from protectedGroup import ProtectedGroup
 # a python script to compute fairness measures of real data sets
 # can be run through command line by using command: runRealDataExp data_folder output_fn sensitive_att
 # data_folder represents the folder name that stores all the data sets
 # output_fn represents the output file name
 # sensitive_att represents the value of sensitive attribute for protected group
+# experiments can also be declared in a json or yaml spec, see realDataExp.json, and run in parallel by function 'runSpec'
 # test of this script can be found in testRealdataExp.py
 
 KL_DIVERGENCE="rKL" # represent kl-divergence group fairness measure
 ND_DIFFERENCE="rND" # represent normalized difference group fairness measure
 RD_DIFFERENCE="rRD" # represent ratio difference group fairness measure
 
+SPEC_HEADER="Dataset,User_N,SensitiveATT,Pro_N,Pro_percent,TargetAtt,Measure,Value\n" # header of the results of function 'runSpec'
+
+_worker_data={} # data sets loaded by a worker process of function 'runSpec', keyed by file name and sensitive attribute
+
 def getAllGroupFairness(_data,_sensi_att,_target_att,_reverse_atts,_cut_point,_sensi_bound):
     """
         Run the calculation of all group fairness measures.      
@@ -27,29 +42,34 @@ def getAllGroupFairness(_data,_sensi_att,_target_att,_reverse_atts,_cut_point,_s
     """
 
     # get the protected group
-    pro_index=[idx for idx,row in _data.iterrows() if row[_sensi_att] == _sensi_bound]
-    # remove sensitive attribute
-    input_scores=_data[_target_att]
-    if _target_att in _reverse_atts:
-        input_ranking=sorted(range(len(input_scores)), key=lambda k: input_scores[k])
-    else:
-        input_ranking=sorted(range(len(input_scores)), key=lambda k: input_scores[k], reverse=True)
-    # get the maximum value first to run faster
-    user_N=len(input_scores)
-    pro_N=len(pro_index)
-
-    max_rKL=measures.getNormalizer(user_N,pro_N,KL_DIVERGENCE) 
-    max_rND=measures.getNormalizer(user_N,pro_N,ND_DIFFERENCE)
-    max_rRD=measures.getNormalizer(user_N,pro_N,RD_DIFFERENCE)
-    
-    gf_rKL=measures.calculateNDFairness(input_ranking, pro_index, _cut_point,KL_DIVERGENCE,max_rKL)
-    gf_rND=measures.calculateNDFairness(input_ranking, pro_index, _cut_point,ND_DIFFERENCE,max_rND)
-    gf_rRD=measures.calculateNDFairness(input_ranking, pro_index, _cut_point,RD_DIFFERENCE,max_rRD)
-    
+    pro_index=np.flatnonzero(_data[_sensi_att].values == _sensi_bound)
+    input_ranking=utility.calculateRankingOrder(_data[_target_att].values,_target_att in _reverse_atts)
+    pro_N,gf_results=getTargetsGroupFairness([input_ranking],pro_index,_cut_point)
+    gf_rKL,gf_rND,gf_rRD=gf_results[0].tolist()
     return pro_N, gf_rKL, gf_rND, gf_rRD
 
+def getTargetsGroupFairness(_rankings,_pro_index,_cut_point):
+    """
+        Run the calculation of all group fairness measures of the rankings on every target attribute of one data set.
+        The normalizers and the protected group are shared by all rankings.
+
+        :param _rankings: The rankings of all users on each target attribute, one permutation of row numbers per row
+        :param _pro_index: The row numbers of protected group, or their ProtectedGroup
+        :param _cut_point: The cut off point of set-wise group fairness calculation
+        :return: returns size of protected group and a (rankings x 3) array of rKL, rND and rRD value.
+    """
+    # get the maximum value first to run faster
+    user_N=len(_rankings[0])
+    pro_N=len(_pro_index)
+    protected_group=_pro_index if isinstance(_pro_index, ProtectedGroup) else ProtectedGroup(_pro_index,user_N)
+
+    gf_measures=[KL_DIVERGENCE,ND_DIFFERENCE,RD_DIFFERENCE]
+    normalizers=[measures.getNormalizer(user_N,pro_N,gfi) for gfi in gf_measures]
+    gf_results=measures.calculateNDFairnessBatch(np.asarray(_rankings),protected_group,_cut_point,gf_measures,normalizers)
+    return pro_N, gf_results
+
 # define the main function to define all the input parameters
-def main(_data_folder,_rez_fn,_sensi_bound):
+def main(_data_folder,_rez_fn,_sensi_bound,_use_binary=False):
     """
         Run the group fairness experiments of all real data sets.
         Output group fairness results as csv file.        
@@ -58,6 +78,8 @@ def main(_data_folder,_rez_fn,_sensi_bound):
         :param _rez_fn: The output file name of group fairness results
         :param _sensi_bound: The value of sensitve attribute to use as protected group 
                              Applied for binary sensitve attribute
+        :param _use_binary: Whether to read the data sets from their memory-mapped binary format, converted on first use,
+                            with precomputed ranking orders of every attribute
         :return: no returns.
     """
     # define all the real data set name list
@@ -99,27 +121,256 @@ def main(_data_folder,_rez_fn,_sensi_bound):
         cut_point=cutpoint_dic[di]
         for si in sensi_atts:
             current_fn=_data_folder+"/"+di+"_"+si+".csv"
-            try:        
-                data=pd.read_csv(current_fn)
-            except EnvironmentError:
-                print("Cannot find "+current_fn)
-            
-            print "Finishing computation of data: "+di+"_"+si
             reverse_atts=reverse_atts_dic[di+","+si]
-            noweight_atts=[si]
-            # get the target columns
-            target_cols_df=data.loc[:,data.columns.difference(noweight_atts)] 
-            target_cols=list(target_cols_df)
+            if _use_binary:
+                target_cols,rankings,pro_index=getBinaryRankings(current_fn,si,reverse_atts,_sensi_bound)
+            else:
+                try:        
+                    data=pd.read_csv(current_fn)
+                except EnvironmentError:
+                    print("Cannot find "+current_fn)
+                noweight_atts=[si]
+                # get the target columns
+                target_cols_df=data.loc[:,data.columns.difference(noweight_atts)] 
+                target_cols=list(target_cols_df)
+                # get the protected group and the rankings of all target columns once
+                pro_index=np.flatnonzero(data[si].values == _sensi_bound)
+                rankings=[utility.calculateRankingOrder(data[ti].values,ti in reverse_atts) for ti in target_cols]
             
-            for ti in target_cols:
-                pro_N,gf_rKL,gf_rND,gf_rRD=getAllGroupFairness(data,si,ti,reverse_atts,cut_point,_sensi_bound)
-                user_N=len(data)
-                pro_percent=round(pro_N*100/user_N)
+            print "Finishing computation of data: "+di+"_"+si
+            pro_N,gf_results=getTargetsGroupFairness(rankings,pro_index,cut_point)
+            user_N=len(rankings[0])
+            pro_percent=round(pro_N*100/user_N)
+            for ti,(gf_rKL,gf_rND,gf_rRD) in zip(target_cols,gf_results.tolist()):
                 rez_fline=di+","+str(user_N)+","+si+","+str(pro_N)+","+str(pro_percent)+","+ti+","+str(gf_rKL)+","+str(gf_rND)+","+str(gf_rRD)+"\n"
                 rez_file.write(rez_fline)
     rez_file.close()        
 
 
+def getBinaryRankings(_data_fn,_sensi_att,_reverse_atts,_sensi_bound):
+    """
+        Get the rankings on every target attribute of a data set in binary format.
+        Called by function 'main'.
+
+        :param _data_fn: The file name of csv data, its binary format is opened by function 'utility.openBinaryData'
+        :param _sensi_att: The sensitve attribute in the input data
+        :param _reverse_atts: The lists of attributes that lower is better
+        :param _sensi_bound: The value of sensitve attribute to use as protected group
+        :return: returns the target attributes in the order of the columns of data frame,
+                 returns the rankings on each target attribute and the row numbers of protected group.
+    """
+    with open(_data_fn, 'r') as f:
+        columns=f.readline().strip().split(',')
+    data,sensi_mask,orders,header=utility.openBinaryData(_data_fn,columns.index(_sensi_att))
+    pro_index=np.flatnonzero(sensi_mask == _sensi_bound)
+    target_cols=sorted(header["columns"])
+    rankings=[]
+    for ti in target_cols:
+        ti_col=header["columns"].index(ti)
+        if ti in _reverse_atts:
+            rankings.append(utility.calculateRankingOrder(data[:,ti_col],True))
+        else:
+            rankings.append(orders[ti_col])
+    return target_cols,rankings,pro_index
+
+def runSpec(_spec_fn,_rez_fn,_processes=None):
+    """
+        Run the group fairness experiments declared in a json or yaml spec with a process pool.
+        One task computes one measure of the ranking on one target attribute of one data set and sensitive attribute.
+        Result rows are written as tasks complete. Tasks already in an existing output file are skipped,
+        so an interrupted run resumes where it stopped.
+
+        :param _spec_fn: The file name of the experiment spec, see realDataExp.json.
+                         Its data folder is relative to the directory of the spec file.
+        :param _rez_fn: The output file name of group fairness results
+        :param _processes: The number of worker processes, default is the number of cores
+        :return: returns the number of tasks run, skipped tasks are not counted.
+    """
+    spec=readExperimentSpec(_spec_fn)
+    rez_fn=_rez_fn+".csv"
+    done_tasks=readFinishedTasks(rez_fn)
+    tasks=[task for task in getExperimentTasks(spec) if task[1:5] not in done_tasks]
+    print "Skipping ",len(done_tasks)," finished tasks, running ",len(tasks)," tasks"
+    if len(tasks) == 0:
+        return 0
+
+    pool=multiprocessing.Pool(_processes)
+    rez_file=open(rez_fn, 'a')
+    try:
+        # compute every missing normalizer once before the tasks that share it
+        normalizer_keys=set()
+        for data_fn,si,sensi_bound,use_binary in set((task[0],task[2],task[7],task[8]) for task in tasks):
+            user_N,pro_N=countGroups(data_fn,si,sensi_bound,use_binary)
+            normalizer_keys.update((user_N,pro_N,task[4]) for task in tasks if task[0]==data_fn and task[2]==si)
+        pool.map(getTaskNormalizer,sorted(normalizer_keys),chunksize=1)
+        # tasks of the same data set are sent together so each worker loads it once
+        for rez_fline in pool.imap_unordered(runExperimentTask,tasks,chunksize=len(spec["measures"])):
+            rez_file.write(rez_fline)
+            rez_file.flush()
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+        rez_file.close()
+    return len(tasks)
+
+def readExperimentSpec(_spec_fn):
+    """
+        Read and check an experiment spec.
+
+        :param _spec_fn: The file name of the experiment spec, json or yaml by its extension
+        :return: returns the spec dictionary, its data folder resolved against the directory of the spec file.
+    """
+    if not isinstance( _spec_fn, str ):
+        raise TypeError("Input spec file name must be a string which specify the path of the spec file")
+    with open(_spec_fn, 'r') as f:
+        if _spec_fn.endswith((".yaml",".yml")):
+            if yaml is None:
+                raise ImportError("Reading a yaml spec needs PyYAML, use a json spec instead")
+            spec=yaml.safe_load(f)
+        else:
+            spec=json.load(f)
+
+    for key in ["data_folder","sensi_bound","measures","datasets"]:
+        if key not in spec:
+            raise ValueError("Input spec must define '"+key+"'")
+    # names are plain strings as in function 'main', json reads them as unicode
+    spec["measures"]=[str(gfi) for gfi in spec["measures"]]
+    for gfi in spec["measures"]:
+        if gfi not in [KL_DIVERGENCE,ND_DIFFERENCE,RD_DIFFERENCE]:
+            raise ValueError("Input group fairness measure must be a string that choose from ['rKL', 'rND', 'rRD']")
+    for di in spec["datasets"]:
+        for key in ["name","sensitive_atts","cut_point"]:
+            if key not in di:
+                raise ValueError("Input spec of each data set must define '"+key+"'")
+        for key in ["name","sensitive_atts","reverse_atts","targets"]:
+            if key == "name":
+                di[key]=str(di[key])
+            elif key in di:
+                di[key]=[str(ai) for ai in di[key]]
+    spec["data_folder"]=os.path.join(os.path.dirname(os.path.abspath(_spec_fn)),str(spec["data_folder"]))
+    spec.setdefault("use_binary",False)
+    return spec
+
+def getExperimentTasks(_spec):
+    """
+        List the tasks of an experiment spec, grouped by data set and sensitive attribute.
+
+        :param _spec: The spec dictionary returned by function 'readExperimentSpec'
+        :return: returns a list of tasks, each one a tuple of file name, data set, sensitive attribute, target attribute,
+                 measure, reverse flag, cut point, value of sensitive attribute for protected group and binary format flag.
+    """
+    tasks=[]
+    for di in _spec["datasets"]:
+        reverse_atts=di.get("reverse_atts",[])
+        for si in di["sensitive_atts"]:
+            current_fn=_spec["data_folder"]+"/"+di["name"]+"_"+si+".csv"
+            with open(current_fn, 'r') as f:
+                columns=f.readline().strip().split(',')
+            # same target attributes and order as function 'main'
+            target_cols=di.get("targets",sorted(ci for ci in columns if ci != si))
+            for ti in target_cols:
+                for gfi in _spec["measures"]:
+                    tasks.append((current_fn,di["name"],si,ti,gfi,ti in reverse_atts,di["cut_point"],_spec["sensi_bound"],_spec["use_binary"]))
+    return tasks
+
+def readFinishedTasks(_rez_fn):
+    """
+        Read the tasks finished by a previous run of function 'runSpec' and prepare the output file to append to.
+        An incomplete last row, left by an interrupted run, is removed.
+
+        :param _rez_fn: The output file name of group fairness results
+        :return: returns the set of finished tasks as tuples of data set, sensitive attribute, target attribute and measure.
+    """
+    if not os.path.exists(_rez_fn):
+        with open(_rez_fn,'w') as mf:
+            mf.write(SPEC_HEADER)
+        return set()
+    with open(_rez_fn, 'r') as f:
+        content=f.read()
+    if not content.startswith(SPEC_HEADER):
+        raise ValueError("Input output file "+_rez_fn+" is not a result file of function 'runSpec'")
+    complete_N=content.rfind("\n")+1
+    if complete_N < len(content):
+        with open(_rez_fn,'r+') as f:
+            f.truncate(complete_N)
+    done_tasks=set()
+    for line in content[len(SPEC_HEADER):complete_N].splitlines():
+        fields=line.split(",")
+        done_tasks.add((fields[0],fields[2],fields[5],fields[6]))
+    return done_tasks
+
+def countGroups(_data_fn,_sensi_att,_sensi_bound,_use_binary):
+    """
+        Count the users and the protected group of a data set from its sensitive attribute only.
+
+        :param _data_fn: The file name of csv data
+        :param _sensi_att: The sensitve attribute in the input data
+        :param _sensi_bound: The value of sensitve attribute to use as protected group
+        :param _use_binary: Whether to read the memory-mapped binary format of the data set
+        :return: returns the size of all users and of protected group.
+    """
+    if _use_binary:
+        with open(_data_fn, 'r') as f:
+            columns=f.readline().strip().split(',')
+        sensi_values=utility.openBinaryData(_data_fn,columns.index(_sensi_att))[1]
+    else:
+        sensi_values=pd.read_csv(_data_fn,usecols=[_sensi_att])[_sensi_att].values
+    return len(sensi_values),int(np.sum(sensi_values == _sensi_bound))
+
+def getTaskNormalizer(_normalizer_key):
+    """
+        Compute one normalizer in a worker process, it is saved to the normalizer file for all workers.
+        Called by the process pool of function 'runSpec'.
+
+        :param _normalizer_key: The tuple of size of all users, size of protected group and measure
+        :return: returns the normalizer.
+    """
+    return measures.getNormalizer(*_normalizer_key)
+
+def runExperimentTask(_task):
+    """
+        Compute one group fairness measure of the ranking on one target attribute in a worker process.
+        Called by the process pool of function 'runSpec'.
+
+        :param _task: The task tuple listed by function 'getExperimentTasks'
+        :return: returns the result line of the task.
+    """
+    data_fn,dataset,si,ti,gfi,lower_better,cut_point,sensi_bound,use_binary=_task
+    target_cols,data,protected_group=loadExperimentData(data_fn,si,sensi_bound,use_binary)
+    input_ranking=utility.calculateRankingOrder(data[:,target_cols.index(ti)],lower_better)
+    user_N=len(input_ranking)
+    pro_N=len(protected_group)
+    normalizer=measures.getNormalizer(user_N,pro_N,gfi)
+    gf=measures.calculateNDFairness(input_ranking,protected_group,cut_point,gfi,normalizer)
+    pro_percent=round(pro_N*100/user_N)
+    return dataset+","+str(user_N)+","+si+","+str(pro_N)+","+str(pro_percent)+","+ti+","+gfi+","+str(gf)+"\n"
+
+def loadExperimentData(_data_fn,_sensi_att,_sensi_bound,_use_binary):
+    """
+        Load a data set once per worker process and keep it for the following tasks.
+
+        :param _data_fn: The file name of csv data
+        :param _sensi_att: The sensitve attribute in the input data
+        :param _sensi_bound: The value of sensitve attribute to use as protected group
+        :param _use_binary: Whether to read the memory-mapped binary format of the data set
+        :return: returns the names of the other attributes, their data with one column per attribute,
+                 and the ProtectedGroup of the row numbers of protected group.
+    """
+    key=(_data_fn,_sensi_att,_sensi_bound,_use_binary)
+    if key not in _worker_data:
+        if _use_binary:
+            with open(_data_fn, 'r') as f:
+                columns=f.readline().strip().split(',')
+            data,sensi_mask,_,header=utility.openBinaryData(_data_fn,columns.index(_sensi_att))
+            _worker_data[key]=(list(header["columns"]),data,ProtectedGroup(np.flatnonzero(sensi_mask == _sensi_bound),len(data)))
+        else:
+            data=pd.read_csv(_data_fn)
+            target_cols=[ci for ci in data.columns if ci != _sensi_att]
+            _worker_data[key]=(target_cols,data[target_cols].values,ProtectedGroup(np.flatnonzero(data[_sensi_att].values == _sensi_bound),len(data)))
+    return _worker_data[key]
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
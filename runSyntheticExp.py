@@ -1,70 +1,175 @@
-from __future__ import division
-import dataGenerator
-import measures
-# a python script to compute fairness measures of synthetic data 
-# can be run through command line by using command: runSyntheticExp user_N pro_N gf_measure cut_point output_fn
-# user_N, pro_N are the size of input population and protected group
-# gf_measure is choosed from ["rKL", "rND", "rRD"]
-# cut_point is the cut rank position to compute the split fairness measure
-# output_fn represents the output file name
-# test of this script can be found in testSyntheticExp.py
-
-KL_DIVERGENCE="rKL" # represent kl-divergence group fairness measure
-ND_DIFFERENCE="rND" # represent normalized difference group fairness measure
-RD_DIFFERENCE="rRD" # represent ratio difference group fairness measure
-NORM_ITERATION=100 # max iterations used in normalizer computation
-
-def main(_user_N,_pro_N,_gfmeasure,_cut_point,_rez_fn):
-    """
-        Run the group fairness experiments of synthetic unfair rankings.
-        Output group fairness results as csv file.        
-        
-        :param _user_N: The total user number of input ranking
-        :param _pro_N: The size of protected group in the input ranking        
-        :param _gfmeassure: The group fairness measure to be used in calculation 
-                            one of "rKL", "rND" and "rRD" defined as constant in this py file 
-        :param _cut_point: The cut off point of set-wise group fairness calculation               
-        :param _rez_fn: The file name to output group fairness results
-        
-        :return: no returns.
-    """
-
-    # define the input mixing proportion
-    f_probs=[i/10 for i in range(10)] 
-    f_probs.append(0.98) #using 0.98 as extreme case considering the limitation of random generator
-    
-
-    #define output file
-    output_fn=_rez_fn+"_user"+str(_user_N)+"_pro"+str(_pro_N)+".csv"
-    with open(output_fn,'w') as mf:
-        mf.write("MP0.0,MP0.1,MP0.2,MP0.3,MP0.4,MP0.5,MP0.6,MP0.7,MP0.8,MP0.9,MP0.98\n")        
-    rez_file=open(output_fn, 'a')
-    # calculate the normalizer of the input user number and protected group
-    max_GF=measures.getNormalizer(_user_N,_pro_N,_gfmeasure) 
-    # generate a random input ranking and protected group
-    input_ranking=[x for x in range(_user_N)]
-    sensi_idx=[x for x in range(_pro_N)]
-    
-    gf_results=[] 
-    # loop the input fairness probabilities
-    for fpi in range(len(f_probs)): 
-        fp=f_probs[fpi]
-        gf_iters=0 
-        for iteri in range(1,NORM_ITERATION+1):
-            sRFair=dataGenerator.generateUnfairRanking(input_ranking,sensi_idx,fp)                   
-            gf=measures.calculateNDFairness(sRFair,sensi_idx,_cut_point,_gfmeasure,max_GF) 
-            gf_iters=gf_iters+gf 
-        gf_results.append(gf_iters/NORM_ITERATION) #record average result
-        print "Finished mixing proportion ",fp
-
-    # output results into csv file    
-    fline=""
-    for item in gf_results:
-        fline=fline+str(item)+","
-
-    rez_file.write(fline+"\n")
-    rez_file.close()
-
-
-if __name__ == "__main__":
+from __future__ import division
+import math
+import multiprocessing
+import numpy as np
+from scipy.stats import t as student_t
+import dataGenerator
+import measures
+from protectedGroup import ProtectedGroup
+# a python script to compute fairness measures of synthetic data 
+# can be run through command line by using command: runSyntheticExp user_N pro_N gf_measure cut_point output_fn
+# user_N, pro_N are the size of input population and protected group
+# gf_measure is choosed from ["rKL", "rND", "rRD"]
+# cut_point is the cut rank position to compute the split fairness measure
+# output_fn represents the output file name
+# test of this script can be found in testSyntheticExp.py
+# grids of settings can be run in parallel by function 'runSweep'
+
+KL_DIVERGENCE="rKL" # represent kl-divergence group fairness measure
+ND_DIFFERENCE="rND" # represent normalized difference group fairness measure
+RD_DIFFERENCE="rRD" # represent ratio difference group fairness measure
+NORM_ITERATION=100 # max iterations used in normalizer computation
+
+SWEEP_HEADER="UserN,ProN,CutPoint,Measure,FairnessProbability,Iterations,Seed,Mean,Std,CILow,CIHigh\n" # header of the results of function 'runSweep'
+
+def main(_user_N,_pro_N,_gfmeasure,_cut_point,_rez_fn):
+    """
+        Run the group fairness experiments of synthetic unfair rankings.
+        Output group fairness results as csv file.        
+        
+        :param _user_N: The total user number of input ranking
+        :param _pro_N: The size of protected group in the input ranking        
+        :param _gfmeassure: The group fairness measure to be used in calculation 
+                            one of "rKL", "rND" and "rRD" defined as constant in this py file 
+        :param _cut_point: The cut off point of set-wise group fairness calculation               
+        :param _rez_fn: The file name to output group fairness results
+        
+        :return: no returns.
+    """
+
+    # define the input mixing proportion
+    f_probs=[i/10 for i in range(10)] 
+    f_probs.append(0.98) #using 0.98 as extreme case considering the limitation of random generator
+    
+
+    #define output file
+    output_fn=_rez_fn+"_user"+str(_user_N)+"_pro"+str(_pro_N)+".csv"
+    with open(output_fn,'w') as mf:
+        mf.write("MP0.0,MP0.1,MP0.2,MP0.3,MP0.4,MP0.5,MP0.6,MP0.7,MP0.8,MP0.9,MP0.98\n")        
+    rez_file=open(output_fn, 'a')
+    # calculate the normalizer of the input user number and protected group
+    max_GF=measures.getNormalizer(_user_N,_pro_N,_gfmeasure) 
+    # generate a random input ranking and protected group
+    input_ranking=[x for x in range(_user_N)]
+    sensi_idx=ProtectedGroup(np.arange(_pro_N),_user_N)
+    
+    gf_results=[] 
+    # loop the input fairness probabilities
+    for fpi in range(len(f_probs)): 
+        fp=f_probs[fpi]
+        sRFairs=dataGenerator.generateUnfairRankings(input_ranking,sensi_idx,fp,NORM_ITERATION)
+        # score all iterations of this mixing proportion in one call
+        gf_iters=measures.calculateNDFairnessBatch(sRFairs,sensi_idx,_cut_point,[_gfmeasure],[max_GF])[:,0]
+        gf_results.append(sum(gf_iters.tolist())/NORM_ITERATION) #record average result
+        print "Finished mixing proportion ",fp
+
+    # output results into csv file    
+    fline=""
+    for item in gf_results:
+        fline=fline+str(item)+","
+
+    rez_file.write(fline+"\n")
+    rez_file.close()
+
+
+def runSweep(_user_Ns,_pro_Ns,_cut_points,_gf_measures,_f_probs,_iterations,_rez_fn,_processes=None,_seed=0,_confidence=0.95):
+    """
+        Run the group fairness experiments of synthetic unfair rankings over grids of settings in parallel.
+        One task generates the unfair rankings of one (user_N, pro_N, fairness probability) and
+        evaluates them with every measure and cut point, so rankings are not generated again per measure.
+        Output the mean, standard deviation and confidence interval of each setting as csv file, rows are written as tasks complete.
+
+        :param _user_Ns: The list of total user numbers of input ranking
+        :param _pro_Ns: The list of sizes of protected group, settings with pro_N >= user_N are skipped
+        :param _cut_points: The list of cut off points of set-wise group fairness calculation
+        :param _gf_measures: The list of group fairness measures, each one of "rKL", "rND" and "rRD"
+        :param _f_probs: The list of fairness probabilities used to generate unfair rankings
+        :param _iterations: The number of unfair rankings generated for each setting
+        :param _rez_fn: The file name to output group fairness results
+        :param _processes: The number of worker processes, default is the number of cores
+        :param _seed: The base seed, task i of the grid uses seed _seed+i so results do not depend on scheduling
+        :param _confidence: The confidence level of the confidence interval of the mean, using student t distribution
+        :return: returns a dictionary from (user_N, pro_N, cut point, measure, fairness probability)
+                 to (mean, standard deviation, lower and upper bound of confidence interval).
+    """
+    if not isinstance( _iterations, ( int, long ) ) or _iterations <= 0:
+        raise ValueError("Input iterations must be an integer larger than 0")
+    if _confidence <= 0 or _confidence >= 1:
+        raise ValueError("Input confidence level must be a number in (0,1)")
+    for gfi in _gf_measures:
+        if gfi not in [KL_DIVERGENCE,ND_DIFFERENCE,RD_DIFFERENCE]:
+            raise ValueError("Input group fairness measure must be a string that choose from ['rKL', 'rND', 'rRD']")
+
+    tasks=[]
+    for user_N in _user_Ns:
+        for pro_N in _pro_Ns:
+            if pro_N >= user_N:
+                continue
+            # get the normalizers first, shared by all fairness probabilities of this setting
+            normalizers=[measures.getNormalizer(user_N,pro_N,gfi) for gfi in _gf_measures]
+            for fp in _f_probs:
+                tasks.append((user_N,pro_N,fp,list(_cut_points),list(_gf_measures),normalizers,_iterations,_seed+len(tasks),_confidence))
+    print "Finished fairness normalizer calculation!"
+
+    result_fn=_rez_fn+".csv"
+    with open(result_fn,'w') as mf:
+        mf.write(SWEEP_HEADER)
+    rez_file=open(result_fn, 'a')
+    sweep_results={}
+    pool=multiprocessing.Pool(_processes)
+    try:
+        for task_results in pool.imap_unordered(runSweepTask,tasks):
+            for setting,seed,stats in task_results:
+                rez_file.write(",".join(str(fi) for fi in list(setting)+[_iterations,seed]+list(stats))+"\n")
+                sweep_results[setting]=stats
+            rez_file.flush()
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+        rez_file.close()
+    return sweep_results
+
+def runSweepTask(_task):
+    """
+        Generate the unfair rankings of one setting and evaluate them with every measure and cut point.
+        Called by the process pool of function 'runSweep'.
+
+        :param _task: The tuple of user_N, pro_N, fairness probability, cut points, measures, their normalizers,
+                      iterations, seed and confidence level
+        :return: returns a list of (setting, seed, statistics) of each cut point and measure.
+    """
+    user_N,pro_N,fp,cut_points,gf_measures,normalizers,iterations,seed,confidence=_task
+    input_ranking=np.arange(user_N)
+    sensi_idx=ProtectedGroup(np.arange(pro_N),user_N)
+    rankings=dataGenerator.generateUnfairRankings(input_ranking,sensi_idx,fp,iterations,seed)
+    task_results=[]
+    for cut_point in cut_points:
+        # all measures of one cut point in one call
+        gf_iters=measures.calculateNDFairnessBatch(rankings,sensi_idx,cut_point,gf_measures,normalizers)
+        for gfi in range(len(gf_measures)):
+            stats=calculateMeanInterval(gf_iters[:,gfi],confidence)
+            task_results.append(((user_N,pro_N,cut_point,gf_measures[gfi],fp),seed,stats))
+    return task_results
+
+def calculateMeanInterval(_values,_confidence):
+    """
+        Calculate the mean, the sample standard deviation and the confidence interval of the mean.
+
+        :param _values: The values of all iterations
+        :param _confidence: The confidence level, e.g. 0.95
+        :return: returns the mean, standard deviation, lower and upper bound of confidence interval,
+                 the deviation and the interval are nan for a single value.
+    """
+    iter_N=len(_values)
+    mean=float(np.mean(_values))
+    if iter_N < 2:
+        return mean,float('nan'),float('nan'),float('nan')
+    std=float(np.std(_values,ddof=1))
+    half_width=float(student_t.ppf((1+_confidence)/2,iter_N-1))*std/math.sqrt(iter_N)
+    return mean,std,mean-half_width,mean+half_width
+
+if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,348 @@
+from __future__ import division
+import json
+import time
+import threading
+import collections
+import Queue
+import BaseHTTPServer
+import SocketServer
+import numpy as np
+import measures
+import utility
+import fairRanker
+from protectedGroup import ProtectedGroup
+from rankingValidation import ValidatedRanking
+# a python script of the http service that scores users with a fitted fair ranking model. Can be run from command line by following command
+# scoringService model_fn host port
+# model_fn represents the model file saved by 'fairRanker.FairRanker.save'
+# host and port represent the address the service listens on, e.g. localhost 8080
+#
+# POST /score with a json body {"users": [[feature, ...], ...], "protected": [row, ...], "cut_point": 10}
+#   returns {"scores": [...], "ranking": [...], "fairness": {"rKL": ..., "rND": ..., "rRD": ...}}
+#   "protected" (row numbers of the protected users in "users") and "cut_point" are optional, fairness is only returned with "protected"
+#   fairness values are normalized by the exact normalizers of 'measures.calculateExactNormalizer', kept in memory, nothing is written to disk
+# GET /metrics returns the latency and throughput of the service, GET /health returns {"status": "ok"}
+
+DEFAULT_HOST="localhost" # default host the service listens on
+DEFAULT_PORT=8080 # default port the service listens on
+MAX_BATCH_USERS=65536 # requests are merged into one scoring batch until it holds this many users
+MAX_BATCH_WAIT=0.005 # seconds a batch waits for more requests after its first one
+LATENCY_WINDOW=10000 # number of latest requests whose latency percentiles are reported
+NORMALIZER_CACHE_SIZE=4096 # number of (users, protected users, cut point) settings whose normalizers are kept in memory
+GF_MEASURES=[measures.KL_DIVERGENCE,measures.ND_DIFFERENCE,measures.RD_DIFFERENCE] # fairness measures returned with a ranking
+
+class PendingScore(object):
+    """
+        The users of one request waiting in the queue of the scoring worker, and their scores once the batch is scored.
+    """
+    def __init__(self,_users):
+        self.users=_users
+        self.scores=None
+        self.error=None
+        self.done=threading.Event()
+
+class ServiceMetrics(object):
+    """
+        Count the requests, users and batches of the service, and keep the latency of the latest requests.
+    """
+    def __init__(self):
+        self.lock=threading.Lock()
+        self.start_time=time.time()
+        self.requests=0
+        self.errors=0
+        self.users=0
+        self.batches=0
+        self.batch_requests=0
+        self.batch_seconds=0.0
+        self.latencies=collections.deque(maxlen=LATENCY_WINDOW)
+
+    def recordRequest(self,_seconds,_user_N,_ok):
+        """
+            :param _seconds: The latency of the request, from reading it to its response
+            :param _user_N: The number of users scored by the request
+            :param _ok: Whether the request succeeded
+            :return: no returns.
+        """
+        with self.lock:
+            self.requests+=1
+            if not _ok:
+                self.errors+=1
+            self.users+=_user_N
+            self.latencies.append(_seconds)
+
+    def recordBatch(self,_request_N,_seconds):
+        """
+            :param _request_N: The number of requests merged into the batch
+            :param _seconds: The time of scoring the batch
+            :return: no returns.
+        """
+        with self.lock:
+            self.batches+=1
+            self.batch_requests+=_request_N
+            self.batch_seconds+=_seconds
+
+    def getSnapshot(self):
+        """
+            :return: returns a dictionary of the counts, the throughput since the start and the latency percentiles in milliseconds.
+        """
+        with self.lock:
+            uptime=time.time()-self.start_time
+            latencies=np.array(self.latencies)
+            snapshot={"uptime_seconds": uptime, "requests": self.requests, "errors": self.errors, "users": self.users,
+                      "batches": self.batches, "requests_per_second": self.requests/uptime, "users_per_second": self.users/uptime,
+                      "mean_requests_per_batch": self.batch_requests/self.batches if self.batches else 0.0,
+                      "mean_batch_ms": 1000*self.batch_seconds/self.batches if self.batches else 0.0}
+        for pi in [50,95,99]:
+            snapshot["latency_p"+str(pi)+"_ms"]=float(1000*np.percentile(latencies,pi)) if len(latencies) else 0.0
+        return snapshot
+
+class ScoringService(object):
+    """
+        Score users with a fitted FairRanker loaded once.
+        Concurrent requests are queued to one worker thread that merges them into a batch, so the mapping of users
+        to the clusters and their scores are computed by one vectorized pass per batch instead of one per request.
+    """
+
+    def __init__(self,_ranker,_max_batch_users=MAX_BATCH_USERS,_max_batch_wait=MAX_BATCH_WAIT):
+        """
+            :param _ranker: The fitted fairRanker.FairRanker
+            :param _max_batch_users: The number of users after which a batch is scored without waiting for more requests
+            :param _max_batch_wait: The seconds a batch waits for more requests after its first one
+        """
+        if _ranker.params is None:
+            raise ValueError("The model is not fitted, call 'fit' or load a saved model first")
+        self.ranker=_ranker
+        self.max_batch_users=_max_batch_users
+        self.max_batch_wait=_max_batch_wait
+        self.queue=Queue.Queue()
+        self.metrics=ServiceMetrics()
+        self.worker=None
+        self.normalizers=collections.OrderedDict() # least recently used settings first
+        self.normalizer_lock=threading.Lock()
+
+    def start(self):
+        """
+            Start the scoring worker thread.
+            :return: no returns.
+        """
+        self.worker=threading.Thread(target=self.runWorker)
+        self.worker.daemon=True
+        self.worker.start()
+
+    def stop(self):
+        """
+            Stop the scoring worker thread after the queued requests are scored.
+            :return: no returns.
+        """
+        if self.worker is not None:
+            self.queue.put(None)
+            self.worker.join()
+            self.worker=None
+
+    def runWorker(self):
+        """
+            Merge queued requests into batches and score them, until a None is queued by function 'stop'.
+            :return: no returns.
+        """
+        stopping=False
+        while not stopping:
+            first=self.queue.get()
+            if first is None:
+                break
+            batch=[first]
+            user_N=len(first.users)
+            deadline=time.time()+self.max_batch_wait
+            while user_N < self.max_batch_users:
+                remaining=deadline-time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    pending=self.queue.get(timeout=remaining)
+                except Queue.Empty:
+                    break
+                if pending is None:
+                    stopping=True
+                    break
+                batch.append(pending)
+                user_N+=len(pending.users)
+            self.scoreBatch(batch)
+
+    def scoreBatch(self,_batch):
+        """
+            Score the users of all requests of a batch in one pass and hand each request its scores.
+            :param _batch: The list of PendingScore of the batch
+            :return: no returns.
+        """
+        start_time=time.time()
+        try:
+            scores=self.ranker.score(np.vstack([pi.users for pi in _batch]))
+            offset=0
+            for pi in _batch:
+                pi.scores=scores[offset:offset+len(pi.users)]
+                offset+=len(pi.users)
+        except Exception as e:
+            for pi in _batch:
+                pi.error=e
+        self.metrics.recordBatch(len(_batch),time.time()-start_time)
+        for pi in _batch:
+            pi.done.set()
+
+    def score(self,_users):
+        """
+            Queue users to the scoring worker and wait for their scores.
+            :param _users: The 2-D array of users, each row is a feature vector of one user
+            :return: returns the numpy array of estimated scores, in the order of users.
+        """
+        pending=PendingScore(_users)
+        self.queue.put(pending)
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.scores
+
+    def getNormalizers(self,_user_N,_pro_N,_cut_point):
+        """
+            Get the exact normalizers of all fairness measures of one setting from a bounded in-memory cache.
+            Exact normalizers cost O(_user_N/_cut_point), so clients cannot trigger the stochastic computation
+            or writes to the normalizer file of 'measures.getNormalizer'.
+            :param _user_N: The number of users of the ranking
+            :param _pro_N: The number of protected users of the ranking
+            :param _cut_point: The cut off point of the fairness measures
+            :return: returns the list of normalizers of rKL, rND and rRD.
+        """
+        setting=(_user_N,_pro_N,_cut_point)
+        with self.normalizer_lock:
+            if setting in self.normalizers:
+                normalizers=self.normalizers.pop(setting)
+            else:
+                normalizers=[measures.calculateExactNormalizer(_user_N,_pro_N,gfi,_cut_point) for gfi in GF_MEASURES]
+            self.normalizers[setting]=normalizers
+            if len(self.normalizers) > NORMALIZER_CACHE_SIZE:
+                self.normalizers.popitem(last=False)
+        return normalizers
+
+    def handleScoreRequest(self,_payload):
+        """
+            Score the users of a request, rank them and compute the fairness of the ranking.
+            :param _payload: The decoded json body with the users, and optionally the protected rows and the cut point
+            :return: returns the dictionary of the scores, the ranking and, if protected rows are given, the rKL, rND and rRD values.
+        """
+        if not isinstance(_payload, dict) or "users" not in _payload:
+            raise ValueError("Input request must be a json object with the list of users")
+        users=np.asarray(_payload["users"],dtype=np.float64)
+        if users.ndim != 2 or users.shape[0] == 0:
+            raise ValueError("Input users must be a non-empty list of feature vectors")
+        if users.shape[1] != self.ranker.att_N:
+            raise ValueError("Input users should have "+str(self.ranker.att_N)+" attribute columns as the training data")
+        scores=self.score(users)
+        ranking=utility.calculateRankingOrder(scores)
+        response={"scores": scores.tolist(), "ranking": ranking.tolist()}
+        if _payload.get("protected") is not None:
+            cut_point=_payload.get("cut_point",measures.NORM_CUTPOINT)
+            if not isinstance( cut_point, ( int, long ) ) or isinstance( cut_point, bool ) or cut_point <= 0:
+                raise ValueError("Input cut point must be an integer larger than 0")
+            if cut_point > len(users):
+                raise ValueError("Input cut point should not be larger than the number of users")
+            protected_group=ProtectedGroup(_payload["protected"],len(users))
+            if len(protected_group) == 0 or len(protected_group) >= len(users):
+                raise ValueError("Input protected rows must be a non-empty subset of the users")
+            validated_ranking=ValidatedRanking(ranking)
+            normalizers=self.getNormalizers(len(users),len(protected_group),cut_point)
+            response["fairness"]=dict((gfi,measures.calculateNDFairness(validated_ranking,protected_group,cut_point,gfi,normi))
+                                      for gfi,normi in zip(GF_MEASURES,normalizers))
+        return response
+
+class ScoringRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """
+        Route the http requests to the ScoringService of the server.
+    """
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            self.writeJSON(200,self.server.service.metrics.getSnapshot())
+        elif self.path == "/health":
+            self.writeJSON(200,{"status": "ok"})
+        else:
+            self.writeJSON(404,{"error": "Unknown path "+self.path})
+
+    def do_POST(self):
+        if self.path != "/score":
+            self.writeJSON(404,{"error": "Unknown path "+self.path})
+            return
+        start_time=time.time()
+        user_N=0
+        try:
+            body=self.rfile.read(int(self.headers.getheader("content-length",0)))
+            payload=json.loads(body)
+            response=self.server.service.handleScoreRequest(payload)
+            user_N=len(response["scores"])
+            status=200
+        except (TypeError, ValueError) as e: # invalid json or invalid input of the request
+            response={"error": str(e)}
+            status=400
+        except Exception as e:
+            response={"error": str(e)}
+            status=500
+        # record the request before replying, so /metrics covers every request a client got a reply for
+        self.server.service.metrics.recordRequest(time.time()-start_time,user_N,status==200)
+        self.writeJSON(status,response)
+
+    def writeJSON(self,_status,_content):
+        """
+            :param _status: The http status code
+            :param _content: The content to send as json
+            :return: no returns.
+        """
+        body=json.dumps(_content)
+        self.send_response(_status)
+        self.send_header("Content-Type","application/json")
+        self.send_header("Content-Length",str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self,_format,*_args):
+        # requests are counted in the metrics instead of logged one per line
+        pass
+
+class ScoringHTTPServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """
+        Http server with one thread per connection, so that concurrent requests wait in the same scoring batch.
+    """
+    daemon_threads=True
+
+def createServer(_service,_host=DEFAULT_HOST,_port=DEFAULT_PORT):
+    """
+        :param _service: The started ScoringService
+        :param _host: The host to listen on
+        :param _port: The port to listen on, 0 picks a free port
+        :return: returns the http server, call its 'serve_forever' to handle requests and 'shutdown' to stop it.
+    """
+    server=ScoringHTTPServer((_host,_port),ScoringRequestHandler)
+    server.service=_service
+    return server
+
+def main(_model_fn,_host=DEFAULT_HOST,_port=DEFAULT_PORT,_max_batch_users=MAX_BATCH_USERS,_max_batch_wait=MAX_BATCH_WAIT):
+    """
+        Load a fitted model and serve it until interrupted.
+
+        :param _model_fn: The model file saved by 'fairRanker.FairRanker.save'
+        :param _host: The host to listen on
+        :param _port: The port to listen on
+        :param _max_batch_users: The number of users after which a batch is scored without waiting for more requests
+        :param _max_batch_wait: The seconds a batch waits for more requests after its first one
+        :return: no returns.
+    """
+    service=ScoringService(fairRanker.loadFairRanker(_model_fn),_max_batch_users,_max_batch_wait)
+    service.start()
+    server=createServer(service,_host,_port)
+    print "Serving ",_model_fn," on ",_host,":",server.server_address[1]
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+
+if __name__ == "__main__":
+    main()
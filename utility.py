@@ -1,101 +1,365 @@
-from __future__ import division
-import csv
-import numpy as np
-# a python script define utility function i.e. format source data for computation
-# test of this script can be found in testUtility.py
-
-def transformCSVdata(_data_fn,_target_cols, _sensi_bound): 
-    """
-        Read pre-processed csv data and initialize data of protected and unprotected group.
-        Csv data has no header and sensitve attribute is in the last column. 
-
-        :param _data_fn: The file name of csv data      
-        :param _target_cols: The target column ranked on, value from [0,col(_data_fn)-1] since sensitve attribute is on last column
-                             If _target_cols equals to (col(_data_fn)-1), then use weighted summation of all attributes as target
-        :param _sensi_bound: The value of sensitve attribute to use as protected group 
-                             Applied for binary sensitve attribute
-        :return: returns the data frame of all users, protected and unprotected group,
-                 returns the scores of some attribute or summation of all attributes to rank on,
-                 returns the index of protected group.
-    """
-    if not isinstance( _data_fn, str ):
-        raise TypeError("Input file name must be a string which specify the path of input csv file")
-    # read into the csv file
-    header = True 
-    dat = []
-    
-    try:        
-        with open(_data_fn, 'rb') as f:
-            rows = csv.reader(f)        
-            for row in rows:
-                if header:
-                    header = False
-                    continue
-                dat.append([float(r) for r in row])
-    except EnvironmentError as e:
-        print("Cannot find the csv file")
-
-
-    if not isinstance( _target_cols, ( int, long ) ):
-        raise TypeError("Input target column must be an integer value from [0, col(data)-2], data is the input data in file _data_fn")
-    if not isinstance( _sensi_bound, ( int, long ) ):
-        raise TypeError("Input value of sensitive attribute must be an integer value can be 0 or 1")
-    
-    if len(dat) == 0:
-        raise ValueError("Input file should not be empty")
-    print('Finished reading csv!') 
-    data = np.array(dat)
-    user_N, att_N= data.shape
-
-    if _sensi_bound > 1 or _sensi_bound < 0:
-        raise ValueError("Input value of sensitive attribute must be an integer value can be 0 or 1")    
-    if _target_cols > (att_N-1) or _target_cols < 0:
-        raise ValueError("Input value of target column must be an integer value in range [0, col(data)-2], data is the input data in file _data_fn")
-
-    # separate the sensitve attribute
-    sensi_att = np.array(data[:,-1]).flatten()
-    data = data[:,:-1] 
-       
-    # get the protected and unprotected group 
-    pro_index = np.array(np.where(sensi_att ==_sensi_bound))[0].flatten()    
-    unpro_index = np.array(np.where(sensi_att !=_sensi_bound))[0].flatten()
-
-    pro_data = data[pro_index,:]
-    unpro_data = data[unpro_index,:]
-    
-    # ranked on some attributes or scores by weighted summation of all attributes 
-    _, att_N_after = data.shape
-
-    if _target_cols==att_N_after:
-        scores=calculateWeightedScores(data)
-    else:
-        scores=data[:,_target_cols]
-    
-    return data,scores,pro_data,unpro_data,pro_index
-
-def calculateWeightedScores(_data): 
-    """
-        Calculate a list of scores by equally weighted summation of all the attributes in the _data.
-
-        :param _data: The input data, each row is a feature vector of one user. Using dataframe to store.     
-        :return: returns a score list.
-    """
-    user_N,att_N=_data.shape
-
-    # error handling for input value
-    if user_N == 0:
-        raise ValueError("Input data should not be empty")
-    if att_N == 0:
-        raise ValueError("Input data should have at least one attribute column")
-    # get the average weight for each attribute
-    avg_weight=1.0*1/(att_N)
-    
-    weights=[]
-    for ai in range(att_N):
-        weights.append(avg_weight)
-    weights_vector=np.array(weights).transpose()
-
-    scores=np.dot(_data,weights_vector)
-    if len(scores) != user_N:
-        raise ValueError("Computation error appear in .dot opration")
-    return scores 
+from __future__ import division
+import csv
+import itertools
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import numpy as np
+# a python script define utility function i.e. format source data for computation
+# test of this script can be found in testUtility.py
+
+CSV_CHUNK_ROWS=65536 # number of csv rows parsed at once by function 'loadCSVData'
+BINARY_SUFFIX=".bin" # suffix of the directory that stores the binary format of a csv file
+BINARY_VERSION=1 # version of the binary format, older conversions are rebuilt
+
+def transformCSVdata(_data_fn,_target_cols, _sensi_bound, _sensi_col=-1, _dtype=np.float64, _use_binary=False): 
+    """
+        Read pre-processed csv data and initialize data of protected and unprotected group.
+        Csv data has a header and by default the sensitve attribute is in the last column. 
+        Calls function 'loadRankingData', the protected and unprotected data are copies of their rows.
+
+        :param _data_fn: The file name of csv data      
+        :param _target_cols: The target column ranked on, value from [0,col(_data_fn)-1] since sensitve attribute is on last column
+                             If _target_cols equals to (col(_data_fn)-1), then use weighted summation of all attributes as target
+        :param _sensi_bound: The value of sensitve attribute to use as protected group 
+                             Applied for binary sensitve attribute
+        :param _sensi_col: The column of sensitve attribute, default is the last column
+        :param _dtype: The data type of the returned data, np.float64 or np.float32
+        :param _use_binary: Whether to open the memory-mapped binary format of the csv file, see function 'openBinaryData'
+        :return: returns the data frame of all users, protected and unprotected group,
+                 returns the scores of some attribute or summation of all attributes to rank on,
+                 returns the index of protected group.
+    """
+    data,scores,pro_index,unpro_index=loadRankingData(_data_fn,_target_cols,_sensi_bound,_sensi_col,_dtype,_use_binary=_use_binary)
+    pro_data = data[pro_index,:]
+    unpro_data = data[unpro_index,:]
+    return data,scores,pro_data,unpro_data,pro_index
+
+def loadRankingData(_data_fn,_target_cols, _sensi_bound, _sensi_col=-1, _dtype=np.float64, _feature_cols=None, _use_binary=False):
+    """
+        Read pre-processed csv data and get the index of protected and unprotected group, without copying their rows.
+        Peak memory is about the size of the returned data, use _dtype=np.float32 to halve it.
+
+        :param _data_fn: The file name of csv data
+        :param _target_cols: The target column ranked on, an index into the feature columns
+                             If _target_cols equals to the number of feature columns, then use weighted summation of all attributes as target
+        :param _sensi_bound: The value of sensitve attribute to use as protected group
+                             Applied for binary sensitve attribute
+        :param _sensi_col: The column of sensitve attribute in the csv file, default is the last column
+        :param _dtype: The data type of the returned data, np.float64 or np.float32
+        :param _feature_cols: The columns of the csv file used as features, default is all columns except the sensitve attribute
+        :param _use_binary: Whether to open the memory-mapped binary format of the csv file, see function 'openBinaryData'.
+                            The binary format stores all columns except the sensitve attribute, so _feature_cols must be None.
+        :return: returns the data frame of all users and the scores to rank on,
+                 returns the index of protected and unprotected group, use data[pro_index] to get the data of a group.
+    """
+    if not isinstance( _target_cols, ( int, long ) ):
+        raise TypeError("Input target column must be an integer value from [0, col(data)-2], data is the input data in file _data_fn")
+    if not isinstance( _sensi_bound, ( int, long ) ):
+        raise TypeError("Input value of sensitive attribute must be an integer value can be 0 or 1")
+
+    if _use_binary:
+        if _feature_cols is not None:
+            raise ValueError("Binary format stores all feature columns, input feature columns must be None")
+        data,pro_mask,_,_=openBinaryData(_data_fn,_sensi_col,_dtype)
+        sensi_att=pro_mask.astype(int)
+    else:
+        data,sensi_att=loadCSVData(_data_fn,_sensi_col,_dtype,_feature_cols)
+    user_N, att_N= data.shape
+
+    if _sensi_bound > 1 or _sensi_bound < 0:
+        raise ValueError("Input value of sensitive attribute must be an integer value can be 0 or 1")    
+    if _target_cols > att_N or _target_cols < 0:
+        raise ValueError("Input value of target column must be an integer value in range [0, col(data)-2], data is the input data in file _data_fn")
+
+    # get the protected and unprotected group 
+    pro_index = np.flatnonzero(sensi_att ==_sensi_bound)
+    unpro_index = np.flatnonzero(sensi_att !=_sensi_bound)
+
+    # ranked on some attributes or scores by weighted summation of all attributes 
+    if _target_cols==att_N:
+        scores=calculateWeightedScores(data)
+    else:
+        scores=data[:,_target_cols]
+    return data,scores,pro_index,unpro_index
+
+def loadCSVData(_data_fn,_sensi_col=-1,_dtype=np.float64,_feature_cols=None,_chunk_rows=CSV_CHUNK_ROWS):
+    """
+        Read a numeric csv file with one header row into a preallocated array, chunk by chunk.
+        The file is read twice, once to count the rows and once to parse them, so no intermediate copy of the data is kept.
+        Chunks of plain numbers are parsed at once by numpy, a chunk with quoted fields is parsed by the csv module.
+
+        :param _data_fn: The file name of csv data
+        :param _sensi_col: The column of sensitve attribute in the csv file, default is the last column
+        :param _dtype: The data type of the returned data, np.float64 or np.float32
+        :param _feature_cols: The columns of the csv file used as features, default is all columns except the sensitve attribute
+        :param _chunk_rows: The number of rows parsed at once
+        :return: returns the feature data of all users and their values of sensitve attribute.
+    """
+    if not isinstance( _data_fn, str ):
+        raise TypeError("Input file name must be a string which specify the path of input csv file")
+    if not isinstance( _chunk_rows, ( int, long ) ) or _chunk_rows <= 0:
+        raise TypeError("Input chunk size must be an integer larger than 0")
+    if np.dtype(_dtype) not in [np.dtype(np.float32),np.dtype(np.float64)]:
+        raise ValueError("Input data type must be np.float32 or np.float64")
+
+    # count the rows and columns first to preallocate the data
+    user_N = 0
+    col_N = 0
+    try:
+        with open(_data_fn, 'r') as f:
+            next(f, None) # skip the header
+            for line in f:
+                if line.strip():
+                    if user_N == 0:
+                        col_N = len(next(csv.reader([line])))
+                    user_N += 1
+    except EnvironmentError as e:
+        raise IOError(e.errno, "Cannot find the csv file", _data_fn)
+    if user_N == 0:
+        raise ValueError("Input file should not be empty")
+
+    if _sensi_col >= col_N or _sensi_col < -col_N:
+        raise ValueError("Input column of sensitive attribute must be a column of the csv file")
+    sensi_col = _sensi_col % col_N
+    if _feature_cols is None:
+        feature_cols = [ci for ci in range(col_N) if ci != sensi_col]
+    else:
+        if len(_feature_cols) == 0 or max(_feature_cols) >= col_N or min(_feature_cols) < -col_N:
+            raise ValueError("Input feature columns must be columns of the csv file")
+        feature_cols = [ci % col_N for ci in _feature_cols]
+    # a contiguous block of columns is copied by slicing instead of fancy indexing
+    if feature_cols == list(range(feature_cols[0], feature_cols[-1]+1)):
+        feature_cols = slice(feature_cols[0], feature_cols[-1]+1)
+
+    data = np.empty((user_N, len(np.arange(col_N)[feature_cols])), dtype=_dtype)
+    sensi_att = np.empty(user_N)
+    with open(_data_fn, 'r') as f:
+        next(f, None) # skip the header
+        row = 0
+        while row < user_N:
+            raw_lines = list(itertools.islice(f, _chunk_rows))
+            lines = [line for line in raw_lines if line.strip()]
+            if len(raw_lines) == 0 or row+len(lines) > user_N:
+                raise ValueError("Input csv file changed while it was read, expected "+str(user_N)+" rows")
+            if len(lines) == 0:
+                continue
+            chunk = parseCSVChunk(lines, col_N, row)
+            data[row:row+len(lines)] = chunk[:, feature_cols]
+            sensi_att[row:row+len(lines)] = chunk[:, sensi_col]
+            row += len(lines)
+    print('Finished reading csv!') 
+    return data,sensi_att
+
+def parseCSVChunk(_lines,_col_N,_first_row):
+    """
+        Parse the lines of a chunk of numeric csv rows.
+        Called by function 'loadCSVData'.
+
+        :param _lines: The non-empty lines of the chunk
+        :param _col_N: The number of columns of the csv file
+        :param _first_row: The number of data rows before the chunk, used in error messages
+        :return: returns a (lines x columns) float64 array. Raise errors if a row is not numeric or has a different number of columns.
+    """
+    # parse the whole chunk at once, the newlines are treated as separators,
+    # so each row is checked to have all its columns before the values are split into rows
+    if all(line.count(',') == _col_N-1 for line in _lines):
+        chunk = np.fromstring(",".join(_lines), sep=',')
+        if len(chunk) == len(_lines)*_col_N:
+            return chunk.reshape(len(_lines), _col_N)
+    # numpy stops at the first field that is not a plain number, e.g. a quoted one, and quoted fields may hold commas,
+    # so parse the chunk as the csv module does
+    error_msg = "Input csv file should have "+str(_col_N)+" numeric values in each row, check rows "+str(_first_row+2)+" to "+str(_first_row+len(_lines)+1)
+    rows = list(csv.reader(_lines))
+    if any(len(ri) != _col_N for ri in rows):
+        raise ValueError(error_msg)
+    try:
+        return np.array([[float(vi) for vi in ri] for ri in rows])
+    except ValueError:
+        raise ValueError(error_msg)
+
+def openBinaryData(_data_fn,_sensi_col=-1,_dtype=np.float64):
+    """
+        Open the binary format of a csv file with memory mapping, converting the csv file first if needed.
+        The conversion is rebuilt when the sha256 hash of the csv file changed. The hash is only recomputed
+        when the size or modification time of the csv file differs from the ones stored in the header.
+
+        :param _data_fn: The file name of csv data
+        :param _sensi_col: The column of sensitve attribute in the csv file, default is the last column
+        :param _dtype: The data type of the stored data, np.float64 or np.float32
+        :return: returns the read-only memory-mapped feature data of all users,
+                 returns a boolean array, True where the value of sensitve attribute is 1,
+                 returns the read-only memory-mapped ranking orders, row t ranks users on target column t from high to low
+                 and the last row ranks on the weighted summation of all attributes,
+                 returns the header dictionary of the binary format.
+    """
+    bin_dir=_data_fn+BINARY_SUFFIX
+    header=readBinaryHeader(bin_dir)
+    if not isBinaryValid(header,_data_fn,_sensi_col,_dtype):
+        convertCSVToBinary(_data_fn,_sensi_col,_dtype)
+        header=readBinaryHeader(bin_dir)
+
+    data=np.load(os.path.join(bin_dir,"features.npy"),mmap_mode='r')
+    pro_mask=np.unpackbits(np.load(os.path.join(bin_dir,"sensitive.npy")))[:header["user_N"]].astype(bool)
+    orders=np.load(os.path.join(bin_dir,"orders.npy"),mmap_mode='r')
+    return data,pro_mask,orders,header
+
+def convertCSVToBinary(_data_fn,_sensi_col=-1,_dtype=np.float64):
+    """
+        Convert a csv file into the binary format, stored in the directory _data_fn+BINARY_SUFFIX:
+        features.npy holds the feature data, sensitive.npy the packed bits of the binary sensitve attribute,
+        orders.npy the ranking order of every target column and of the weighted summation of all attributes,
+        header.json the column names and the hash, size and modification time of the csv file.
+
+        :param _data_fn: The file name of csv data
+        :param _sensi_col: The column of sensitve attribute in the csv file, default is the last column
+        :param _dtype: The data type of the stored data, np.float64 or np.float32
+        :return: returns the directory of the binary format.
+    """
+    data,sensi_att=loadCSVData(_data_fn,_sensi_col,_dtype)
+    if not np.isin(sensi_att,[0,1]).all():
+        raise ValueError("Input value of sensitive attribute must be 0 or 1 to be stored in binary format")
+    user_N,att_N=data.shape
+    with open(_data_fn, 'r') as f:
+        columns=f.readline().strip().split(',')
+    sensi_col=_sensi_col % len(columns)
+
+    # ranking order of each target
+    orders=np.empty((att_N+1,user_N),dtype=np.int32 if user_N < 2**31 else np.int64)
+    for ti in range(att_N):
+        orders[ti]=calculateRankingOrder(data[:,ti])
+    orders[att_N]=calculateRankingOrder(calculateWeightedScores(data))
+
+    file_stat=os.stat(_data_fn)
+    header={"version":BINARY_VERSION,"user_N":user_N,"att_N":att_N,
+            "columns":[ci for idx,ci in enumerate(columns) if idx != sensi_col],"sensi_col":sensi_col,
+            "sensi_att":columns[sensi_col],"dtype":np.dtype(_dtype).name,
+            "source_sha256":calculateFileHash(_data_fn),"source_size":file_stat.st_size,"source_mtime":file_stat.st_mtime}
+
+    # write into a temporary directory, then move it in place so readers never see a partial conversion
+    bin_dir=_data_fn+BINARY_SUFFIX
+    tmp_dir=tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(bin_dir)),prefix=".binary")
+    try:
+        np.save(os.path.join(tmp_dir,"features.npy"),data)
+        np.save(os.path.join(tmp_dir,"sensitive.npy"),np.packbits(sensi_att==1))
+        np.save(os.path.join(tmp_dir,"orders.npy"),orders)
+        with open(os.path.join(tmp_dir,"header.json"),'w') as f:
+            json.dump(header,f,indent=1)
+        os.chmod(tmp_dir,0o755)
+        if os.path.exists(bin_dir):
+            old_dir=tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(bin_dir)),prefix=".binary")
+            os.rename(bin_dir,os.path.join(old_dir,"old"))
+            shutil.rmtree(old_dir,ignore_errors=True)
+        os.rename(tmp_dir,bin_dir)
+    except OSError:
+        # another process moved its conversion in place first
+        if not isBinaryValid(readBinaryHeader(bin_dir),_data_fn,_sensi_col,_dtype):
+            raise
+    finally:
+        shutil.rmtree(tmp_dir,ignore_errors=True)
+    return bin_dir
+
+def readBinaryHeader(_bin_dir):
+    """
+        :param _bin_dir: The directory of the binary format
+        :return: returns the header dictionary of the binary format, None if it does not exist.
+    """
+    try:
+        with open(os.path.join(_bin_dir,"header.json"), 'r') as f:
+            return json.load(f)
+    except (EnvironmentError, ValueError):
+        return None
+
+def isBinaryValid(_header,_data_fn,_sensi_col,_dtype):
+    """
+        Check whether a binary format is up to date with its csv file and stored with the requested layout.
+        If only the modification time of the csv file changed and its hash did not, the header is updated.
+
+        :param _header: The header dictionary of the binary format, or None
+        :param _data_fn: The file name of csv data
+        :param _sensi_col: The column of sensitve attribute in the csv file
+        :param _dtype: The data type of the stored data
+        :return: returns True if the binary format can be used.
+    """
+    if _header is None or _header["version"] != BINARY_VERSION:
+        return False
+    if _header["sensi_col"] != _sensi_col % (_header["att_N"]+1) or _header["dtype"] != np.dtype(_dtype).name:
+        return False
+    try:
+        file_stat=os.stat(_data_fn)
+    except EnvironmentError:
+        print("Cannot find the csv file")
+        return False
+    if file_stat.st_size != _header["source_size"]:
+        return False
+    if file_stat.st_mtime == _header["source_mtime"]:
+        return True
+    if calculateFileHash(_data_fn) != _header["source_sha256"]:
+        return False
+    # the csv file was touched but not changed, remember the new time to skip hashing next time
+    _header["source_mtime"]=file_stat.st_mtime
+    try:
+        fd,tmp_fn=tempfile.mkstemp(dir=_data_fn+BINARY_SUFFIX,prefix=".header")
+        with os.fdopen(fd,'w') as f:
+            json.dump(_header,f,indent=1)
+        os.chmod(tmp_fn,0o644)
+        os.rename(tmp_fn,os.path.join(_data_fn+BINARY_SUFFIX,"header.json"))
+    except EnvironmentError:
+        pass
+    return True
+
+def calculateFileHash(_fn):
+    """
+        :param _fn: The file name
+        :return: returns the sha256 hex digest of the file content.
+    """
+    file_hash=hashlib.sha256()
+    with open(_fn, 'rb') as f:
+        for block in iter(lambda: f.read(1<<20), b''):
+            file_hash.update(block)
+    return file_hash.hexdigest()
+
+def calculateRankingOrder(_scores,_lower_better=False):
+    """
+        Rank users by their scores with a stable sort, users of equal score keep their input order,
+        the same ranking as sorted(range(len(_scores)), key=lambda k: _scores[k], reverse=not _lower_better).
+
+        :param _scores: The scores of all users
+        :param _lower_better: Whether lower score is better, default ranks from high to low
+        :return: returns the ranking, an array of user indices from the best user to the worst one.
+    """
+    scores=np.asarray(_scores)
+    if _lower_better:
+        return np.argsort(scores,kind='mergesort')
+    # stable descending sort without negating the scores: sort the reversed scores and reverse the order back
+    user_N=len(scores)
+    return user_N-1-np.argsort(scores[::-1],kind='mergesort')[::-1]
+
+def calculateWeightedScores(_data): 
+    """
+        Calculate a list of scores by equally weighted summation of all the attributes in the _data.
+
+        :param _data: The input data, each row is a feature vector of one user. Using dataframe to store.     
+        :return: returns a score list.
+    """
+    user_N,att_N=_data.shape
+
+    # error handling for input value
+    if user_N == 0:
+        raise ValueError("Input data should not be empty")
+    if att_N == 0:
+        raise ValueError("Input data should have at least one attribute column")
+    # get the average weight for each attribute
+    avg_weight=1.0*1/(att_N)
+    
+    weights=[]
+    for ai in range(att_N):
+        weights.append(avg_weight)
+    weights_vector=np.array(weights).transpose()
+
+    scores=np.dot(_data,weights_vector)
+    if len(scores) != user_N:
+        raise ValueError("Computation error appear in .dot opration")
+    return scores 